@@ -1,11 +1,11 @@
 from flask import Flask
-import logging
+from app.utils.logger import setup_logger
 
 def create_app():
     app = Flask(__name__)
     
-    # 設定基本日誌
-    logging.basicConfig(level=logging.INFO)
+    # 設定日誌（非同步佇列輸出）
+    setup_logger(app)
     
     @app.route('/health')
     def health_check():
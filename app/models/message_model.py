@@ -2,79 +2,130 @@ from datetime import datetime
 from typing import Optional, Dict, Any
 import re
 
+TAG_PATTERN = re.compile(r'#(\w+)')
+
+SHEETS_HEADERS = (
+    'timestamp',
+    'message_type',
+    'content',
+    'user_id',
+    'tags',
+    'status'
+)
+
 class MessageModel:
-    def __init__(self, 
-                 user_id: str, 
-                 message_type: str, 
-                 content: str, 
+    # No per-instance __dict__; tags and processed_content are derived on first use
+    __slots__ = (
+        'user_id',
+        'message_type',
+        '_content',
+        'timestamp',
+        '_raw_data',
+        '_tags',
+        '_processed_content'
+    )
+
+    def __init__(self,
+                 user_id: str,
+                 message_type: str,
+                 content: str,
                  timestamp: Optional[datetime] = None,
                  raw_data: Optional[Dict[Any, Any]] = None):
         self.user_id = user_id
         self.message_type = message_type
-        self.content = content
+        self._content = content
         self.timestamp = timestamp or datetime.now()
-        self.raw_data = raw_data or {}
-        self.tags = self._extract_tags()
-        self.processed_content = self._process_content()
-    
+        self._raw_data = raw_data
+        self._tags = None
+        self._processed_content = None
+
+    @property
+    def content(self) -> str:
+        return self._content
+
+    @content.setter
+    def content(self, value: str):
+        self._content = value
+        self._tags = None
+        self._processed_content = None
+
+    @property
+    def raw_data(self) -> Dict[Any, Any]:
+        if self._raw_data is None:
+            self._raw_data = {}
+        return self._raw_data
+
+    @raw_data.setter
+    def raw_data(self, value: Optional[Dict[Any, Any]]):
+        self._raw_data = value
+
+    @property
+    def tags(self) -> list:
+        if self._tags is None:
+            self._tags = self._extract_tags()
+        return self._tags
+
+    @tags.setter
+    def tags(self, value: list):
+        self._tags = value
+
+    @property
+    def processed_content(self) -> str:
+        if self._processed_content is None:
+            self._processed_content = self._process_content()
+        return self._processed_content
+
+    @processed_content.setter
+    def processed_content(self, value: str):
+        self._processed_content = value
+
     def _extract_tags(self) -> list:
-        tag_pattern = r'#(\w+)'
-        tags = re.findall(tag_pattern, self.content)
-        return list(set(tags))
-    
+        if '#' not in self._content:
+            return []
+        # dict.fromkeys dedupes while keeping first-seen order
+        return list(dict.fromkeys(TAG_PATTERN.findall(self._content)))
+
     def _process_content(self) -> str:
-        content = self.content.strip()
-        
-        # Remove excessive whitespace
-        content = re.sub(r'\s+', ' ', content)
-        
-        # Basic content cleaning
-        content = content.replace('\n', ' ').replace('\r', '')
-        
-        return content
-    
+        # Strip, collapse whitespace runs (including newlines) to single spaces
+        return ' '.join(self._content.split())
+
     def to_dict(self) -> Dict[str, Any]:
         return {
             'user_id': self.user_id,
             'message_type': self.message_type,
-            'content': self.content,
+            'content': self._content,
             'processed_content': self.processed_content,
             'tags': self.tags,
             'timestamp': self.timestamp.isoformat(),
-            'raw_data': self.raw_data
+            'raw_data': self._raw_data or {}
         }
-    
+
     def to_sheets_row(self) -> list:
+        tags = self.tags
         return [
-            self.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+            # isoformat is several times faster than strftime for this layout
+            self.timestamp.isoformat(' ', 'seconds')[:19],
             self.message_type,
             self.processed_content,
             self.user_id,
-            ', '.join(self.tags) if self.tags else '',
+            ', '.join(tags) if tags else '',
             'processed'
         ]
-    
+
     @staticmethod
     def get_sheets_headers() -> list:
-        return [
-            'timestamp',
-            'message_type', 
-            'content',
-            'user_id',
-            'tags',
-            'status'
-        ]
-    
+        return list(SHEETS_HEADERS)
+
     def is_valid(self) -> bool:
         return (
-            bool(self.user_id) and 
-            bool(self.message_type) and 
-            bool(self.content.strip())
+            bool(self.user_id) and
+            bool(self.message_type) and
+            bool(self._content.strip())
         )
-    
+
     def get_summary(self) -> str:
         content_preview = self.processed_content[:50]
         if len(self.processed_content) > 50:
             content_preview += "..."
-        
-        return f"{self.message_type}: {content_preview}"
\ No newline at end of file
+
+        return f"{self.message_type}: {content_preview}"
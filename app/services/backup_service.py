@@ -0,0 +1,257 @@
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+from collections import deque
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from app.models.message_model import MessageModel
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+FORMATS = ('jsonl', 'csv')
+COMPRESSIONS = {'.gz': 'gzip', '.zst': 'zstd'}
+
+
+def detect_format(path: str) -> Tuple[str, Optional[str]]:
+    """Return (format, compression) from a path like ``backup.jsonl.gz``."""
+    base, ext = os.path.splitext(path)
+    compression = COMPRESSIONS.get(ext)
+    if compression:
+        base, ext = os.path.splitext(base)
+
+    fmt = ext.lstrip('.') or 'jsonl'
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported backup format: {ext}")
+
+    return fmt, compression
+
+
+def open_backup(path: str, mode: str = 'r'):
+    """Open a backup file as text, transparently (de)compressing it."""
+    _, compression = detect_format(path)
+
+    if compression == 'gzip':
+        return gzip.open(path, mode + 't', encoding='utf-8', newline='')
+
+    if compression == 'zstd':
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("zstandard is not installed; use .gz or install zstandard")
+        if mode == 'w':
+            stream = zstandard.ZstdCompressor().stream_writer(open(path, 'wb'))
+        else:
+            stream = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'))
+        return io.TextIOWrapper(stream, encoding='utf-8', newline='')
+
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+def write_records(records: Iterable[Dict], path: str, headers: Optional[List[str]] = None) -> int:
+    """Stream records to a JSON Lines or CSV file; returns the row count."""
+    fmt, _ = detect_format(path)
+    headers = headers or MessageModel.get_sheets_headers()
+    count = 0
+
+    with open_backup(path, 'w') as f:
+        if fmt == 'csv':
+            writer = csv.DictWriter(f, fieldnames=headers, extrasaction='ignore')
+            writer.writeheader()
+            for record in records:
+                writer.writerow(record)
+                count += 1
+        else:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False, default=str))
+                f.write('\n')
+                count += 1
+
+    return count
+
+
+def read_records(path: str) -> Iterator[Dict]:
+    """Stream records back out of a file written by write_records()."""
+    fmt, _ = detect_format(path)
+
+    with open_backup(path, 'r') as f:
+        if fmt == 'csv':
+            for record in csv.DictReader(f):
+                yield record
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def read_rows(worksheet, headers: List[str], start: int, count: int) -> List[Dict]:
+    """Read ``count`` rows from row ``start`` as records keyed by ``headers``."""
+    from gspread.utils import rowcol_to_a1
+
+    end = start + count - 1
+    values = worksheet.get(f"{rowcol_to_a1(start, 1)}:{rowcol_to_a1(end, len(headers))}")
+    return [dict(zip(headers, list(row) + [''] * (len(headers) - len(row)))) for row in values]
+
+
+def iter_worksheet_records(worksheet, page_size: int = 5000, limit: Optional[int] = None) -> Iterator[Dict]:
+    """Page through a worksheet in row ranges instead of get_all_records()."""
+    headers = worksheet.row_values(1)
+    if not headers:
+        return
+
+    start = 2
+    remaining = limit
+    while remaining is None or remaining > 0:
+        rows_wanted = page_size if remaining is None else min(page_size, remaining)
+        records = read_rows(worksheet, headers, start, rows_wanted)
+        yield from records
+
+        if len(records) < rows_wanted:
+            break
+
+        start += rows_wanted
+        if remaining is not None:
+            remaining -= len(records)
+
+
+def _find_block(records: List[Dict], block: List[Dict]) -> Optional[int]:
+    """Index where ``block`` starts in ``records``, or None."""
+    for i in range(len(records) - len(block) + 1):
+        if records[i:i + len(block)] == block:
+            return i
+    return None
+
+
+class StreamingExporter:
+    """Bounded-memory, optionally incremental export of a SheetsService.
+
+    New rows are always inserted at row 2, pushing older rows down while
+    an export pages through them. Each worksheet is exported as it stood
+    when its first page was read: later pages are read together with the
+    last ``overlap`` rows already exported and resume after wherever those
+    rows have moved to. The checkpoint keeps each worksheet's newest
+    ``overlap`` rows, and an incremental export stops where they begin.
+    """
+
+    def __init__(self, sheets_service, page_size: int = 5000, overlap: int = 10):
+        self.logger = logging.getLogger(__name__)
+        self.sheets_service = sheets_service
+        self.page_size = page_size
+        self.overlap = overlap
+
+    def _worksheets(self) -> list:
+        if getattr(self.sheets_service, 'partitions', None):
+            return self.sheets_service.partitions.partitions_between()
+        return [self.sheets_service.worksheet]
+
+    def _snapshot(self, worksheet) -> Iterator[Dict]:
+        """A worksheet's rows, newest first, as of its first page read."""
+        headers = worksheet.row_values(1)
+        if not headers:
+            return
+
+        start, tail = 2, []
+        while True:
+            rows_wanted = self.page_size + len(tail)
+            page = read_rows(worksheet, headers, start - len(tail), rows_wanted)
+            shift = _find_block(page, tail)
+            if shift is None:
+                raise RuntimeError(f"{worksheet.title} changed too much during the export; run it again")
+
+            fresh = page[shift + len(tail):]
+            yield from fresh
+
+            if len(page) < rows_wanted:
+                return
+            start += shift + len(fresh)
+            tail = (tail + fresh)[-self.overlap:]
+
+    @staticmethod
+    def load_checkpoint(checkpoint_path: Optional[str]) -> Dict:
+        if not checkpoint_path or not os.path.exists(checkpoint_path):
+            return {}
+        with open(checkpoint_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    @staticmethod
+    def save_checkpoint(checkpoint_path: str, checkpoint: Dict):
+        temp_path = f"{checkpoint_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f, ensure_ascii=False)
+        os.replace(temp_path, checkpoint_path)
+
+    def export(self, path: str, checkpoint_path: Optional[str] = None, incremental: bool = False) -> int:
+        previous = self.load_checkpoint(checkpoint_path) if incremental else {}
+        # Checkpoints from before anchors existed have none, so those worksheets are exported in full once
+        previous_anchors = previous.get('anchors', {})
+        anchors = {}
+
+        def records():
+            for worksheet in self._worksheets():
+                anchor = previous_anchors.get(worksheet.title) if incremental else None
+                newest = anchors[worksheet.title] = []
+                window = deque()
+
+                for record in self._snapshot(worksheet):
+                    if len(newest) < self.overlap:
+                        newest.append(record)
+                    if not anchor:
+                        yield record
+                        continue
+
+                    # Hold back enough rows to recognise the previous export's newest rows
+                    window.append(record)
+                    if len(window) == len(anchor):
+                        if list(window) == anchor:
+                            break
+                        yield window.popleft()
+                else:
+                    if anchor:
+                        self.logger.warning(f"Checkpoint rows not found in {worksheet.title}; exported it in full")
+                    yield from window
+
+        count = write_records(records(), path)
+
+        if checkpoint_path:
+            self.save_checkpoint(checkpoint_path, {
+                'anchors': {**previous_anchors, **anchors},
+                'exported_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'last_backup': os.path.basename(path)
+            })
+
+        self.logger.info(f"Exported {count} rows to {path}")
+        return count
+
+
+class BulkImporter:
+    """Restores a backup file into a worksheet in fixed-size chunks."""
+
+    def __init__(self, worksheet, chunk_size: int = 500):
+        self.logger = logging.getLogger(__name__)
+        self.worksheet = worksheet
+        self.chunk_size = chunk_size
+
+    def import_file(self, path: str) -> int:
+        headers = MessageModel.get_sheets_headers()
+        chunk = []
+        count = 0
+
+        # Backups are newest-first, so appending preserves sheet order
+        for record in read_records(path):
+            chunk.append([record.get(header, '') for header in headers])
+            if len(chunk) >= self.chunk_size:
+                self.worksheet.append_rows(chunk)
+                count += len(chunk)
+                chunk = []
+
+        if chunk:
+            self.worksheet.append_rows(chunk)
+            count += len(chunk)
+
+        self.logger.info(f"Imported {count} rows from {path}")
+        return count
@@ -0,0 +1,261 @@
+"""In-process stand-in for the part of gspread this project uses.
+
+Selected with ``SHEETS_BACKEND=fake``; benchmarks and tests construct it
+directly. Each API call can be given a fixed latency plus a cost that
+grows with the rows it touches (inserting at the top shifts every row
+below it, as on the real service), and per-minute read/write quotas
+that raise the same ``APIError`` 429 gspread raises.
+"""
+import os
+import random
+import threading
+import time
+from collections import Counter, deque
+from typing import Dict, List, Optional
+
+from gspread.exceptions import APIError, WorksheetNotFound
+from gspread.utils import a1_to_rowcol
+
+
+class FakeResponse:
+    """The slice of requests.Response that gspread's APIError reads."""
+
+    def __init__(self, code: int, message: str, status: str):
+        self.status_code = code
+        self.text = message
+        self._error = {'code': code, 'message': message, 'status': status}
+
+    def json(self):
+        return {'error': self._error}
+
+
+def api_error(code: int, message: str, status: str) -> APIError:
+    return APIError(FakeResponse(code, message, status))
+
+
+class QuotaWindow:
+    """Sliding one-minute request counter."""
+
+    def __init__(self, per_minute: Optional[int], clock=time.monotonic):
+        self.per_minute = per_minute
+        self.clock = clock
+        self._calls = deque()
+
+    def acquire(self, kind: str):
+        if not self.per_minute:
+            return
+        now = self.clock()
+        while self._calls and now - self._calls[0] >= 60:
+            self._calls.popleft()
+        if len(self._calls) >= self.per_minute:
+            raise api_error(
+                429,
+                f"Quota exceeded for quota metric '{kind.title()} requests' and limit "
+                f"'{kind.title()} requests per minute per user'",
+                'RESOURCE_EXHAUSTED'
+            )
+        self._calls.append(now)
+
+
+class FakeSheetsClient:
+    """Stand-in for ``gspread.Client``; spreadsheets are created on first open."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0,
+                 insert_cost_per_row: float = 0.0, read_cost_per_row: float = 0.0,
+                 write_quota: Optional[int] = None, read_quota: Optional[int] = None,
+                 seed: Optional[int] = None, sleep=time.sleep, clock=time.monotonic):
+        self.latency = latency
+        self.jitter = jitter
+        self.insert_cost_per_row = insert_cost_per_row
+        self.read_cost_per_row = read_cost_per_row
+        self.sleep = sleep
+        self.calls = Counter()
+        self.rejected = Counter()
+        self._random = random.Random(seed)
+        self._quotas = {
+            'write': QuotaWindow(write_quota, clock),
+            'read': QuotaWindow(read_quota, clock),
+        }
+        self._spreadsheets: Dict[str, 'FakeSpreadsheet'] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'FakeSheetsClient':
+        """Defaults approximate the Sheets API as seen from a small VM."""
+        def number(name, default):
+            return float(os.environ.get(name, default))
+
+        return cls(
+            latency=number('FAKE_SHEETS_LATENCY_MS', 150) / 1000,
+            jitter=number('FAKE_SHEETS_JITTER_MS', 50) / 1000,
+            insert_cost_per_row=number('FAKE_SHEETS_INSERT_COST_US', 5) / 1e6,
+            read_cost_per_row=number('FAKE_SHEETS_READ_COST_US', 2) / 1e6,
+            write_quota=int(number('FAKE_SHEETS_WRITE_QUOTA', 60)) or None,
+            read_quota=int(number('FAKE_SHEETS_READ_QUOTA', 300)) or None,
+        )
+
+    def open_by_key(self, key: str) -> 'FakeSpreadsheet':
+        with self._lock:
+            if key not in self._spreadsheets:
+                self._spreadsheets[key] = FakeSpreadsheet(self, key)
+            spreadsheet = self._spreadsheets[key]
+        self.request('read', 'open_by_key')
+        return spreadsheet
+
+    def request(self, kind: str, method: str, rows: int = 0, cost_per_row: float = 0.0):
+        """Account for one API call: quota check, then simulated latency."""
+        with self._lock:
+            self.calls[method] += 1
+            try:
+                self._quotas[kind].acquire(kind)
+            except APIError:
+                self.rejected[method] += 1
+                raise
+            delay = self.latency + rows * cost_per_row
+            if self.jitter:
+                delay += self._random.uniform(0, self.jitter)
+        if delay > 0:
+            self.sleep(delay)
+
+
+class FakeSpreadsheet:
+
+    def __init__(self, client: FakeSheetsClient, key: str):
+        self.client = client
+        self.id = key
+        self.title = f"Fake spreadsheet {key}"
+        self._worksheets: List['FakeWorksheet'] = [FakeWorksheet(self, 'Sheet1', 0, 1000, 26)]
+        self._lock = threading.Lock()
+
+    @property
+    def sheet1(self) -> 'FakeWorksheet':
+        return self._worksheets[0]
+
+    def worksheets(self) -> List['FakeWorksheet']:
+        self.client.request('read', 'worksheets')
+        return list(self._worksheets)
+
+    def worksheet(self, title: str) -> 'FakeWorksheet':
+        self.client.request('read', 'worksheet')
+        for worksheet in self._worksheets:
+            if worksheet.title == title:
+                return worksheet
+        raise WorksheetNotFound(title)
+
+    def add_worksheet(self, title: str, rows: int = 1000, cols: int = 26, index: Optional[int] = None):
+        self.client.request('write', 'add_worksheet')
+        with self._lock:
+            if any(worksheet.title == title for worksheet in self._worksheets):
+                raise api_error(
+                    400,
+                    f'Invalid requests[0].addSheet: A sheet with the name "{title}" already exists. '
+                    'Please enter another name.',
+                    'INVALID_ARGUMENT'
+                )
+            worksheet = FakeWorksheet(self, title, len(self._worksheets), rows, cols)
+            self._worksheets.append(worksheet)
+        return worksheet
+
+    def del_worksheet(self, worksheet: 'FakeWorksheet'):
+        self.client.request('write', 'del_worksheet')
+        with self._lock:
+            self._worksheets.remove(worksheet)
+
+
+class FakeWorksheet:
+    """Values are kept as given (like value_input_option RAW), rows as lists."""
+
+    def __init__(self, spreadsheet: FakeSpreadsheet, title: str, sheet_id: int, rows: int, cols: int):
+        self.spreadsheet = spreadsheet
+        self.client = spreadsheet.client
+        self.title = title
+        self.id = sheet_id
+        self.col_count = cols
+        self._min_rows = rows
+        self._rows: List[list] = []
+        self._lock = threading.Lock()
+
+    @property
+    def row_count(self) -> int:
+        return max(self._min_rows, len(self._rows))
+
+    def seed_rows(self, rows: List[list]):
+        """Load rows directly, without latency or quota (test and benchmark setup)."""
+        with self._lock:
+            self._rows.extend(list(row) for row in rows)
+
+    # Writes
+
+    def insert_row(self, values: list, index: int = 1, **kwargs):
+        return self.insert_rows([values], row=index, **kwargs)
+
+    def insert_rows(self, values: List[list], row: int = 1, **kwargs):
+        shifted = max(len(self._rows) - row + 1, 0)
+        self.client.request('write', 'insert_rows', shifted, self.client.insert_cost_per_row)
+        with self._lock:
+            while len(self._rows) < row - 1:
+                self._rows.append([])
+            self._rows[row - 1:row - 1] = [list(v) for v in values]
+
+    def append_row(self, values: list, **kwargs):
+        return self.append_rows([values], **kwargs)
+
+    def append_rows(self, values: List[list], **kwargs):
+        self.client.request('write', 'append_rows', len(values), self.client.insert_cost_per_row)
+        with self._lock:
+            self._rows.extend(list(v) for v in values)
+
+    def format(self, ranges, format_spec: dict, **kwargs):
+        self.client.request('write', 'format')
+
+    def clear(self):
+        self.client.request('write', 'clear')
+        with self._lock:
+            self._rows = []
+
+    # Reads
+
+    def _read(self, method: str, rows: int):
+        self.client.request('read', method, rows, self.client.read_cost_per_row)
+
+    def get_all_values(self, **kwargs) -> List[list]:
+        self._read('get_all_values', len(self._rows))
+        with self._lock:
+            return [list(row) for row in self._rows]
+
+    def get_all_records(self, head: int = 1, **kwargs) -> List[Dict]:
+        self._read('get_all_records', len(self._rows))
+        with self._lock:
+            if len(self._rows) < head:
+                return []
+            headers = self._rows[head - 1]
+            width = len(headers)
+            return [
+                dict(zip(headers, list(row[:width]) + [''] * (width - len(row))))
+                for row in self._rows[head:]
+            ]
+
+    def row_values(self, row: int, **kwargs) -> list:
+        self._read('row_values', 1)
+        with self._lock:
+            return list(self._rows[row - 1]) if row <= len(self._rows) else []
+
+    def col_values(self, col: int, **kwargs) -> list:
+        self._read('col_values', len(self._rows))
+        with self._lock:
+            values = [row[col - 1] if col <= len(row) else '' for row in self._rows]
+        while values and values[-1] == '':
+            values.pop()
+        return values
+
+    def get(self, range_name: str, **kwargs) -> List[list]:
+        start, _, end = range_name.partition(':')
+        first_row, first_col = a1_to_rowcol(start)
+        last_row, last_col = a1_to_rowcol(end or start)
+        with self._lock:
+            selected = [row[first_col - 1:last_col] for row in self._rows[first_row - 1:last_row]]
+        self._read('get', len(selected))
+        # Like the API, trailing empty rows are not returned
+        while selected and not any(selected[-1]):
+            selected.pop()
+        return selected
@@ -0,0 +1,40 @@
+import requests
+from requests.adapters import HTTPAdapter
+from linebot.http_client import RequestsHttpClient, RequestsHttpResponse
+
+
+class SessionHttpClient(RequestsHttpClient):
+    """LINE SDK HTTP client that reuses connections.
+
+    The SDK's default client calls ``requests.get``/``post`` directly, so
+    every reply pays a new TCP and TLS handshake to api.line.me. A shared
+    Session keeps connections alive; urllib3's pool is thread-safe, and
+    ``pool_size`` should match the number of worker threads.
+    """
+
+    def __init__(self, timeout=RequestsHttpClient.DEFAULT_TIMEOUT, pool_size: int = 10):
+        super().__init__(timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get(self, url, headers=None, params=None, stream=False, timeout=None):
+        return RequestsHttpResponse(self.session.get(
+            url, headers=headers, params=params, stream=stream, timeout=timeout or self.timeout
+        ))
+
+    def post(self, url, headers=None, data=None, timeout=None):
+        return RequestsHttpResponse(self.session.post(
+            url, headers=headers, data=data, timeout=timeout or self.timeout
+        ))
+
+    def delete(self, url, headers=None, data=None, timeout=None):
+        return RequestsHttpResponse(self.session.delete(
+            url, headers=headers, data=data, timeout=timeout or self.timeout
+        ))
+
+    def put(self, url, headers=None, data=None, timeout=None):
+        return RequestsHttpResponse(self.session.put(
+            url, headers=headers, data=data, timeout=timeout or self.timeout
+        ))
@@ -6,14 +6,22 @@ from linebot.exceptions import InvalidSignatureError, LineBotApiError
 from linebot.models import (
     MessageEvent, TextMessage, AudioMessage, ImageMessage,
     TextSendMessage, QuickReply, QuickReplyButton, MessageAction,
-    FlexSendMessage, BubbleContainer, BoxComponent, TextComponent,
+    FlexSendMessage, BubbleContainer, CarouselContainer, BoxComponent, TextComponent,
     ButtonComponent, URIAction
 )
 from config.settings import Config
 from app.models.message_model import MessageModel
-from app.services.sheets_service import SheetsService
+from app.services.storage import create_storage_service
 from app.services.speech_service import SpeechService
+from app.utils.cache import UserResponseCache
 from app.utils.helpers import sanitize_text, time_ago
+from app.utils.tracing import tracer, hash_user_id
+
+# Results per /search page; one carousel bubble each (LINE allows up to 12)
+SEARCH_PAGE_SIZE = 5
+# Longer queries are cut so alt_text (400 chars) and the "more" button's text (300) stay within
+# LINE's limits, and the button's next page searches the same text as this one
+SEARCH_QUERY_MAX = 100
 
 class LineService:
     def __init__(self):
@@ -23,9 +31,15 @@ class LineService:
         self.line_bot_api = LineBotApi(Config.LINE_CHANNEL_ACCESS_TOKEN)
         self.handler = WebhookHandler(Config.LINE_CHANNEL_SECRET)
         
+        # Record LINE API calls as child spans of the current webhook trace
+        for method in ('reply_message', 'push_message', 'get_message_content'):
+            setattr(self.line_bot_api, method, tracer.wrap(f"line.{method}", getattr(self.line_bot_api, method)))
+        
         # Initialize services
-        self.sheets_service = SheetsService()
+        self.sheets_service = create_storage_service()
         self.speech_service = SpeechService()
+        # Rendered /today, /stats, /tags and /related replies; a user's entries are dropped when they write
+        self.response_cache = UserResponseCache(Config.COMMAND_CACHE_MAX_USERS, Config.COMMAND_CACHE_TTL)
         
         # Setup event handlers
         self._setup_handlers()
@@ -33,22 +47,29 @@ class LineService:
     def _setup_handlers(self):
         @self.handler.add(MessageEvent, message=TextMessage)
         def handle_text_message(event):
-            self._handle_text_message(event)
+            with self._event_span(event, 'text', payload_size=len(event.message.text)):
+                self._handle_text_message(event)
         
         @self.handler.add(MessageEvent, message=AudioMessage)
         def handle_audio_message(event):
-            self._handle_audio_message(event)
+            with self._event_span(event, 'audio'):
+                self._handle_audio_message(event)
         
         @self.handler.add(MessageEvent, message=ImageMessage)
         def handle_image_message(event):
-            self._handle_image_message(event)
+            with self._event_span(event, 'image'):
+                self._handle_image_message(event)
+    
+    def _event_span(self, event, message_type: str, **attributes):
+        return tracer.span('event', message_type=message_type,
+                           user=hash_user_id(event.source.user_id), **attributes)
     
     def _handle_text_message(self, event):
         try:
             user_id = event.source.user_id
             text_content = event.message.text.strip()
             
-            self.logger.info(f"Received text message from {user_id}: {text_content[:50]}...")
+            self.logger.info(f"Received text message: {len(text_content)} chars")
             
             # Check for commands
             if text_content.startswith('/'):
@@ -64,7 +85,7 @@ class LineService:
             )
             
             # Save to Google Sheets
-            success = self.sheets_service.add_message(message)
+            success = self._save_message(message)
             
             # Send confirmation
             if success:
@@ -136,7 +157,7 @@ class LineService:
                 )
                 
                 # Save to Google Sheets
-                success = self.sheets_service.add_message(message)
+                success = self._save_message(message)
                 
                 if success:
                     reply_text = f"🎵 語音已轉換並記錄！\n\n📝 內容: {transcript}"
@@ -188,7 +209,7 @@ class LineService:
             )
             
             # Save to Google Sheets
-            success = self.sheets_service.add_message(message)
+            success = self._save_message(message)
             
             if success:
                 reply_text = "🖼️ 圖片已記錄！"
@@ -226,8 +247,12 @@ class LineService:
             elif command == '/tags' or command == '/標籤':
                 self._send_tags_summary(event, user_id)
             elif command.startswith('/search ') or command.startswith('/搜尋 '):
-                query = command_text[8:].strip() if command.startswith('/search ') else command_text[4:].strip()
-                self._send_search_results(event, user_id, query)
+                query, page = self._parse_search_args(command_text.split(None, 1)[1])
+                self._send_search_results(event, user_id, query, page)
+            elif command == '/related' or command == '/相關':
+                self._send_related_notes(event, user_id)
+            elif command.startswith('/related ') or command.startswith('/相關 '):
+                self._send_related_notes(event, user_id, command_text.split(None, 1)[1].strip())
             elif command == '/help' or command == '/幫助':
                 self._send_help_message(event)
             else:
@@ -243,111 +268,112 @@ class LineService:
                 TextSendMessage(text="❌ 指令執行失敗")
             )
     
-    def _send_today_summary(self, event, user_id):
+    def _save_message(self, message: MessageModel) -> bool:
         try:
-            recent_messages = self.sheets_service.get_recent_messages(user_id, days=1)
-            
-            if not recent_messages:
-                self.line_bot_api.reply_message(
-                    event.reply_token,
-                    TextSendMessage(text="📅 今日還沒有記錄任何靈感")
-                )
-                return
-            
-            summary_text = f"📅 今日靈感記錄 ({len(recent_messages)} 筆)\n\n"
-            
-            for i, msg in enumerate(recent_messages[:5], 1):
-                content = msg.get('content', '')[:50]
-                if len(msg.get('content', '')) > 50:
-                    content += "..."
-                
-                msg_time = datetime.fromisoformat(msg['timestamp'].replace('Z', '+00:00'))
-                time_str = msg_time.strftime('%H:%M')
-                
-                summary_text += f"{i}. [{time_str}] {content}\n"
-            
-            if len(recent_messages) > 5:
-                summary_text += f"\n... 還有 {len(recent_messages) - 5} 筆記錄"
-            
-            self.line_bot_api.reply_message(
-                event.reply_token,
-                TextSendMessage(text=summary_text)
-            )
-            
-        except Exception as e:
-            self.logger.error(f"Error sending today summary: {e}")
-            self.line_bot_api.reply_message(
-                event.reply_token,
-                TextSendMessage(text="❌ 無法取得今日記錄")
-            )
+            return self.sheets_service.add_message(message)
+        finally:
+            # Also after a failure: the row may have been written before the error
+            self.response_cache.invalidate(message.user_id)
     
-    def _send_user_statistics(self, event, user_id):
+    def _reply_cached(self, event, user_id, key, render, error_text):
         try:
-            stats = self.sheets_service.get_user_statistics(user_id)
-            
-            if not stats or stats.get('total_messages', 0) == 0:
-                self.line_bot_api.reply_message(
-                    event.reply_token,
-                    TextSendMessage(text="📊 還沒有任何記錄")
-                )
-                return
-            
-            stats_text = f"📊 您的靈感統計\n\n"
-            stats_text += f"📝 總記錄數: {stats['total_messages']}\n"
-            stats_text += f"🏷️ 標籤數量: {stats['tags_count']}\n"
-            
-            if stats['message_types']:
-                stats_text += f"\n📊 訊息類型:\n"
-                for msg_type, count in stats['message_types'].items():
-                    stats_text += f"  • {msg_type}: {count}\n"
-            
-            if stats['first_message']:
-                stats_text += f"\n📅 首次記錄: {stats['first_message']}"
-            
-            self.line_bot_api.reply_message(
-                event.reply_token,
-                TextSendMessage(text=stats_text)
-            )
-            
+            reply_text = self.response_cache.get_or_render(user_id, key, lambda: render(user_id))
         except Exception as e:
-            self.logger.error(f"Error sending user statistics: {e}")
-            self.line_bot_api.reply_message(
-                event.reply_token,
-                TextSendMessage(text="❌ 無法取得統計資料")
-            )
+            self.logger.error(f"Error rendering {key}: {e}")
+            reply_text = error_text
+        
+        self.line_bot_api.reply_message(
+            event.reply_token,
+            TextSendMessage(text=reply_text)
+        )
     
-    def _send_tags_summary(self, event, user_id):
-        try:
-            tags_stats = self.sheets_service.get_tags_statistics(user_id)
-            
-            if not tags_stats:
-                self.line_bot_api.reply_message(
-                    event.reply_token,
-                    TextSendMessage(text="🏷️ 還沒有任何標籤")
-                )
-                return
-            
-            tags_text = f"🏷️ 您的標籤統計 (共 {len(tags_stats)} 個)\n\n"
-            
-            for i, (tag, count) in enumerate(list(tags_stats.items())[:10], 1):
-                tags_text += f"{i}. #{tag}: {count} 次\n"
-            
-            if len(tags_stats) > 10:
-                tags_text += f"\n... 還有 {len(tags_stats) - 10} 個標籤"
+    def _send_today_summary(self, event, user_id):
+        # Keyed by date so a reply cached before midnight is not reused after it
+        self._reply_cached(event, user_id, ('today', datetime.now().date()),
+                           self._render_today_summary, "❌ 無法取得今日記錄")
+    
+    def _render_today_summary(self, user_id):
+        recent_messages = self.sheets_service.get_recent_messages(user_id, days=1)
+        
+        if not recent_messages:
+            return "📅 今日還沒有記錄任何靈感"
+        
+        summary_text = f"📅 今日靈感記錄 ({len(recent_messages)} 筆)\n\n"
+        
+        for i, msg in enumerate(recent_messages[:5], 1):
+            content = msg.get('content', '')[:50]
+            if len(msg.get('content', '')) > 50:
+                content += "..."
             
-            self.line_bot_api.reply_message(
-                event.reply_token,
-                TextSendMessage(text=tags_text)
-            )
+            msg_time = datetime.fromisoformat(msg['timestamp'].replace('Z', '+00:00'))
+            time_str = msg_time.strftime('%H:%M')
             
-        except Exception as e:
-            self.logger.error(f"Error sending tags summary: {e}")
-            self.line_bot_api.reply_message(
-                event.reply_token,
-                TextSendMessage(text="❌ 無法取得標籤資料")
-            )
+            summary_text += f"{i}. [{time_str}] {content}\n"
+        
+        if len(recent_messages) > 5:
+            summary_text += f"\n... 還有 {len(recent_messages) - 5} 筆記錄"
+        
+        return summary_text
     
-    def _send_search_results(self, event, user_id, query):
+    def _send_user_statistics(self, event, user_id):
+        self._reply_cached(event, user_id, 'stats', self._render_user_statistics, "❌ 無法取得統計資料")
+    
+    def _render_user_statistics(self, user_id):
+        stats = self.sheets_service.get_user_statistics(user_id)
+        
+        if not stats or stats.get('total_messages', 0) == 0:
+            return "📊 還沒有任何記錄"
+        
+        stats_text = f"📊 您的靈感統計\n\n"
+        stats_text += f"📝 總記錄數: {stats['total_messages']}\n"
+        stats_text += f"🏷️ 標籤數量: {stats['tags_count']}\n"
+        
+        if stats['message_types']:
+            stats_text += f"\n📊 訊息類型:\n"
+            for msg_type, count in stats['message_types'].items():
+                stats_text += f"  • {msg_type}: {count}\n"
+        
+        if stats.get('current_streak'):
+            stats_text += f"\n🔥 連續記錄: {stats['current_streak']} 天 (最長 {stats['longest_streak']} 天)"
+        
+        weekday_counts = stats.get('weekday_counts')
+        if weekday_counts and any(weekday_counts):
+            busiest = max(range(7), key=lambda day: weekday_counts[day])
+            stats_text += f"\n📆 最常記錄: 週{'一二三四五六日'[busiest]}"
+        
+        if stats['first_message']:
+            stats_text += f"\n📅 首次記錄: {stats['first_message']}"
+        
+        return stats_text
+    
+    def _send_tags_summary(self, event, user_id):
+        self._reply_cached(event, user_id, 'tags', self._render_tags_summary, "❌ 無法取得標籤資料")
+    
+    def _render_tags_summary(self, user_id):
+        tags_stats = self.sheets_service.get_tags_statistics(user_id)
+        
+        if not tags_stats:
+            return "🏷️ 還沒有任何標籤"
+        
+        tags_text = f"🏷️ 您的標籤統計 (共 {len(tags_stats)} 個)\n\n"
+        
+        for i, (tag, count) in enumerate(list(tags_stats.items())[:10], 1):
+            tags_text += f"{i}. #{tag}: {count} 次\n"
+        
+        if len(tags_stats) > 10:
+            tags_text += f"\n... 還有 {len(tags_stats) - 10} 個標籤"
+        
+        return tags_text
+    
+    @staticmethod
+    def _parse_search_args(args):
+        """'關鍵字 2' -> ('關鍵字', 2); a trailing number is the page"""
+        parts = args.strip().rsplit(None, 1)
+        if len(parts) == 2 and parts[1].isdigit():
+            return parts[0], max(1, int(parts[1]))
+        return args.strip(), 1
+    
+    def _send_search_results(self, event, user_id, query, page=1):
         try:
             if not query:
                 self.line_bot_api.reply_message(
@@ -356,33 +382,30 @@ class LineService:
                 )
                 return
             
-            results = self.sheets_service.search_messages(query, user_id)
+            query = query[:SEARCH_QUERY_MAX]
+            results, has_more = self.sheets_service.search_page(query, user_id, page, SEARCH_PAGE_SIZE)
             
             if not results:
+                text = f"🔍 沒有找到包含 '{query}' 的記錄" if page == 1 else f"🔍 '{query}' 沒有更多結果了"
                 self.line_bot_api.reply_message(
                     event.reply_token,
-                    TextSendMessage(text=f"🔍 沒有找到包含 '{query}' 的記錄")
+                    TextSendMessage(text=text)
                 )
                 return
             
-            search_text = f"🔍 搜尋結果: '{query}' (共 {len(results)} 筆)\n\n"
-            
-            for i, result in enumerate(results[:5], 1):
-                content = result.get('content', '')[:50]
-                if len(result.get('content', '')) > 50:
-                    content += "..."
-                
-                msg_time = datetime.fromisoformat(result['timestamp'].replace('Z', '+00:00'))
-                time_str = msg_time.strftime('%m/%d %H:%M')
-                
-                search_text += f"{i}. [{time_str}] {content}\n"
-            
-            if len(results) > 5:
-                search_text += f"\n... 還有 {len(results) - 5} 筆相符記錄"
+            quick_reply = None
+            if has_more:
+                quick_reply = QuickReply(items=[
+                    QuickReplyButton(action=MessageAction(label="➡️ 更多結果", text=f"/search {query} {page + 1}"))
+                ])
             
             self.line_bot_api.reply_message(
                 event.reply_token,
-                TextSendMessage(text=search_text)
+                FlexSendMessage(
+                    alt_text=f"🔍 搜尋結果: '{query}' 第 {page} 頁",
+                    contents=self._search_carousel(results, page),
+                    quick_reply=quick_reply
+                )
             )
             
         except Exception as e:
@@ -392,6 +415,61 @@ class LineService:
                 TextSendMessage(text="❌ 搜尋失敗")
             )
     
+    def _search_carousel(self, results, page):
+        bubbles = []
+        for i, result in enumerate(results, (page - 1) * SEARCH_PAGE_SIZE + 1):
+            msg_time = datetime.fromisoformat(str(result['timestamp']).replace('Z', '+00:00'))
+            contents = [
+                TextComponent(text=f"#{i} · {msg_time.strftime('%m/%d %H:%M')}", size='xs', color='#999999'),
+                TextComponent(text=result.get('content') or ' ', size='sm', wrap=True, max_lines=8),
+            ]
+            if result.get('tags'):
+                tags = ' '.join(f"#{tag.strip()}" for tag in str(result['tags']).split(',') if tag.strip())
+                contents.append(TextComponent(text=tags, size='xs', color='#1DB446', wrap=True))
+            bubbles.append(BubbleContainer(
+                size='kilo',
+                body=BoxComponent(layout='vertical', spacing='sm', contents=contents)
+            ))
+        return CarouselContainer(contents=bubbles)
+    
+    def _send_related_notes(self, event, user_id, text=None):
+        if text is None:
+            # Related to the latest note, so it only changes when the user writes
+            self._reply_cached(event, user_id, 'related', self._render_related_notes, "❌ 無法取得相關記錄")
+            return
+        
+        try:
+            reply_text = self._render_related_notes(user_id, text)
+        except Exception as e:
+            self.logger.error(f"Error rendering related notes: {e}")
+            reply_text = "❌ 無法取得相關記錄"
+        
+        self.line_bot_api.reply_message(
+            event.reply_token,
+            TextSendMessage(text=reply_text)
+        )
+    
+    def _render_related_notes(self, user_id, text=None):
+        related = self.sheets_service.find_related(user_id, text, limit=5)
+        
+        if not related:
+            return "🔗 沒有找到相關的記錄" if text else "🔗 最新一筆記錄還沒有相關的靈感"
+        
+        subject = text or "最新一筆記錄"
+        if len(subject) > 20:
+            subject = subject[:20] + "..."
+        related_text = f"🔗 與「{subject}」相關的靈感\n\n"
+        
+        for i, note in enumerate(related, 1):
+            content = note.get('content', '')[:50]
+            if len(note.get('content', '')) > 50:
+                content += "..."
+            
+            msg_time = datetime.fromisoformat(str(note['timestamp']).replace('Z', '+00:00'))
+            related_text += f"{i}. [{msg_time.strftime('%m/%d')}] {content} ({note['score']:.0%})\n"
+        
+        return related_text.strip()
+    
     def _send_help_message(self, event):
         help_text = """
 🤖 靈感筆記機器人使用說明
@@ -406,7 +484,8 @@ class LineService:
 • /today 或 /今日 → 查看今日記錄
 • /stats 或 /統計 → 查看統計資料  
 • /tags 或 /標籤 → 查看標籤統計
-• /search 關鍵字 → 搜尋記錄
+• /search 關鍵字 → 搜尋記錄（/search 關鍵字 2 看第 2 頁）
+• /related 或 /相關 → 找出與最新記錄相關的靈感（/related 文字 找與該文字相關的）
 • /help 或 /幫助 → 顯示此說明
 
 💡 小技巧:
@@ -423,12 +502,14 @@ class LineService:
             QuickReplyButton(action=MessageAction(label="📅 今日記錄", text="/今日")),
             QuickReplyButton(action=MessageAction(label="📊 統計", text="/統計")),
             QuickReplyButton(action=MessageAction(label="🏷️ 標籤", text="/標籤")),
+            QuickReplyButton(action=MessageAction(label="🔗 相關", text="/相關")),
             QuickReplyButton(action=MessageAction(label="❓ 幫助", text="/幫助"))
         ])
     
     def handle_webhook(self, body: str, signature: str):
         try:
-            self.handler.handle(body, signature)
+            with tracer.trace('webhook', payload_size=len(body)):
+                self.handler.handle(body, signature)
             return True
         except InvalidSignatureError:
             self.logger.error("Invalid signature")
@@ -0,0 +1,253 @@
+"""Speech-to-text and OCR backends behind a common interface.
+
+The Google implementations wrap Cloud Speech and Cloud Vision and build
+their client once. The stub implementations answer from a JSON fixture
+file with configurable latency, failure rate and per-encoding outcome,
+so the media pipeline can be exercised and benchmarked offline
+(``RECOGNITION_BACKEND=stub``).
+
+Fixture format::
+
+    {
+      "speech": {
+        "transcripts": ["..."],            # picked by hash of the audio bytes
+        "by_sha1": {"<sha1 of audio>": "..."},
+        "confidence": 0.9,
+        "encodings": {"MP3": "empty", "WEBM_OPUS": "error", "ENCODING_UNSPECIFIED": "ok"}
+      },
+      "vision": {"texts": ["..."], "by_sha1": {}}
+    }
+"""
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Encodings tried in order for LINE audio (m4a/AAC is not a Speech API encoding)
+SPEECH_ENCODINGS = ('MP3', 'WEBM_OPUS', 'ENCODING_UNSPECIFIED')
+
+DEFAULT_FIXTURES = {
+    'speech': {'transcripts': ['語音轉文字測試內容'], 'confidence': 0.9, 'encodings': {}},
+    'vision': {'texts': ['圖片文字辨識測試內容']},
+}
+
+
+class RecognitionError(Exception):
+    pass
+
+
+class SpeechResult(NamedTuple):
+    transcript: str
+    confidence: float
+
+
+class SpeechBackend:
+    name = 'base'
+
+    def recognize(self, audio: bytes, encoding: str, language_code: str = 'zh-TW',
+                  alternative_language_codes: Optional[List[str]] = None) -> Optional[SpeechResult]:
+        """Return the best transcript, or None when the audio yields no results."""
+        raise NotImplementedError
+
+    def probe(self):
+        """Cheap reachability check for health monitoring; raises when unavailable."""
+        raise NotImplementedError
+
+
+class OcrBackend:
+    name = 'base'
+
+    def detect_text(self, image: bytes) -> Optional[str]:
+        """Return all text found in the image, or None when there is none."""
+        raise NotImplementedError
+
+    def probe(self):
+        """Cheap reachability check for health monitoring; raises when unavailable."""
+        raise NotImplementedError
+
+
+class _GoogleClient:
+    """Builds the API client once; gRPC clients are thread-safe, so it is shared."""
+
+    def __init__(self, credentials_provider: Callable):
+        self.credentials_provider = credentials_provider
+        self._credentials = None
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _build(self, credentials):
+        raise NotImplementedError
+
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._credentials = self.credentials_provider()
+                    self._client = self._build(self._credentials)
+        return self._client
+
+    def probe(self):
+        # Refreshing the OAuth token checks credentials and the network path
+        # to Google without a billable recognition request
+        from google.auth.transport.requests import Request
+
+        self.client()
+        self._credentials.refresh(Request())
+
+
+class GoogleSpeechBackend(_GoogleClient, SpeechBackend):
+    name = 'google'
+
+    def _build(self, credentials):
+        from google.cloud import speech
+        return speech.SpeechClient(credentials=credentials)
+
+    def recognize(self, audio, encoding, language_code='zh-TW', alternative_language_codes=None):
+        from google.cloud import speech
+
+        config = speech.RecognitionConfig(
+            encoding=getattr(speech.RecognitionConfig.AudioEncoding, encoding),
+            language_code=language_code,
+            alternative_language_codes=alternative_language_codes or [],
+            enable_automatic_punctuation=True,
+        )
+        response = self.client().recognize(config=config, audio=speech.RecognitionAudio(content=audio))
+        if not response.results:
+            return None
+        best = response.results[0].alternatives[0]
+        return SpeechResult(best.transcript, best.confidence)
+
+
+class GoogleVisionBackend(_GoogleClient, OcrBackend):
+    name = 'google'
+
+    def _build(self, credentials):
+        from google.cloud import vision
+        return vision.ImageAnnotatorClient(credentials=credentials)
+
+    def detect_text(self, image):
+        from google.cloud import vision
+
+        response = self.client().text_detection(image=vision.Image(content=image))
+        if response.error.message:
+            raise RecognitionError(f"Vision API error: {response.error.message}")
+        if not response.text_annotations:
+            return None
+        # First annotation contains all detected text
+        return response.text_annotations[0].description
+
+
+def load_fixtures(path: Optional[str]) -> Dict:
+    if not path:
+        return DEFAULT_FIXTURES
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class _StubBehaviour:
+    """Latency and failure injection shared by the stub backends."""
+
+    def __init__(self, latency: float, jitter: float, failure_rate: float, seed: Optional[int]):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def simulate(self, service: str, count: bool = True):
+        with self._lock:
+            if count:
+                self.calls += 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+            failed = self._random.random() < self.failure_rate
+        if delay > 0:
+            time.sleep(delay)
+        if failed:
+            raise RecognitionError(f"503 UNAVAILABLE: simulated {service} failure")
+
+    @staticmethod
+    def pick(content: bytes, choices: List[str], by_sha1: Dict[str, str]) -> Optional[str]:
+        digest = hashlib.sha1(content).hexdigest()
+        if digest in by_sha1:
+            return by_sha1[digest]
+        if not choices:
+            return None
+        return choices[int(digest[:8], 16) % len(choices)]
+
+
+class StubSpeechBackend(SpeechBackend):
+    """Deterministic transcripts: the same audio bytes always give the same text."""
+
+    name = 'stub'
+
+    def __init__(self, fixtures: Optional[Dict] = None, latency: float = 0.0, jitter: float = 0.0,
+                 failure_rate: float = 0.0, seed: Optional[int] = None):
+        speech = (fixtures or DEFAULT_FIXTURES)['speech']
+        self.transcripts = speech.get('transcripts', [])
+        self.by_sha1 = speech.get('by_sha1', {})
+        self.confidence = speech.get('confidence', 0.9)
+        # encoding -> 'ok' | 'empty' (no results) | 'error' (API rejects the encoding)
+        self.encodings = speech.get('encodings', {})
+        self.behaviour = _StubBehaviour(latency, jitter, failure_rate, seed)
+
+    def recognize(self, audio, encoding, language_code='zh-TW', alternative_language_codes=None):
+        self.behaviour.simulate('speech')
+        outcome = self.encodings.get(encoding, 'ok')
+        if outcome == 'error':
+            raise RecognitionError(f"400 INVALID_ARGUMENT: bad encoding {encoding}")
+        if outcome == 'empty':
+            return None
+        transcript = self.behaviour.pick(audio, self.transcripts, self.by_sha1)
+        return SpeechResult(transcript, self.confidence) if transcript else None
+
+    def probe(self):
+        self.behaviour.simulate('speech', count=False)
+
+
+class StubOcrBackend(OcrBackend):
+    name = 'stub'
+
+    def __init__(self, fixtures: Optional[Dict] = None, latency: float = 0.0, jitter: float = 0.0,
+                 failure_rate: float = 0.0, seed: Optional[int] = None):
+        vision = (fixtures or DEFAULT_FIXTURES)['vision']
+        self.texts = vision.get('texts', [])
+        self.by_sha1 = vision.get('by_sha1', {})
+        self.behaviour = _StubBehaviour(latency, jitter, failure_rate, seed)
+
+    def detect_text(self, image):
+        self.behaviour.simulate('vision')
+        return self.behaviour.pick(image, self.texts, self.by_sha1)
+
+    def probe(self):
+        self.behaviour.simulate('vision', count=False)
+
+
+def _stub_settings(service: str) -> Dict:
+    prefix = f"STUB_{service.upper()}"
+    return {
+        'fixtures': load_fixtures(os.environ.get('RECOGNITION_FIXTURES')),
+        'latency': float(os.environ.get(f"{prefix}_LATENCY_MS", 0)) / 1000,
+        'jitter': float(os.environ.get(f"{prefix}_JITTER_MS", 0)) / 1000,
+        'failure_rate': float(os.environ.get('STUB_RECOGNITION_FAILURE_RATE', 0)),
+    }
+
+
+def create_speech_backend(credentials_provider: Callable) -> SpeechBackend:
+    if os.environ.get('RECOGNITION_BACKEND', 'google') == 'stub':
+        logger.info("Using stub speech recognition backend")
+        return StubSpeechBackend(**_stub_settings('speech'))
+    return GoogleSpeechBackend(credentials_provider)
+
+
+def create_ocr_backend(credentials_provider: Callable) -> OcrBackend:
+    if os.environ.get('RECOGNITION_BACKEND', 'google') == 'stub':
+        logger.info("Using stub OCR backend")
+        return StubOcrBackend(**_stub_settings('vision'))
+    return GoogleVisionBackend(credentials_provider)
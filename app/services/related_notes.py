@@ -0,0 +1,300 @@
+import logging
+import math
+import re
+import threading
+from array import array
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.models.message_model import MessageModel
+from app.utils.helpers import extract_keywords
+from app.utils.tracing import tracer
+
+_CJK_RUN = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+
+
+def tokenize(text: str, tags: Iterable[str] = ()) -> List[str]:
+    """Index terms for a note: CJK bigrams, keywords from extract_keywords, and tags.
+
+    CJK text has no spaces, so overlapping character pairs stand in for
+    words; extract_keywords would return a whole CJK run as one token,
+    so its CJK words are left to the bigrams.
+    """
+    terms = []
+    for run in _CJK_RUN.findall(text):
+        if len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    terms.extend(word for word in extract_keywords(text) if not _CJK_RUN.search(word))
+    terms.extend(f"#{tag.lower()}" for tag in tags)
+    return terms
+
+
+def _parse_tags(tags) -> List[str]:
+    if isinstance(tags, str):
+        return [tag.strip() for tag in tags.split(',') if tag.strip()]
+    return list(tags or ())
+
+
+class UserNoteIndex:
+    """Sparse TF-IDF vectors for one user's notes, appended in O(terms) per note.
+
+    Term weights are stored as sublinear term frequencies in per-term
+    posting arrays and IDF is applied at query time, so adding a note
+    never rewrites older vectors. Document norms do depend on IDF; with
+    ``idf = log(1 + N) + offset`` each squared norm splits into three
+    sums that only change on the postings of terms the new notes
+    contain, so a lookup right after a write stays as cheap as one
+    before it.
+    """
+
+    def __init__(self):
+        self.terms: Dict[str, int] = {}
+        self.notes: List[Dict] = []
+        self._posting_docs: List[array] = []
+        self._posting_weights: List[array] = []
+        self._df = array('i')
+        # Every (note, term, weight) triple in note order, for summing norms of new notes
+        self._entry_docs = array('i')
+        self._entry_terms = array('i')
+        self._entry_weights = array('f')
+        # Per-note sums of w², w²·offset and w²·offset², as of _synced_df
+        self._norm_sums = np.zeros((3, 0))
+        self._synced_df = np.zeros(0, dtype=np.intc)
+        self._synced_entries = 0
+        self._norms: Optional[np.ndarray] = None
+
+    def __len__(self):
+        return len(self.notes)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict]) -> 'UserNoteIndex':
+        index = cls()
+        for record in sorted(records, key=lambda record: str(record['timestamp'])):
+            index.add(record)
+        return index
+
+    def add(self, record: Dict):
+        """Index a stored record (dict with timestamp, message_type, content and tags)."""
+        doc = len(self.notes)
+        tags = _parse_tags(record.get('tags'))
+        content = str(record.get('content') or '')
+        self.notes.append({
+            'timestamp': str(record['timestamp']),
+            'message_type': record.get('message_type'),
+            'content': content,
+            'tags': ', '.join(tags),
+        })
+        counts = Counter(tokenize(content, tags))
+        terms, df = self.terms, self._df
+        posting_docs, posting_weights = self._posting_docs, self._posting_weights
+        term_ids, weights = [], []
+        for term, count in counts.items():
+            term_id = terms.get(term)
+            if term_id is None:
+                term_id = terms[term] = len(df)
+                posting_docs.append(array('i'))
+                posting_weights.append(array('f'))
+                df.append(0)
+            weight = 1.0 if count == 1 else 1.0 + math.log(count)
+            posting_docs[term_id].append(doc)
+            posting_weights[term_id].append(weight)
+            df[term_id] += 1
+            term_ids.append(term_id)
+            weights.append(weight)
+        self._entry_docs.extend([doc] * len(term_ids))
+        self._entry_terms.extend(term_ids)
+        self._entry_weights.extend(weights)
+        self._norms = None
+
+    def _idf_offsets(self) -> np.ndarray:
+        return 1.0 - np.log1p(np.frombuffer(self._df, dtype=np.intc).astype(np.float64))
+
+    def _sync_norm_sums(self, offsets: np.ndarray):
+        synced = self._norm_sums.shape[1]
+        df = np.frombuffer(self._df, dtype=np.intc)
+        synced_df = self._synced_df
+        for term_id in np.flatnonzero(df[:len(synced_df)] != synced_df):
+            # Postings are in note order, so the first df entries at the last sync are the synced notes
+            count = int(synced_df[term_id])
+            old, new = 1.0 - math.log1p(count), offsets[term_id]
+            docs = np.frombuffer(self._posting_docs[term_id], dtype=np.intc, count=count)
+            squared = np.frombuffer(self._posting_weights[term_id], dtype=np.float32, count=count).astype(np.float64) ** 2
+            self._norm_sums[1, docs] += squared * (new - old)
+            self._norm_sums[2, docs] += squared * (new * new - old * old)
+
+        begin = self._synced_entries
+        if begin < len(self._entry_docs):
+            docs = np.frombuffer(self._entry_docs, dtype=np.intc)[begin:] - synced
+            squared = np.frombuffer(self._entry_weights, dtype=np.float32)[begin:].astype(np.float64) ** 2
+            term_offsets = offsets[np.frombuffer(self._entry_terms, dtype=np.intc)[begin:]]
+            length = len(self.notes) - synced
+            added = [np.bincount(docs, weights=weights, minlength=length)
+                     for weights in (squared, squared * term_offsets, squared * term_offsets * term_offsets)]
+            self._norm_sums = np.concatenate([self._norm_sums, np.array(added)], axis=1)
+        elif len(self.notes) > synced:
+            # Only empty notes were added
+            self._norm_sums = np.pad(self._norm_sums, ((0, 0), (0, len(self.notes) - synced)))
+        self._synced_df = df.copy()
+        self._synced_entries = len(self._entry_docs)
+
+    def _doc_norms(self, offsets: np.ndarray) -> np.ndarray:
+        if self._norms is None:
+            self._sync_norm_sums(offsets)
+            scale = math.log1p(len(self.notes))
+            squared = scale * scale * self._norm_sums[0] + 2 * scale * self._norm_sums[1] + self._norm_sums[2]
+            self._norms = np.sqrt(np.maximum(squared, 0.0))
+            # An empty note has no terms and can never match; avoid dividing by zero
+            self._norms[self._norms == 0] = 1.0
+        return self._norms
+
+    def related(self, text: Optional[str] = None, limit: int = 5, tags: Iterable[str] = ()) -> List[Dict]:
+        """Notes most similar to ``text`` by cosine similarity, best first.
+
+        Without text the latest note is the query and is itself excluded.
+        Each result is the stored record plus a ``score`` between 0 and 1.
+        """
+        exclude = None
+        if text is None:
+            if not self.notes:
+                return []
+            exclude = len(self.notes) - 1
+            latest = self.notes[exclude]
+            text, tags = latest['content'], _parse_tags(latest['tags'])
+
+        query = {}
+        for term, count in Counter(tokenize(text, tags)).items():
+            term_id = self.terms.get(term)
+            if term_id is not None:
+                query[term_id] = 1.0 + math.log(count)
+        if not query:
+            return []
+
+        offsets = self._idf_offsets()
+        idf = math.log1p(len(self.notes)) + offsets
+        scores = np.zeros(len(self.notes), dtype=np.float32)
+        query_norm = 0.0
+        for term_id, weight in query.items():
+            weight *= idf[term_id]
+            query_norm += weight * weight
+            # A note appears at most once per posting list, so fancy-index += is exact
+            docs = np.frombuffer(self._posting_docs[term_id], dtype=np.intc)
+            scores[docs] += np.frombuffer(self._posting_weights[term_id], dtype=np.float32) * (weight * idf[term_id])
+        scores /= self._doc_norms(offsets) * math.sqrt(query_norm)
+        if exclude is not None:
+            scores[exclude] = 0.0
+
+        candidates = int(np.count_nonzero(scores > 0))
+        limit = min(limit, candidates)
+        if limit <= 0:
+            return []
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [dict(self.notes[doc], score=round(float(scores[doc]), 4)) for doc in top]
+
+
+class RelatedNotesIndex:
+    """Per-user UserNoteIndex, built from storage on first lookup.
+
+    ``source(user_id)`` returns that user's stored records. Up to
+    ``max_users`` indexes are kept, least recently used dropped first;
+    notes written for a user whose index is loaded are added as they
+    arrive, others are picked up from storage when the index is built.
+
+    The process-wide lock only guards the user table. Builds run outside
+    it, one at a time per user, and each index has its own lock for
+    adds and lookups, so a cold build never holds up writes or other
+    users' lookups. Notes written for a user while their index is being
+    built are held and added afterwards unless the build already read
+    them from storage.
+    """
+
+    def __init__(self, source: Callable[[str], Iterable[Dict]], max_users: int = 200):
+        self.logger = logging.getLogger(__name__)
+        self.source = source
+        self.max_users = max_users
+        # user -> (index, lock for that index)
+        self._users: 'OrderedDict[str, Tuple[UserNoteIndex, threading.Lock]]' = OrderedDict()
+        # user -> (build lock, notes written during the build)
+        self._building: Dict[str, Tuple[threading.Lock, List[Dict]]] = {}
+        self._lock = threading.Lock()
+
+    def _entry_for(self, user_id: str) -> Tuple[UserNoteIndex, threading.Lock]:
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None:
+                self._users.move_to_end(user_id)
+                return entry
+            build = self._building.get(user_id)
+            if build is None:
+                build = self._building[user_id] = (threading.Lock(), [])
+
+        with build[0]:
+            with self._lock:
+                entry = self._users.get(user_id)
+                if entry is not None:
+                    # Built by a concurrent lookup while this one waited
+                    return entry
+            try:
+                with tracer.span('related.build') as span:
+                    index = UserNoteIndex.from_records(self.source(user_id))
+                    span.set_attribute('notes', len(index))
+            except Exception:
+                with self._lock:
+                    self._building.pop(user_id, None)
+                raise
+            self.logger.info(f"Related-notes index built from {len(index)} stored notes")
+
+            with self._lock:
+                _, written = self._building.pop(user_id)
+                self._add_unseen(index, written)
+                entry = self._users[user_id] = (index, threading.Lock())
+                if len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+            return entry
+
+    @staticmethod
+    def _add_unseen(index: UserNoteIndex, records: List[Dict]):
+        """Add notes written during a build that the build's storage read missed."""
+        if not records:
+            return
+        earliest = min(record['timestamp'] for record in records)
+        seen = Counter()
+        for note in reversed(index.notes):
+            if note['timestamp'] < earliest:
+                break
+            seen[note['timestamp'], note['content']] += 1
+        for record in records:
+            key = (record['timestamp'], record['content'])
+            if seen[key]:
+                seen[key] -= 1
+            else:
+                index.add(record)
+
+    def record(self, message: MessageModel):
+        """Index a note that has just been stored."""
+        self.record_rows([message.to_sheets_row()])
+
+    def record_rows(self, rows: Iterable[list]):
+        """Index prepared sheet rows (MessageModel.to_sheets_row layout) that have just been stored."""
+        loaded = []
+        with self._lock:
+            for row in rows:
+                record = {'timestamp': row[0], 'message_type': row[1], 'content': row[2], 'tags': row[4]}
+                entry = self._users.get(row[3])
+                if entry is not None:
+                    loaded.append((entry, record))
+                elif row[3] in self._building:
+                    self._building[row[3]][1].append(record)
+        for (index, lock), record in loaded:
+            with lock:
+                index.add(record)
+
+    def related(self, user_id: str, text: Optional[str] = None, limit: int = 5) -> List[Dict]:
+        index, lock = self._entry_for(user_id)
+        with lock:
+            with tracer.span('related', notes=len(index)):
+                return index.related(text, limit)
@@ -0,0 +1,175 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from app.models.message_model import MessageModel
+
+
+class SheetPartitionManager:
+    """Monthly worksheet partitions plus a catalog worksheet listing them.
+
+    Each month gets its own worksheet (``Inspiration_Notes_2024_05``) so no
+    single worksheet grows toward the Sheets cell limit, and queries only
+    read the partitions covering the requested time range.
+    """
+
+    CATALOG_TITLE = 'Partition_Catalog'
+    CATALOG_HEADERS = ['partition', 'month', 'created_at']
+    CATALOG_REFRESH_SECONDS = 60
+
+    def __init__(self,
+                 spreadsheet,
+                 prefix: str = 'Inspiration_Notes',
+                 rows: int = 1000,
+                 cols: int = 10,
+                 max_workers: int = 4,
+                 header_initializer: Optional[Callable] = None):
+        self.logger = logging.getLogger(__name__)
+        self.spreadsheet = spreadsheet
+        self.prefix = prefix
+        self.rows = rows
+        self.cols = cols
+        self.max_workers = max_workers
+        self.header_initializer = header_initializer
+        self.catalog = None
+        self._lock = threading.RLock()
+        self._months: Dict[str, str] = {}
+        self._worksheets: Dict[str, object] = {}
+        self._catalog_loaded_at = 0.0
+        self._load_catalog()
+
+    @staticmethod
+    def month_key(dt: datetime) -> str:
+        return dt.strftime('%Y-%m')
+
+    def partition_title(self, month: str) -> str:
+        return f"{self.prefix}_{month.replace('-', '_')}"
+
+    def _load_catalog(self):
+        # The spreadsheet is a gspread object, so this import is already loaded
+        from gspread.exceptions import WorksheetNotFound
+
+        with self._lock:
+            try:
+                self.catalog = self.spreadsheet.worksheet(self.CATALOG_TITLE)
+            except WorksheetNotFound:
+                self.catalog = self.spreadsheet.add_worksheet(
+                    title=self.CATALOG_TITLE,
+                    rows=100,
+                    cols=len(self.CATALOG_HEADERS)
+                )
+                self.catalog.insert_row(self.CATALOG_HEADERS, 1)
+            self._refresh_catalog()
+
+    def _refresh_catalog(self):
+        records = self.catalog.get_all_records()
+        self._months = {
+            str(record['month']): str(record['partition'])
+            for record in records
+            if record.get('month') and record.get('partition')
+        }
+        self._catalog_loaded_at = time.monotonic()
+
+    def _open_worksheet(self, month: str):
+        worksheet = self._worksheets.get(month)
+        if worksheet is None:
+            worksheet = self.spreadsheet.worksheet(self._months[month])
+            self._worksheets[month] = worksheet
+        return worksheet
+
+    def get_partition(self, dt: Optional[datetime] = None, create: bool = True):
+        month = self.month_key(dt or datetime.now())
+
+        with self._lock:
+            if month in self._worksheets:
+                return self._worksheets[month]
+
+            if month not in self._months:
+                # Another worker may have rolled over already
+                self._refresh_catalog()
+
+            if month in self._months:
+                return self._open_worksheet(month)
+
+            if not create:
+                return None
+
+            return self._create_partition(month)
+
+    def _create_partition(self, month: str):
+        from gspread.exceptions import APIError
+
+        title = self.partition_title(month)
+
+        try:
+            worksheet = self.spreadsheet.add_worksheet(
+                title=title,
+                rows=self.rows,
+                cols=self.cols
+            )
+            if self.header_initializer:
+                self.header_initializer(worksheet)
+            else:
+                worksheet.insert_row(MessageModel.get_sheets_headers(), 1)
+            self.logger.info(f"Created partition {title}")
+        except APIError as e:
+            # Lost a rollover race against another worker
+            self.logger.warning(f"Partition {title} could not be created, reusing existing: {e}")
+            worksheet = self.spreadsheet.worksheet(title)
+
+        self._refresh_catalog()
+        if month not in self._months:
+            self.catalog.append_row([title, month, datetime.now().strftime('%Y-%m-%d %H:%M:%S')])
+            self._months[month] = title
+
+        self._worksheets[month] = worksheet
+        return worksheet
+
+    def list_months(self) -> List[str]:
+        with self._lock:
+            return sorted(self._months, reverse=True)
+
+    def partitions_between(self,
+                           start: Optional[datetime] = None,
+                           end: Optional[datetime] = None) -> list:
+        start_month = self.month_key(start) if start else None
+        end_month = self.month_key(end) if end else None
+
+        with self._lock:
+            latest_month = end_month or self.month_key(datetime.now())
+            catalog_age = time.monotonic() - self._catalog_loaded_at
+            if latest_month not in self._months and catalog_age > self.CATALOG_REFRESH_SECONDS:
+                self._refresh_catalog()
+
+            worksheets = []
+            for month in self.list_months():
+                if start_month and month < start_month:
+                    continue
+                if end_month and month > end_month:
+                    continue
+                worksheets.append(self._open_worksheet(month))
+
+        return worksheets
+
+    def fetch_records(self, worksheets: list) -> List[Dict]:
+        if not worksheets:
+            return []
+
+        if len(worksheets) == 1:
+            return worksheets[0].get_all_records()
+
+        # Fan out across partitions; results keep newest-first partition order
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(worksheets))) as executor:
+            results = executor.map(lambda ws: ws.get_all_records(), worksheets)
+            records = []
+            for partition_records in results:
+                records.extend(partition_records)
+
+        return records
+
+    def get_records(self,
+                    start: Optional[datetime] = None,
+                    end: Optional[datetime] = None) -> List[Dict]:
+        return self.fetch_records(self.partitions_between(start, end))
@@ -1,12 +1,17 @@
-import gspread
-from google.oauth2.service_account import Credentials
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Iterator, Optional, Any, Tuple
+import heapq
+import itertools
 import logging
 from datetime import datetime, timedelta
 import pandas as pd
 from config.settings import Config
 from app.models.message_model import MessageModel
+from app.services.backup_service import StreamingExporter
+from app.services.related_notes import UserNoteIndex
+from app.services.sheet_partitions import SheetPartitionManager
 from app.utils.helpers import sanitize_text
+from app.utils.metrics import metrics
+from app.utils.tracing import tracer
 import json
 import os
 
@@ -16,10 +21,27 @@ class SheetsService:
         self.client = None
         self.sheet = None
         self.worksheet = None
+        self.partitions = None
+        # Per-user aggregates behind /stats and /tags, attached by create_storage_service
+        self.user_stats = None
+        # Per-user TF-IDF index behind /related, attached by create_storage_service
+        self.related_notes = None
         self._initialize_client()
     
     def _initialize_client(self):
         try:
+            if Config.SHEETS_BACKEND == 'fake':
+                from app.services.fake_sheets import FakeSheetsClient
+                self.client = FakeSheetsClient.from_env()
+                self.logger.info("Using in-process fake Google Sheets backend")
+                self._open_spreadsheet()
+                return
+            
+            # Loaded here rather than at import: gspread and google-auth pull in
+            # most of the startup cost, and are not needed for the fake backend
+            import gspread
+            from google.oauth2.service_account import Credentials
+            
             credentials = None
             
             # 優先使用環境變數中的 JSON 憑證（更安全）
@@ -61,15 +83,29 @@ class SheetsService:
             self.logger.error(f"Failed to initialize Google Sheets client: {e}")
     
     def _open_spreadsheet(self):
+        from gspread.exceptions import WorksheetNotFound
+
         try:
             self.sheet = self.client.open_by_key(Config.GOOGLE_SHEET_ID)
             
+            if Config.SHEETS_PARTITION_MODE == 'monthly':
+                # One worksheet per month, created automatically at rollover
+                self.partitions = SheetPartitionManager(
+                    self.sheet,
+                    prefix=Config.SHEETS_WORKSHEET_PREFIX,
+                    max_workers=Config.SHEETS_QUERY_WORKERS,
+                    header_initializer=self._setup_headers
+                )
+                self.worksheet = self.partitions.get_partition(datetime.now())
+                self.logger.info("Spreadsheet opened successfully (monthly partitions)")
+                return
+            
             # Get or create main worksheet
             try:
-                self.worksheet = self.sheet.worksheet("Inspiration_Notes")
-            except gspread.WorksheetNotFound:
+                self.worksheet = self.sheet.worksheet(Config.SHEETS_WORKSHEET_PREFIX)
+            except WorksheetNotFound:
                 self.worksheet = self.sheet.add_worksheet(
-                    title="Inspiration_Notes", 
+                    title=Config.SHEETS_WORKSHEET_PREFIX, 
                     rows=1000, 
                     cols=10
                 )
@@ -80,13 +116,14 @@ class SheetsService:
         except Exception as e:
             self.logger.error(f"Failed to open spreadsheet: {e}")
     
-    def _setup_headers(self):
+    def _setup_headers(self, worksheet=None):
         try:
+            worksheet = worksheet or self.worksheet
             headers = MessageModel.get_sheets_headers()
-            self.worksheet.insert_row(headers, 1)
+            worksheet.insert_row(headers, 1)
             
             # Format headers
-            self.worksheet.format("A1:F1", {
+            worksheet.format("A1:F1", {
                 "backgroundColor": {"red": 0.8, "green": 0.8, "blue": 0.8},
                 "textFormat": {"bold": True}
             })
@@ -106,18 +143,24 @@ class SheetsService:
                 self.logger.error("Invalid message data")
                 return False
             
-            # Sanitize content
-            sanitized_content = sanitize_text(message.content)
-            message.content = sanitized_content
-            message.processed_content = sanitize_text(message.processed_content)
+            # Sanitize content once; processed_content is re-derived from it
+            message.content = sanitize_text(message.content)
             
             # Prepare row data
             row_data = message.to_sheets_row()
             
             # Insert row
-            self.worksheet.insert_row(row_data, 2)  # Insert at row 2 (after headers)
+            with tracer.span('sheets.sheet_write', rows=1), \
+                    metrics.external_call('sheets', 'sheet_write', event_type=message.message_type):
+                worksheet = self._worksheet_for(message.timestamp)
+                worksheet.insert_row(row_data, 2)  # Insert at row 2 (after headers)
+            
+            if self.user_stats:
+                self.user_stats.record(message)
+            if self.related_notes:
+                self.related_notes.record(message)
             
-            self.logger.info(f"Message added to sheet: {message.get_summary()}")
+            self.logger.info(f"Message added to sheet: {message.message_type}, {len(message.content)} chars")
             return True
             
         except Exception as e:
@@ -125,41 +168,75 @@ class SheetsService:
             return False
     
     def add_messages_batch(self, messages: List[MessageModel]) -> int:
+        return len(self.write_messages(messages))
+    
+    def write_messages(self, messages: List[MessageModel]) -> List[MessageModel]:
+        """Insert messages with one write call per worksheet; returns the messages stored.
+        
+        A failed write stops the batch, and the messages already stored by
+        earlier writes are still returned, so callers retry only the rest.
+        """
+        written = []
         try:
-            if not messages:
-                return 0
-            
             valid_messages = [msg for msg in messages if msg.is_valid()]
             if not valid_messages:
-                return 0
+                return written
             
-            # Prepare batch data
-            rows_data = []
+            # Prepare batch data, grouped by target worksheet
+            batches = {}
             for message in valid_messages:
-                sanitized_content = sanitize_text(message.content)
-                message.content = sanitized_content
-                message.processed_content = sanitize_text(message.processed_content)
-                rows_data.append(message.to_sheets_row())
+                message.content = sanitize_text(message.content)
+                worksheet = self._worksheet_for(message.timestamp)
+                batches.setdefault(worksheet.title, (worksheet, []))[1].append(message)
             
             # Insert batch
-            if rows_data:
-                self.worksheet.insert_rows(rows_data, 2)
-                self.logger.info(f"Added {len(rows_data)} messages to sheet")
-                return len(rows_data)
-            
-            return 0
+            for worksheet, batch in batches.values():
+                rows_data = [message.to_sheets_row() for message in batch]
+                worksheet.insert_rows(rows_data, 2)
+                written.extend(batch)
+                if self.user_stats:
+                    self.user_stats.record_rows(rows_data)
+                if self.related_notes:
+                    self.related_notes.record_rows(rows_data)
+            
+            if written:
+                self.logger.info(f"Added {len(written)} messages to sheet")
             
         except Exception as e:
-            self.logger.error(f"Failed to add messages batch: {e}")
+            self.logger.error(f"Failed to add messages batch after {len(written)} rows: {e}")
+        return written
+    
+    def append_rows(self, rows: List[list]) -> int:
+        """Append prepared sheet rows below existing data, one write call per worksheet.
+        
+        Unlike add_messages_batch, API errors are raised so bulk loaders can retry.
+        """
+        if not self.worksheet or not rows:
             return 0
+        
+        batches = {}
+        for row in rows:
+            timestamp = datetime.strptime(row[0], '%Y-%m-%d %H:%M:%S')
+            worksheet = self._worksheet_for(timestamp)
+            batches.setdefault(worksheet.title, (worksheet, []))[1].append(row)
+        
+        for worksheet, worksheet_rows in batches.values():
+            worksheet.append_rows(worksheet_rows)
+            if self.user_stats:
+                self.user_stats.record_rows(worksheet_rows)
+            if self.related_notes:
+                self.related_notes.record_rows(worksheet_rows)
+        
+        return len(rows)
     
     def get_recent_messages(self, user_id: Optional[str] = None, days: int = 7) -> List[Dict]:
         try:
             if not self.worksheet:
                 return []
             
-            # Get all data
-            all_data = self.worksheet.get_all_records()
+            # Get all data in range
+            cutoff_date = datetime.now() - timedelta(days=days)
+            all_data = self._get_records(since=cutoff_date)
             
             if not all_data:
                 return []
@@ -168,7 +245,6 @@ class SheetsService:
             df = pd.DataFrame(all_data)
             
             # Filter by date
-            cutoff_date = datetime.now() - timedelta(days=days)
             df['timestamp'] = pd.to_datetime(df['timestamp'])
             df = df[df['timestamp'] >= cutoff_date]
             
@@ -190,42 +266,81 @@ class SheetsService:
             if not self.worksheet or not query.strip():
                 return []
             
-            all_data = self.worksheet.get_all_records()
+            all_data = self._get_records()
             if not all_data:
                 return []
             
-            df = pd.DataFrame(all_data)
+            with tracer.span('dataframe', operation='search', rows=len(all_data)):
+                df = pd.DataFrame(all_data)
+                
+                # Filter by user if specified
+                if user_id:
+                    df = df[df['user_id'] == user_id]
+                
+                # Search in content (case-insensitive)
+                query_lower = query.lower()
+                mask = df['content'].str.lower().str.contains(query_lower, na=False)
+                
+                # Also search in tags
+                tag_mask = df['tags'].str.lower().str.contains(query_lower, na=False)
+                
+                # Combine masks
+                combined_mask = mask | tag_mask
+                result_df = df[combined_mask]
+                
+                # Sort by timestamp (newest first)
+                result_df = result_df.sort_values('timestamp', ascending=False)
+                
+                return result_df.to_dict('records')
             
-            # Filter by user if specified
-            if user_id:
-                df = df[df['user_id'] == user_id]
+        except Exception as e:
+            self.logger.error(f"Failed to search messages: {e}")
+            return []
+    
+    def search_page(self, query: str, user_id: Optional[str] = None, page: int = 1,
+                    page_size: int = 5) -> Tuple[List[Dict], bool]:
+        """One page of matches, newest first, and whether another page follows.
+        
+        Monthly partitions are read newest first, ``SHEETS_QUERY_WORKERS``
+        at a time in parallel, and reading stops after the batch that fills
+        this page: older partitions only hold older notes. Without
+        partitions the whole sheet is read on every call.
+        """
+        try:
+            if not self.worksheet or not query.strip():
+                return [], False
             
-            # Search in content (case-insensitive)
             query_lower = query.lower()
-            mask = df['content'].str.lower().str.contains(query_lower, na=False)
-            
-            # Also search in tags
-            tag_mask = df['tags'].str.lower().str.contains(query_lower, na=False)
-            
-            # Combine masks
-            combined_mask = mask | tag_mask
-            result_df = df[combined_mask]
-            
-            # Sort by timestamp (newest first)
-            result_df = result_df.sort_values('timestamp', ascending=False)
-            
-            return result_df.to_dict('records')
+            wanted = page * page_size + 1
+            top, scanned = [], 0
+            with tracer.span('search', page=page) as span:
+                for records in self._records_newest_first():
+                    scanned += len(records)
+                    matches = (
+                        record for record in records
+                        if (not user_id or record['user_id'] == user_id)
+                        and (query_lower in str(record['content']).lower() or query_lower in str(record['tags']).lower())
+                    )
+                    top = heapq.nlargest(wanted, itertools.chain(top, matches), key=lambda record: str(record['timestamp']))
+                    if len(top) >= wanted:
+                        break
+                span.set_attribute('rows', scanned)
+            rows = top[(page - 1) * page_size:]
+            return rows[:page_size], len(rows) > page_size
             
         except Exception as e:
             self.logger.error(f"Failed to search messages: {e}")
-            return []
+            return [], False
     
     def get_tags_statistics(self, user_id: Optional[str] = None) -> Dict[str, int]:
         try:
             if not self.worksheet:
                 return {}
             
-            all_data = self.worksheet.get_all_records()
+            if user_id and self.user_stats:
+                return self.user_stats.get_tags(user_id)
+            
+            all_data = self._get_records()
             if not all_data:
                 return {}
             
@@ -257,7 +372,10 @@ class SheetsService:
             if not self.worksheet:
                 return {}
             
-            all_data = self.worksheet.get_all_records()
+            if self.user_stats:
+                return self.user_stats.get(user_id)
+            
+            all_data = self._get_records()
             if not all_data:
                 return {}
             
@@ -291,16 +409,15 @@ class SheetsService:
             self.logger.error(f"Failed to get user statistics: {e}")
             return {}
     
-    def backup_data(self, backup_path: str) -> bool:
+    def backup_data(self, backup_path: str, checkpoint_path: Optional[str] = None,
+                    incremental: bool = False) -> bool:
         try:
             if not self.worksheet:
                 return False
             
-            all_data = self.worksheet.get_all_records()
-            
-            # Save as JSON
-            with open(backup_path, 'w', encoding='utf-8') as f:
-                json.dump(all_data, f, ensure_ascii=False, indent=2, default=str)
+            # Page through the sheet and stream rows to JSONL/CSV (optionally gzip/zstd)
+            exporter = StreamingExporter(self)
+            exporter.export(backup_path, checkpoint_path=checkpoint_path, incremental=incremental)
             
             self.logger.info(f"Data backed up to {backup_path}")
             return True
@@ -309,6 +426,59 @@ class SheetsService:
             self.logger.error(f"Failed to backup data: {e}")
             return False
     
+    def _worksheet_for(self, timestamp: Optional[datetime] = None):
+        if self.partitions:
+            return self.partitions.get_partition(timestamp or datetime.now())
+        return self.worksheet
+    
+    def _get_records(self, since: Optional[datetime] = None) -> List[Dict]:
+        with tracer.span('sheets.get_all_records') as span:
+            if self.partitions:
+                records = self.partitions.get_records(start=since)
+            else:
+                records = self.worksheet.get_all_records()
+            span.set_attribute('rows', len(records))
+            return records
+    
+    def _records_newest_first(self) -> Iterator[List[Dict]]:
+        """Records in batches of max_workers partitions fetched in parallel, newest months first;
+        the whole sheet when unpartitioned."""
+        if not self.partitions:
+            yield self._get_records()
+            return
+        worksheets = self.partitions.partitions_between()
+        batch_size = self.partitions.max_workers
+        for start in range(0, len(worksheets), batch_size):
+            with tracer.span('sheets.get_all_records', partitions=len(worksheets[start:start + batch_size])) as span:
+                records = self.partitions.fetch_records(worksheets[start:start + batch_size])
+                span.set_attribute('rows', len(records))
+            yield records
+    
+    def records_since(self, since: Optional[str] = None) -> List[Dict]:
+        """Stored records newer than the ``since`` timestamp string, for rebuilding aggregates."""
+        records = self._get_records(since=datetime.strptime(since, '%Y-%m-%d %H:%M:%S') if since else None)
+        if since is None:
+            return records
+        return [record for record in records if str(record['timestamp']) > since]
+    
+    def user_records(self, user_id: str) -> List[Dict]:
+        """All of one user's records, for building per-user indexes."""
+        return [record for record in self._get_records() if record['user_id'] == user_id]
+    
+    def find_related(self, user_id: str, text: Optional[str] = None, limit: int = 5) -> List[Dict]:
+        """The user's notes most similar to ``text``, or to their latest note when omitted."""
+        try:
+            if not self.worksheet:
+                return []
+            
+            if self.related_notes:
+                return self.related_notes.related(user_id, text, limit)
+            return UserNoteIndex.from_records(self.user_records(user_id)).related(text, limit)
+            
+        except Exception as e:
+            self.logger.error(f"Failed to find related notes: {e}")
+            return []
+    
     def is_healthy(self) -> bool:
         try:
             return (
@@ -0,0 +1,436 @@
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from app.models.message_model import MessageModel
+from app.services.backup_service import write_records
+from app.services.related_notes import UserNoteIndex
+from app.utils.helpers import sanitize_text
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    message_type TEXT NOT NULL,
+    content TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    tags TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT 'processed',
+    replicated INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS message_tags (
+    message_id INTEGER NOT NULL REFERENCES messages(id),
+    user_id TEXT NOT NULL,
+    tag TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_user_time ON messages (user_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_messages_time ON messages (timestamp);
+CREATE INDEX IF NOT EXISTS idx_messages_unreplicated ON messages (id) WHERE replicated = 0;
+CREATE INDEX IF NOT EXISTS idx_message_tags_user_tag ON message_tags (user_id, tag);
+"""
+
+RECORD_COLUMNS = 'timestamp, message_type, content, user_id, tags, status'
+
+
+class SQLiteService:
+    """Local SQLite store exposing the same interface as SheetsService.
+
+    Reads are served from SQLite; when a replica SheetsService is given,
+    new rows are mirrored to Google Sheets in batches by a background
+    SheetsReplicator.
+    """
+
+    def __init__(self, db_path: str, replica=None, replication_batch_size: int = 100,
+                 replication_interval: float = 5.0):
+        self.logger = logging.getLogger(__name__)
+        self.db_path = db_path
+        self._local = threading.local()
+        self.replicator = None
+        # Per-user aggregates behind /stats and /tags, attached by create_storage_service
+        self.user_stats = None
+        # Per-user TF-IDF index behind /related, attached by create_storage_service
+        self.related_notes = None
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(SCHEMA)
+        conn.commit()
+
+        if replica is not None:
+            self.replicator = SheetsReplicator(
+                self, replica,
+                batch_size=replication_batch_size,
+                interval=replication_interval
+            )
+            self.replicator.start()
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _to_record(row: sqlite3.Row) -> Dict:
+        return {key: row[key] for key in ('timestamp', 'message_type', 'content', 'user_id', 'tags', 'status')}
+
+    def _insert(self, conn: sqlite3.Connection, message: MessageModel):
+        message.content = sanitize_text(message.content)
+
+        row = message.to_sheets_row()
+        cursor = conn.execute(
+            f'INSERT INTO messages ({RECORD_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)',
+            row
+        )
+        if message.tags:
+            conn.executemany(
+                'INSERT INTO message_tags (message_id, user_id, tag) VALUES (?, ?, ?)',
+                [(cursor.lastrowid, message.user_id, tag) for tag in message.tags]
+            )
+
+    def add_message(self, message: MessageModel) -> bool:
+        try:
+            if not message.is_valid():
+                self.logger.error("Invalid message data")
+                return False
+
+            conn = self._connection()
+            with conn:
+                self._insert(conn, message)
+
+            if self.user_stats:
+                self.user_stats.record(message)
+            if self.related_notes:
+                self.related_notes.record(message)
+            if self.replicator:
+                self.replicator.notify()
+
+            self.logger.info(f"Message added to database: {message.message_type}, {len(message.content)} chars")
+            return True
+
+        except Exception as e:
+            self.logger.error(f"Failed to add message to database: {e}")
+            return False
+
+    def add_messages_batch(self, messages: List[MessageModel]) -> int:
+        try:
+            valid_messages = [msg for msg in messages if msg.is_valid()]
+            if not valid_messages:
+                return 0
+
+            conn = self._connection()
+            with conn:
+                for message in valid_messages:
+                    self._insert(conn, message)
+
+            if self.user_stats:
+                for message in valid_messages:
+                    self.user_stats.record(message)
+            if self.related_notes:
+                for message in valid_messages:
+                    self.related_notes.record(message)
+            if self.replicator:
+                self.replicator.notify()
+
+            self.logger.info(f"Added {len(valid_messages)} messages to database")
+            return len(valid_messages)
+
+        except Exception as e:
+            self.logger.error(f"Failed to add messages batch: {e}")
+            return 0
+
+    def get_recent_messages(self, user_id: Optional[str] = None, days: int = 7) -> List[Dict]:
+        try:
+            cutoff = (datetime.now() - timedelta(days=days)).strftime(TIMESTAMP_FORMAT)
+            sql = f'SELECT {RECORD_COLUMNS} FROM messages WHERE timestamp >= ?'
+            params = [cutoff]
+
+            if user_id:
+                sql += ' AND user_id = ?'
+                params.append(user_id)
+
+            sql += ' ORDER BY timestamp DESC, id DESC'
+            return [self._to_record(row) for row in self._connection().execute(sql, params)]
+
+        except Exception as e:
+            self.logger.error(f"Failed to get recent messages: {e}")
+            return []
+
+    def search_messages(self, query: str, user_id: Optional[str] = None) -> List[Dict]:
+        try:
+            if not query.strip():
+                return []
+
+            query_lower = query.lower()
+            sql = (f'SELECT {RECORD_COLUMNS} FROM messages '
+                   'WHERE (instr(lower(content), ?) > 0 OR instr(lower(tags), ?) > 0)')
+            params = [query_lower, query_lower]
+
+            if user_id:
+                sql += ' AND user_id = ?'
+                params.append(user_id)
+
+            sql += ' ORDER BY timestamp DESC, id DESC'
+            return [self._to_record(row) for row in self._connection().execute(sql, params)]
+
+        except Exception as e:
+            self.logger.error(f"Failed to search messages: {e}")
+            return []
+
+    def search_page(self, query: str, user_id: Optional[str] = None, page: int = 1,
+                    page_size: int = 5) -> Tuple[List[Dict], bool]:
+        """One page of matches, newest first, and whether another page follows."""
+        try:
+            if not query.strip():
+                return [], False
+
+            query_lower = query.lower()
+            sql = (f'SELECT {RECORD_COLUMNS} FROM messages '
+                   'WHERE (instr(lower(content), ?) > 0 OR instr(lower(tags), ?) > 0)')
+            params = [query_lower, query_lower]
+
+            if user_id:
+                sql += ' AND user_id = ?'
+                params.append(user_id)
+
+            # One extra row tells whether there is a next page
+            sql += ' ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?'
+            params += [page_size + 1, (page - 1) * page_size]
+            rows = [self._to_record(row) for row in self._connection().execute(sql, params)]
+            return rows[:page_size], len(rows) > page_size
+
+        except Exception as e:
+            self.logger.error(f"Failed to search messages: {e}")
+            return [], False
+
+    def get_tags_statistics(self, user_id: Optional[str] = None) -> Dict[str, int]:
+        try:
+            if user_id and self.user_stats:
+                return self.user_stats.get_tags(user_id)
+
+            sql = 'SELECT tag, COUNT(*) AS count FROM message_tags'
+            params = []
+
+            if user_id:
+                sql += ' WHERE user_id = ?'
+                params.append(user_id)
+
+            sql += ' GROUP BY tag ORDER BY count DESC'
+            return {row['tag']: row['count'] for row in self._connection().execute(sql, params)}
+
+        except Exception as e:
+            self.logger.error(f"Failed to get tags statistics: {e}")
+            return {}
+
+    def get_user_statistics(self, user_id: str) -> Dict[str, Any]:
+        try:
+            if self.user_stats:
+                return self.user_stats.get(user_id)
+
+            conn = self._connection()
+            summary = conn.execute(
+                'SELECT COUNT(*) AS total, MIN(timestamp) AS first, MAX(timestamp) AS last '
+                'FROM messages WHERE user_id = ?',
+                (user_id,)
+            ).fetchone()
+
+            if not summary['total']:
+                return {
+                    'total_messages': 0,
+                    'message_types': {},
+                    'tags_count': 0,
+                    'first_message': None,
+                    'last_message': None
+                }
+
+            message_types = {
+                row['message_type']: row['count']
+                for row in conn.execute(
+                    'SELECT message_type, COUNT(*) AS count FROM messages '
+                    'WHERE user_id = ? GROUP BY message_type ORDER BY count DESC',
+                    (user_id,)
+                )
+            }
+            tags_count = conn.execute(
+                'SELECT COUNT(DISTINCT tag) FROM message_tags WHERE user_id = ?',
+                (user_id,)
+            ).fetchone()[0]
+
+            return {
+                'total_messages': summary['total'],
+                'message_types': message_types,
+                'tags_count': tags_count,
+                'first_message': summary['first'],
+                'last_message': summary['last']
+            }
+
+        except Exception as e:
+            self.logger.error(f"Failed to get user statistics: {e}")
+            return {}
+
+    def records_since(self, since: Optional[str] = None) -> List[Dict]:
+        """Stored records newer than the ``since`` timestamp string, for rebuilding aggregates."""
+        sql = 'SELECT timestamp, message_type, user_id, tags FROM messages'
+        params = []
+        if since:
+            sql += ' WHERE timestamp > ?'
+            params.append(since)
+        return [dict(row) for row in self._connection().execute(sql + ' ORDER BY timestamp, id', params)]
+
+    def user_records(self, user_id: str) -> List[Dict]:
+        """All of one user's records, oldest first, for building per-user indexes."""
+        return [self._to_record(row) for row in self._connection().execute(
+            f'SELECT {RECORD_COLUMNS} FROM messages WHERE user_id = ? ORDER BY timestamp, id', (user_id,)
+        )]
+
+    def find_related(self, user_id: str, text: Optional[str] = None, limit: int = 5) -> List[Dict]:
+        """The user's notes most similar to ``text``, or to their latest note when omitted."""
+        try:
+            if self.related_notes:
+                return self.related_notes.related(user_id, text, limit)
+            return UserNoteIndex.from_records(self.user_records(user_id)).related(text, limit)
+
+        except Exception as e:
+            self.logger.error(f"Failed to find related notes: {e}")
+            return []
+
+    def backup_data(self, backup_path: str) -> bool:
+        try:
+            rows = self._connection().execute(
+                f'SELECT {RECORD_COLUMNS} FROM messages ORDER BY timestamp DESC, id DESC'
+            )
+            write_records((self._to_record(row) for row in rows), backup_path)
+
+            self.logger.info(f"Data backed up to {backup_path}")
+            return True
+
+        except Exception as e:
+            self.logger.error(f"Failed to backup data: {e}")
+            return False
+
+    def fetch_unreplicated(self, limit: int) -> List[sqlite3.Row]:
+        return self._connection().execute(
+            f'SELECT id, {RECORD_COLUMNS} FROM messages WHERE replicated = 0 ORDER BY id LIMIT ?',
+            (limit,)
+        ).fetchall()
+
+    def mark_replicated(self, ids: List[int]):
+        conn = self._connection()
+        with conn:
+            conn.executemany('UPDATE messages SET replicated = 1 WHERE id = ?', [(i,) for i in ids])
+
+    def is_healthy(self) -> bool:
+        try:
+            self._connection().execute('SELECT 1').fetchone()
+            return True
+        except Exception:
+            return False
+
+
+class SheetsReplicator(threading.Thread):
+    """Mirrors unreplicated SQLite rows to Google Sheets in batches."""
+
+    def __init__(self, store: SQLiteService, sheets_service, batch_size: int = 100,
+                 interval: float = 5.0, max_backoff: float = 300.0,
+                 idle_poll_interval: float = 60.0):
+        super().__init__(name='sheets-replicator', daemon=True)
+        self.logger = logging.getLogger(__name__)
+        self.store = store
+        self.sheets_service = sheets_service
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.idle_poll_interval = idle_poll_interval
+        self._lock_file = None
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+
+    def notify(self):
+        self._wakeup.set()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    def replicate_once(self) -> int:
+        rows = self.store.fetch_unreplicated(self.batch_size)
+        if not rows:
+            return 0
+
+        # Sheets keeps newest rows on top, so insert the batch newest-first
+        rows = list(reversed(rows))
+        messages = [
+            MessageModel(
+                user_id=row['user_id'],
+                message_type=row['message_type'],
+                content=row['content'],
+                timestamp=datetime.strptime(row['timestamp'], TIMESTAMP_FORMAT)
+            )
+            for row in rows
+        ]
+
+        # Mark what was stored even when a later worksheet failed, so a retry does not duplicate it
+        stored = {id(message) for message in self.sheets_service.write_messages(messages)}
+        self.store.mark_replicated([row['id'] for row, message in zip(rows, messages) if id(message) in stored])
+        if len(stored) != len(messages):
+            raise RuntimeError(f"Replicated {len(stored)} of {len(messages)} rows")
+        return len(rows)
+
+    def _acquire_leadership(self) -> bool:
+        # Every gunicorn worker runs a replicator; only the one holding the
+        # lock file replicates so rows are not mirrored twice.
+        if self._lock_file is not None:
+            return True
+        if fcntl is None:
+            return True
+
+        lock_file = open(f"{self.store.db_path}.replicator.lock", 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+
+        self._lock_file = lock_file
+        return True
+
+    def run(self):
+        delay = self.interval
+
+        while not self._stopped.is_set():
+            if delay > self.interval:
+                # Backing off after a failure
+                self._stopped.wait(delay)
+            else:
+                self._wakeup.wait(self.idle_poll_interval)
+                # Let concurrent writes accumulate into one batch
+                self._stopped.wait(self.interval)
+            self._wakeup.clear()
+
+            if not self._acquire_leadership():
+                continue
+
+            try:
+                while self.replicate_once() == self.batch_size:
+                    pass
+                delay = self.interval
+            except Exception as e:
+                delay = min(delay * 2, self.max_backoff)
+                self.logger.warning(f"Sheets replication failed, retrying in {delay:.0f}s: {e}")
@@ -0,0 +1,36 @@
+from config.settings import Config
+from app.services.sheets_service import SheetsService
+from app.services.related_notes import RelatedNotesIndex
+from app.services.user_stats import UserStatsIndex
+
+
+def create_storage_service():
+    """Build the note store selected by STORAGE_BACKEND.
+
+    Both backends expose the SheetsService interface.
+    """
+    if Config.STORAGE_BACKEND == 'sqlite':
+        from app.services.sqlite_service import SQLiteService
+
+        replica = None
+        if Config.SQLITE_REPLICATE_TO_SHEETS and Config.GOOGLE_SHEET_ID:
+            replica = SheetsService()
+
+        service = SQLiteService(
+            Config.SQLITE_PATH,
+            replica=replica,
+            replication_batch_size=Config.SHEETS_REPLICATION_BATCH_SIZE,
+            replication_interval=Config.SHEETS_REPLICATION_INTERVAL
+        )
+    else:
+        service = SheetsService()
+
+    if Config.USER_STATS_ENABLED:
+        service.user_stats = UserStatsIndex(
+            Config.USER_STATS_PATH or None,
+            service.records_since,
+            flush_interval=Config.USER_STATS_FLUSH_INTERVAL
+        )
+    if Config.RELATED_NOTES_ENABLED:
+        service.related_notes = RelatedNotesIndex(service.user_records, max_users=Config.RELATED_NOTES_MAX_USERS)
+    return service
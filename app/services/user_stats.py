@@ -0,0 +1,351 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.models.message_model import MessageModel
+
+def _parse_tags(tags) -> List[str]:
+    if isinstance(tags, str):
+        return [tag.strip() for tag in tags.split(',') if tag.strip()]
+    return list(tags or ())
+
+
+class UserAggregate:
+    """Running statistics for one user, updated in O(tags) per note.
+
+    Daily counts are the base for anything calendar-shaped; streaks and
+    per-weekday counts are maintained alongside them so /stats never
+    scans history.
+    """
+
+    __slots__ = ('total', 'message_types', 'tags', 'first', 'last', 'daily', 'weekdays',
+                 'streak_end', 'streak', 'longest_streak')
+
+    def __init__(self):
+        self.total = 0
+        self.message_types: Dict[str, int] = {}
+        self.tags: Dict[str, int] = {}
+        self.first: Optional[str] = None
+        self.last: Optional[str] = None
+        self.daily: Dict[str, int] = {}
+        self.weekdays = [0] * 7
+        self.streak_end: Optional[str] = None
+        self.streak = 0
+        self.longest_streak = 0
+
+    def add(self, timestamp: str, message_type: str, tags: Iterable[str]):
+        self.total += 1
+        self.message_types[message_type] = self.message_types.get(message_type, 0) + 1
+        for tag in tags:
+            self.tags[tag] = self.tags.get(tag, 0) + 1
+        if self.first is None or timestamp < self.first:
+            self.first = timestamp
+        if self.last is None or timestamp > self.last:
+            self.last = timestamp
+
+        day = timestamp[:10]
+        day_date = date.fromisoformat(day)
+        self.weekdays[day_date.weekday()] += 1
+        if day in self.daily:
+            self.daily[day] += 1
+            return
+        self.daily[day] = 1
+        if self.streak_end is None or day > self.streak_end:
+            previous = (day_date - timedelta(days=1)).isoformat()
+            self.streak = self.streak + 1 if previous == self.streak_end else 1
+            self.streak_end = day
+            self.longest_streak = max(self.longest_streak, self.streak)
+        else:
+            # A backfilled day can join runs anywhere; rare enough to recount
+            self._recount_streaks()
+
+    def _recount_streaks(self):
+        self.streak = self.longest_streak = 0
+        previous = None
+        for day in sorted(self.daily):
+            day_date = date.fromisoformat(day)
+            self.streak = self.streak + 1 if previous == day_date - timedelta(days=1) else 1
+            self.longest_streak = max(self.longest_streak, self.streak)
+            previous = day_date
+        self.streak_end = previous.isoformat() if previous else None
+
+    def current_streak(self, today: date) -> int:
+        """Consecutive days with notes ending today, or yesterday if nothing yet today."""
+        if self.streak_end and self.streak_end >= (today - timedelta(days=1)).isoformat():
+            return self.streak
+        return 0
+
+    def to_stats(self, today: Optional[date] = None) -> Dict:
+        return {
+            'total_messages': self.total,
+            'message_types': dict(sorted(self.message_types.items(), key=lambda x: x[1], reverse=True)),
+            'tags_count': len(self.tags),
+            'first_message': self.first,
+            'last_message': self.last,
+            'active_days': len(self.daily),
+            'current_streak': self.current_streak(today or date.today()),
+            'longest_streak': self.longest_streak,
+            'weekday_counts': list(self.weekdays),
+        }
+
+    def to_dict(self) -> Dict:
+        data = {slot: getattr(self, slot) for slot in self.__slots__}
+        # Copies, so the snapshot can be serialized outside the lock
+        for key in ('message_types', 'tags', 'daily', 'weekdays'):
+            data[key] = data[key].copy()
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'UserAggregate':
+        aggregate = cls()
+        for slot in cls.__slots__:
+            setattr(aggregate, slot, data[slot])
+        return aggregate
+
+
+def epoch_path(path: str) -> str:
+    return f"{path}.epoch"
+
+
+def bump_storage_epoch(path: Optional[str]):
+    """Make running processes rebuild the statistics saved at ``path``.
+
+    For tools that write to storage without going through the server,
+    such as bulk import and restore; their rows can carry timestamps
+    older than anything a snapshot has seen.
+    """
+    if not path:
+        return
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile('w', dir=directory, delete=False) as f:
+        f.write(str(time.time_ns()))
+    os.replace(f.name, epoch_path(path))
+
+
+class UserStatsIndex:
+    """Per-user aggregates kept in memory and saved to a JSON snapshot.
+
+    ``source(None)`` returns all stored records (dicts with timestamp,
+    message_type, tags and user_id). The snapshot records how many
+    stored rows it has counted up to its watermark. On first use it is
+    trusted only if storage still holds exactly that many rows up to the
+    watermark, and then only the newer rows are replayed. A mismatch
+    means notes were written within the watermark's second after the
+    last save, by another process, or backfilled with older timestamps;
+    the index is then rebuilt from storage. The snapshot is rewritten at most
+    every ``flush_interval`` seconds. Bumping the storage epoch
+    (bump_storage_epoch) makes a running index rebuild on its next read.
+
+    Storage is read outside the lock, one load at a time, so writes never
+    wait on it. Notes recorded while a load is reading are held and
+    counted afterwards unless the load already read them from storage.
+    """
+
+    def __init__(self, path: Optional[str], source: Callable[[Optional[str]], Iterable[Dict]],
+                 flush_interval: float = 30.0):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.source = source
+        self.flush_interval = flush_interval
+        self._users: Dict[str, UserAggregate] = {}
+        self._watermark: Optional[str] = None
+        # Stored rows reflected in the aggregates
+        self._counted = 0
+        self._epoch: Optional[int] = None
+        self._loaded = False
+        # Notes recorded while a load reads storage, or None when no load is running
+        self._pending: Optional[List[Tuple[str, str, str, List[str]]]] = None
+        self._load_lock = threading.Lock()
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        self._lock = threading.RLock()
+
+    def _add(self, user_id: str, timestamp: str, message_type: str, tags: Iterable[str]):
+        aggregate = self._users.get(user_id)
+        if aggregate is None:
+            aggregate = self._users[user_id] = UserAggregate()
+        aggregate.add(timestamp, message_type, tags)
+        self._counted += 1
+        if self._watermark is None or timestamp > self._watermark:
+            self._watermark = timestamp
+
+    def _replay(self, records: Iterable[Dict]) -> int:
+        count = 0
+        for record in records:
+            self._add(record['user_id'], str(record['timestamp']), record['message_type'],
+                      _parse_tags(record.get('tags')))
+            count += 1
+        return count
+
+    def _read_epoch(self) -> Optional[int]:
+        if not self.path:
+            return None
+        try:
+            return os.stat(epoch_path(self.path)).st_mtime_ns
+        except OSError:
+            return None
+
+    def _load_snapshot(self) -> bool:
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            if snapshot.get('epoch') != self._epoch:
+                self.logger.info("Storage epoch changed since the stats snapshot was saved, rebuilding")
+                return False
+            self._users = {user_id: UserAggregate.from_dict(data)
+                           for user_id, data in snapshot['users'].items()}
+            self._watermark, self._counted = snapshot['watermark'], snapshot['counted']
+            return True
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.logger.warning(f"Ignoring unreadable stats snapshot {self.path}: {e}")
+            return False
+
+    def _reset(self):
+        self._users, self._watermark, self._counted = {}, None, 0
+
+    def _ensure_loaded(self):
+        epoch = self._read_epoch()
+        with self._lock:
+            if self._loaded and epoch == self._epoch:
+                return
+        with self._load_lock:
+            epoch = self._read_epoch()
+            with self._lock:
+                if self._loaded and epoch == self._epoch:
+                    # Loaded by a concurrent reader while this one waited
+                    return
+                self._loaded = False
+                self._pending = []
+            try:
+                # Sorted so a backfilled day does not trigger a streak recount per note
+                records = sorted(self.source(None), key=lambda record: str(record['timestamp']))
+            except Exception:
+                with self._lock:
+                    self._pending = None
+                raise
+            with self._lock:
+                rebuilt, replayed = self._load(epoch, records)
+                self._loaded = True
+        if replayed or rebuilt:
+            self.logger.info(f"User statistics {'rebuilt from' if rebuilt else 'caught up with'} {replayed} stored notes")
+            self._maybe_flush(force=rebuilt)
+
+    def _load(self, epoch: Optional[int], records: List[Dict]) -> Tuple[bool, int]:
+        """Reset to the snapshot (or nothing) plus storage; returns (rebuilt, notes replayed)."""
+        self._epoch = epoch
+        self._reset()
+        replay, rebuilt = records, True
+        if self._load_snapshot():
+            watermark = self._watermark or ''
+            newer = [record for record in records if str(record['timestamp']) > watermark]
+            stored = len(records) - len(newer)
+            if stored == self._counted:
+                replay, rebuilt = newer, False
+            else:
+                self.logger.info(f"Stats snapshot counted {self._counted} notes up to {self._watermark} "
+                                 f"but storage has {stored}, rebuilding")
+                self._reset()
+        else:
+            self._reset()
+        replayed = self._replay(replay)
+        replayed += self._add_unseen(records)
+        if replayed or rebuilt:
+            self._dirty = True
+        return rebuilt, replayed
+
+    def _add_unseen(self, records: List[Dict]) -> int:
+        """Count notes recorded during the load that its storage read missed."""
+        pending, self._pending = self._pending, None
+        if not pending:
+            return 0
+        earliest = min(note[1] for note in pending)
+        seen = Counter()
+        for record in reversed(records):
+            timestamp = str(record['timestamp'])
+            if timestamp < earliest:
+                break
+            seen[record['user_id'], timestamp, record['message_type']] += 1
+        added = 0
+        for user_id, timestamp, message_type, tags in pending:
+            key = (user_id, timestamp, message_type)
+            if seen[key]:
+                seen[key] -= 1
+            else:
+                self._add(user_id, timestamp, message_type, tags)
+                added += 1
+        return added
+
+    def rebuild(self):
+        """Discard the aggregates and recompute them from storage."""
+        with self._lock:
+            self._loaded = False
+        self._ensure_loaded()
+
+    def _record(self, notes: List[Tuple[str, str, str, List[str]]]):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.extend(notes)
+                return
+            if not self._loaded:
+                # The next load reads storage, which already includes these notes
+                return
+            for user_id, timestamp, message_type, tags in notes:
+                self._add(user_id, timestamp, message_type, tags)
+            self._dirty = True
+        self._maybe_flush()
+
+    def record(self, message: MessageModel):
+        """Count a note that has just been stored."""
+        self._record([(message.user_id, message.timestamp.isoformat(' ', 'seconds')[:19],
+                       message.message_type, list(message.tags))])
+
+    def record_rows(self, rows: Iterable[list]):
+        """Count prepared sheet rows (MessageModel.to_sheets_row layout) that have just been stored."""
+        self._record([(row[3], row[0], row[1], _parse_tags(row[4])) for row in rows])
+
+    def get(self, user_id: str) -> Dict:
+        self._ensure_loaded()
+        with self._lock:
+            aggregate = self._users.get(user_id) or UserAggregate()
+            return aggregate.to_stats()
+
+    def get_tags(self, user_id: str) -> Dict[str, int]:
+        self._ensure_loaded()
+        with self._lock:
+            aggregate = self._users.get(user_id) or UserAggregate()
+            return dict(sorted(aggregate.tags.items(), key=lambda x: x[1], reverse=True))
+
+    def _maybe_flush(self, force: bool = False):
+        if self._dirty and (force or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if not self.path or not self._dirty:
+                return
+            snapshot = {
+                'watermark': self._watermark,
+                'counted': self._counted,
+                'epoch': self._epoch,
+                'users': {user_id: aggregate.to_dict() for user_id, aggregate in self._users.items()},
+            }
+            self._dirty = False
+        try:
+            directory = os.path.dirname(self.path) or '.'
+            os.makedirs(directory, exist_ok=True)
+            # Write then rename, so a crash never leaves a half-written snapshot
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=directory, delete=False) as f:
+                json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(f.name, self.path)
+        except OSError as e:
+            self.logger.warning(f"Could not save user statistics: {e}")
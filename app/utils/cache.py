@@ -0,0 +1,64 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Tuple
+
+from app.utils.metrics import metrics
+
+
+class UserResponseCache:
+    """Rendered replies per user, dropped as soon as that user writes.
+
+    Holds up to ``max_users`` users, least recently used evicted first;
+    each reply also expires after ``ttl`` seconds, which bounds how stale
+    a reply can get from writes made by other processes. A render that
+    was already running when the user wrote is not stored, so a reply
+    never goes back to the state before the user's latest note.
+    """
+
+    def __init__(self, max_users: int = 1000, ttl: float = 300.0, name: str = 'commands',
+                 clock=time.monotonic):
+        self.max_users = max_users
+        self.ttl = ttl
+        self.name = name
+        self.clock = clock
+        # user -> [generation, {key: (expires_at, value)}]
+        self._users: 'OrderedDict[Hashable, list]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._users)
+
+    def get_or_render(self, user_id: Hashable, key: Hashable, render: Callable[[], str]) -> str:
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                entry = self._users[user_id] = [0, {}]
+                if len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+            else:
+                self._users.move_to_end(user_id)
+            cached = entry[1].get(key)
+            hit = cached is not None and cached[0] > self.clock()
+            generation = entry[0]
+        metrics.record_cache(self.name, hit)
+        if hit:
+            return cached[1]
+
+        value = render()
+        with self._lock:
+            # Skip if the user wrote (or was evicted) while rendering
+            if self._users.get(user_id) is entry and entry[0] == generation:
+                entry[1][key] = (self.clock() + self.ttl, value)
+        return value
+
+    def invalidate(self, user_id: Hashable):
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None:
+                entry[0] += 1
+                entry[1] = {}
+
+    def entries(self) -> Dict[Hashable, Tuple]:
+        with self._lock:
+            return {user_id: tuple(entry[1]) for user_id, entry in self._users.items()}
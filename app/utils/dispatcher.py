@@ -0,0 +1,162 @@
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Hashable, List, Optional
+
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_current_batch: contextvars.ContextVar[Optional[List[Future]]] = contextvars.ContextVar(
+    'dispatch_batch', default=None
+)
+
+
+class EventDispatcher:
+    """Run events for different users in parallel, and each user's in order.
+
+    Every partition key (the LINE user) has a FIFO of pending events;
+    at most one pool thread drains a given FIFO at a time, so a user's
+    notes are written in the order they were sent, across deliveries,
+    while other users proceed on the remaining threads. Each event runs
+    in a copy of the submitter's context, so trace spans attach to the
+    webhook that delivered it.
+
+    ``limits`` caps the events of each kind running at once (by default
+    one kind, ``name``, capped at ``max_workers``). Kinds share the
+    per-user FIFO, so order holds across kinds too; when the event at
+    the head of a FIFO is of a kind already at its limit, the FIFO is
+    parked without holding a thread and resumed as soon as an event of
+    that kind finishes. A burst of one kind therefore cannot take the
+    threads another kind needs. ``waiting_for(kind)`` is what admission
+    control compares against.
+    """
+
+    def __init__(self, max_workers: int = 8, name: str = 'events', limits: Optional[Dict[str, int]] = None):
+        self.name = name
+        self.limits = dict(limits) if limits else {name: max_workers}
+        # Every event that may run has a thread, so parked FIFOs never hold one
+        self.max_workers = sum(self.limits.values())
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"dispatch-{name}")
+        self._partitions: Dict[Hashable, Deque] = {}
+        self._waiting = {kind: 0 for kind in self.limits}
+        self._running = {kind: 0 for kind in self.limits}
+        # kind -> keys whose head event waits for a slot of that kind
+        self._parked: Dict[str, Deque[Hashable]] = {kind: deque() for kind in self.limits}
+        self._lock = threading.Lock()
+
+    @property
+    def waiting(self) -> int:
+        """Events accepted but not started yet."""
+        return sum(self._waiting.values())
+
+    def waiting_for(self, kind: str) -> int:
+        return self._waiting[kind]
+
+    def _report_depth(self, kind: str):
+        metrics.set_gauge('linebot_queue_depth', self._waiting[kind], queue=kind)
+
+    def _claim(self, key: Hashable) -> bool:
+        """Take a slot for the head of ``key``'s FIFO, or park it. Call with the lock held."""
+        kind = self._partitions[key][0][0]
+        if self._running[kind] < self.limits[kind]:
+            self._running[kind] += 1
+            return True
+        self._parked[kind].append(key)
+        return False
+
+    def submit(self, key: Hashable, func: Callable, event, wait: bool = True, kind: Optional[str] = None) -> Future:
+        """Queue ``func(event)`` behind ``key``'s earlier events.
+
+        With ``wait`` False the event is left out of the current batch, for
+        work whose result is delivered later (push instead of reply).
+        """
+        kind = kind or self.name
+        future = Future()
+        future.dispatcher = kind
+        job = (kind, contextvars.copy_context(), func, event, future, time.perf_counter())
+        with self._lock:
+            partition = self._partitions.setdefault(key, deque())
+            partition.append(job)
+            self._waiting[kind] += 1
+            # The head stays queued while it runs, so a lone job means no drainer yet
+            start_drain = len(partition) == 1 and self._claim(key)
+        self._report_depth(kind)
+        if start_drain:
+            self._pool.submit(self._drain, key)
+
+        batch = _current_batch.get()
+        if wait and batch is not None:
+            batch.append(future)
+        return future
+
+    def _drain(self, key: Hashable):
+        while True:
+            with self._lock:
+                kind, context, func, event, future, submitted = self._partitions[key][0]
+                self._waiting[kind] -= 1
+            self._report_depth(kind)
+            metrics.observe('linebot_stage_duration_seconds', time.perf_counter() - submitted,
+                            stage='queue_wait', event_type=kind)
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(context.run(func, event))
+                except BaseException as e:
+                    future.set_exception(e)
+            with self._lock:
+                partition = self._partitions[key]
+                partition.popleft()
+                self._running[kind] -= 1
+                # The freed slot goes to the FIFO that has waited for it longest
+                resumed = self._parked[kind].popleft() if self._parked[kind] else None
+                if resumed is not None:
+                    self._running[kind] += 1
+                if not partition:
+                    del self._partitions[key]
+                    proceed = False
+                else:
+                    proceed = self._claim(key)
+            if resumed is not None:
+                self._pool.submit(self._drain, resumed)
+            if not proceed:
+                return
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+
+
+@contextmanager
+def batch(timeout: float):
+    """Collect events submitted inside the block, on any dispatcher, and wait on exit.
+
+    Each event gets ``timeout`` seconds from submission; events still
+    queued or running after that are counted as timed out and left to
+    finish in the background (the webhook has to answer LINE).
+    """
+    futures: List[Future] = []
+    token = _current_batch.set(futures)
+    try:
+        yield futures
+    finally:
+        _current_batch.reset(token)
+    wait_for(futures, timeout)
+
+
+def wait_for(futures: List[Future], timeout: float) -> List[Future]:
+    """Returns the futures that did not finish in time."""
+    if not futures:
+        return []
+    done, not_done = wait(futures, timeout=timeout)
+    for future in done:
+        error = future.exception()
+        if error is not None:
+            logger.error(f"Event handler failed: {error}")
+    for future in not_done:
+        metrics.inc('linebot_event_timeouts_total', dispatcher=future.dispatcher)
+    if not_done:
+        logger.warning(f"{len(not_done)} of {len(futures)} events still running after {timeout:.0f}s")
+    return list(not_done)
@@ -0,0 +1,108 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+OK = 'ok'
+ERROR = 'error'
+SKIPPED = 'skipped'
+STALE = 'stale'
+UNKNOWN = 'unknown'
+
+
+class Probe:
+    """Last result of one dependency check; ``check`` returns False when there is nothing to probe."""
+
+    def __init__(self, name: str, check: Callable[[], Optional[bool]]):
+        self.name = name
+        self.check = check
+        self.status = UNKNOWN
+        self.latency: Optional[float] = None
+        self.checked_at: Optional[float] = None
+        self.last_success: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+
+class HealthMonitor:
+    """Deep health checks run in the background and served from cache.
+
+    Every dependency is probed by its own thread every ``interval``
+    seconds (``error_interval`` while it is failing), so the load on
+    Google and LINE is fixed per worker however often the endpoint is
+    polled, and a hanging probe only delays its own result. A result
+    older than ``ttl`` is reported as stale.
+    """
+
+    def __init__(self, interval: float = 30.0, error_interval: float = 5.0, ttl: float = 90.0,
+                 clock=time.time):
+        self.interval = interval
+        self.error_interval = error_interval
+        self.ttl = ttl
+        self.clock = clock
+        self.probes: Dict[str, Probe] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def register(self, name: str, check: Callable[[], Optional[bool]]) -> Probe:
+        probe = Probe(name, check)
+        self.probes[name] = probe
+        return probe
+
+    def start(self):
+        self._stop.clear()
+        for probe in self.probes.values():
+            thread = threading.Thread(target=self._loop, args=(probe,), name=f"health-{probe.name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self, probe: Probe):
+        while not self._stop.is_set():
+            self.run_probe(probe)
+            self._stop.wait(self.error_interval if probe.status == ERROR else self.interval)
+
+    def run_probe(self, probe: Probe):
+        started = time.perf_counter()
+        try:
+            result = probe.check()
+            status, error = (SKIPPED if result is False else OK), None
+        except Exception as e:
+            status, error = ERROR, f"{type(e).__name__}: {e}"
+        latency = time.perf_counter() - started
+
+        with self._lock:
+            if status == ERROR and probe.status != ERROR:
+                logger.warning(f"Health probe {probe.name} failed: {error}")
+            probe.status = status
+            probe.latency = latency
+            probe.checked_at = self.clock()
+            if status == OK:
+                probe.last_success = probe.checked_at
+            if error:
+                probe.last_error = error
+        metrics.set_gauge('linebot_dependency_up', 0 if status == ERROR else 1, dependency=probe.name)
+
+    def snapshot(self) -> Dict:
+        now = self.clock()
+        dependencies = {}
+        with self._lock:
+            for name, probe in self.probes.items():
+                status = probe.status
+                if probe.checked_at is not None and now - probe.checked_at > self.ttl:
+                    status = STALE
+                dependencies[name] = {
+                    'status': status,
+                    'latency_ms': round(probe.latency * 1000, 1) if probe.latency is not None else None,
+                    'checked_seconds_ago': round(now - probe.checked_at, 1) if probe.checked_at else None,
+                    'last_success_seconds_ago': round(now - probe.last_success, 1) if probe.last_success else None,
+                    'last_error': probe.last_error,
+                }
+        healthy = all(item['status'] in (OK, SKIPPED) for item in dependencies.values())
+        return {'status': 'healthy' if healthy else 'degraded', 'dependencies': dependencies}
@@ -1,4 +1,5 @@
 import os
+import re
 import tempfile
 import hashlib
 from typing import Optional, Union
@@ -61,17 +62,29 @@ def generate_file_hash(file_path: str) -> Optional[str]:
     except Exception:
         return None
 
-def sanitize_text(text: str) -> str:
+# Control characters except \t, \n and \r
+_CONTROL_CHARS = ''.join(chr(i) for i in range(32) if chr(i) not in '\t\n\r')
+_CONTROL_TABLE = dict.fromkeys(map(ord, _CONTROL_CHARS))
+_CONTROL_PATTERN = re.compile(f'[{re.escape(_CONTROL_CHARS)}]')
+
+def sanitize_text(text: str, max_length: int = 10000) -> str:
     if not text:
         return ""
     
-    # Remove control characters
-    cleaned = ''.join(char for char in text if ord(char) >= 32 or char in ['\n', '\r', '\t'])
+    # Limit length before scanning so huge OCR output is never fully walked
+    truncated = len(text) > max_length
+    if truncated:
+        text = text[:max_length]
+    
+    # Remove control characters: str.translate is fastest on ASCII,
+    # the compiled regex on everything else (e.g. CJK text)
+    if text.isascii():
+        cleaned = text.translate(_CONTROL_TABLE)
+    else:
+        cleaned = _CONTROL_PATTERN.sub('', text)
     
-    # Limit length
-    max_length = 10000
-    if len(cleaned) > max_length:
-        cleaned = cleaned[:max_length] + "... (truncated)"
+    if truncated:
+        cleaned += "... (truncated)"
     
     return cleaned.strip()
 
@@ -127,8 +140,6 @@ def validate_user_id(user_id: str) -> bool:
     return bool(user_id and len(user_id.strip()) > 0)
 
 def extract_keywords(text: str, min_length: int = 3) -> list:
-    import re
-    
     # Simple keyword extraction
     words = re.findall(r'\b\w+\b', text.lower())
     keywords = [word for word in words if len(word) >= min_length]
@@ -1,35 +1,166 @@
+import atexit
+import json
 import logging
+import os
+import queue
 import sys
-from datetime import datetime
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Iterable, Optional
 from flask import Flask
 
-def setup_logger(app: Flask):
-    if not app.debug:
-        # Production logging
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s %(levelname)s %(name)s: %(message)s',
-            handlers=[
-                logging.StreamHandler(sys.stdout)
-            ]
-        )
-    else:
-        # Development logging
-        logging.basicConfig(
-            level=logging.DEBUG,
-            format='%(asctime)s %(levelname)s [%(filename)s:%(lineno)d] %(name)s: %(message)s',
-            handlers=[
-                logging.StreamHandler(sys.stdout)
-            ]
-        )
-    
+from app.utils.metrics import metrics
+from app.utils.tracing import tracer
+
+_listener: Optional[QueueListener] = None
+_setup_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the trace id when the request is traced."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        trace_id = getattr(record, 'trace_id', None)
+        if trace_id:
+            data['trace_id'] = trace_id
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
+
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket per call site for records below WARNING.
+
+    Hot-path info/debug lines (one per event) are capped at ``per_second``
+    per source line with bursts up to ``burst``; warnings and errors
+    always pass. So do records from the ``exempt`` loggers: the tracing
+    exporter writes every sampled trace from one call site, and sampling
+    already bounds its volume.
+    """
+
+    def __init__(self, per_second: float = 20.0, burst: int = 50, exempt: Iterable[str] = ('tracing',)):
+        super().__init__()
+        self.per_second = per_second
+        self.burst = burst
+        self.exempt = tuple(exempt)
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.per_second <= 0:
+            return True
+        if any(record.name == name or record.name.startswith(f"{name}.") for name in self.exempt):
+            return True
+
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.per_second)
+            allowed = tokens >= 1
+            self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+
+        if not allowed:
+            metrics.inc('linebot_log_records_dropped_total', reason='rate_limited')
+        return allowed
+
+
+class BoundedQueueHandler(QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking when full."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = super().prepare(record)
+        span = tracer.current_span()
+        record.trace_id = getattr(span, 'trace_id', None)
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.inc('linebot_log_records_dropped_total', reason='queue_full')
+
+
+class DrainingQueueListener(QueueListener):
+    """Waits for room for the stop sentinel so a full queue is drained on shutdown."""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+def setup_logger(app: Optional[Flask] = None, level: Optional[str] = None,
+                 log_format: Optional[str] = None, queue_size: Optional[int] = None,
+                 stream=None) -> QueueListener:
+    """Configure process-wide logging; the only place handlers are installed.
+
+    Request threads only format the record and put it on a bounded queue;
+    a listener thread writes to stdout, so a slow log consumer can never
+    stall a webhook. Safe to call more than once.
+    """
+    global _listener
+
+    debug = bool(app and app.debug)
+    level = level or os.environ.get('LOG_LEVEL') or ('DEBUG' if debug else 'INFO')
+    log_format = log_format or os.environ.get('LOG_FORMAT') or ('text' if debug else 'json')
+    queue_size = queue_size or int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+    per_second = float(os.environ.get('LOG_RATE_LIMIT', 20))
+
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+
+        output = logging.StreamHandler(stream or sys.stdout)
+        if log_format == 'json':
+            output.setFormatter(JsonFormatter())
+        else:
+            output.setFormatter(logging.Formatter(
+                '%(asctime)s %(levelname)s [%(filename)s:%(lineno)d] %(name)s: %(message)s'
+            ))
+
+        log_queue = queue.Queue(maxsize=queue_size)
+        queue_handler = BoundedQueueHandler(log_queue)
+        queue_handler.addFilter(RateLimitFilter(per_second=per_second))
+
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            if isinstance(existing, BoundedQueueHandler):
+                root.removeHandler(existing)
+        root.addHandler(queue_handler)
+        root.setLevel(level)
+
+        _listener = DrainingQueueListener(log_queue, output, respect_handler_level=True)
+        _listener.start()
+
     # Set specific loggers
     logging.getLogger('linebot').setLevel(logging.INFO)
     logging.getLogger('gspread').setLevel(logging.WARNING)
     logging.getLogger('google').setLevel(logging.WARNING)
     logging.getLogger('urllib3').setLevel(logging.WARNING)
-    
-    app.logger.info("Logger configured successfully")
+
+    if app is not None:
+        app.logger.info("Logger configured successfully")
+    return _listener
+
+
+def shutdown_logger():
+    """Flush queued records; registered to run at interpreter exit."""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+atexit.register(shutdown_logger)
+
 
 def get_logger(name: str) -> logging.Logger:
-    return logging.getLogger(name)
\ No newline at end of file
+    return logging.getLogger(name)
@@ -0,0 +1,239 @@
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# name -> (type, help)
+METRIC_DEFINITIONS = {
+    'linebot_webhook_requests_total': ('counter', 'Webhook deliveries by HTTP status'),
+    'linebot_events_total': ('counter', 'LINE events received by event type'),
+    'linebot_stage_duration_seconds': ('histogram', 'Latency of each processing stage'),
+    'linebot_external_calls_total': ('counter', 'Calls to Google and LINE APIs by outcome'),
+    'linebot_inflight_requests': ('gauge', 'Webhook requests currently being processed'),
+    'linebot_queue_depth': ('gauge', 'Jobs waiting in each work queue'),
+    'linebot_admission_overflow_total': ('counter', 'Media events over the queue limit, by action taken'),
+    'linebot_rate_limited_total': ('counter', 'Events refused by the per-user rate limiter'),
+    'linebot_event_timeouts_total': ('counter', 'Events not finished within the per-event timeout'),
+    'linebot_cache_requests_total': ('counter', 'Cache lookups by cache and result'),
+    'linebot_log_records_dropped_total': ('counter', 'Log records dropped by the logging pipeline'),
+    'linebot_pool_in_use': ('gauge', 'Pooled client connections currently checked out'),
+    'linebot_dependency_up': ('gauge', 'Result of the last background health probe (1 ok, 0 failing)'),
+}
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_key(labels: Dict[str, str]) -> Tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class MetricsRegistry:
+    """In-process counters, gauges and histograms in Prometheus text format.
+
+    With a ``multiproc_dir``, every process periodically writes a snapshot
+    to ``metrics_<pid>.json`` and render() merges the snapshots, so a
+    scrape served by any gunicorn worker reports totals for all workers.
+    """
+
+    def __init__(self, multiproc_dir: Optional[str] = None, flush_interval: float = 2.0,
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.multiproc_dir = multiproc_dir
+        self.flush_interval = flush_interval
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # Serializes snapshot writes, so an older snapshot never replaces a newer one
+        self._flush_lock = threading.Lock()
+        self._counters: Dict[Tuple, float] = {}
+        self._gauges: Dict[Tuple, float] = {}
+        self._histograms: Dict[Tuple, list] = {}
+        self._last_flush = 0.0
+
+        if multiproc_dir:
+            os.makedirs(multiproc_dir, exist_ok=True)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        self._maybe_flush()
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+        self._maybe_flush()
+
+    def add_gauge(self, name: str, delta: float, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + delta
+        self._maybe_flush()
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # [bucket counts..., +Inf count, sum]
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[i] += 1
+                    break
+            else:
+                histogram[len(self.buckets)] += 1
+            histogram[-1] += value
+        self._maybe_flush()
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    @contextmanager
+    def external_call(self, api: str, stage: str, **labels):
+        """Time a Google/LINE API call and count it by outcome (ok/quota/error)."""
+        started = time.perf_counter()
+        outcome = 'ok'
+        try:
+            yield
+        except Exception as e:
+            message = str(e)
+            outcome = 'quota' if '429' in message or 'RESOURCE_EXHAUSTED' in message else 'error'
+            raise
+        finally:
+            self.observe('linebot_stage_duration_seconds', time.perf_counter() - started, stage=stage, **labels)
+            self.inc('linebot_external_calls_total', api=api, outcome=outcome)
+
+    def record_cache(self, cache: str, hit: bool):
+        self.inc('linebot_cache_requests_total', cache=cache, result='hit' if hit else 'miss')
+
+    def _snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                'gauges': [[name, list(labels), value] for (name, labels), value in self._gauges.items()],
+                'histograms': [[name, list(labels), list(values)] for (name, labels), values in self._histograms.items()],
+            }
+
+    def _maybe_flush(self):
+        if self.multiproc_dir and time.monotonic() - self._last_flush >= self.flush_interval:
+            # A thread already flushing writes this thread's updates too
+            if self._flush_lock.acquire(blocking=False):
+                try:
+                    self._write_snapshot()
+                finally:
+                    self._flush_lock.release()
+
+    def flush(self):
+        if not self.multiproc_dir:
+            return
+        with self._flush_lock:
+            self._write_snapshot()
+
+    def _write_snapshot(self):
+        self._last_flush = time.monotonic()
+        path = os.path.join(self.multiproc_dir, f"metrics_{os.getpid()}.json")
+        try:
+            # Write then rename, so a scrape never reads a half-written snapshot
+            with tempfile.NamedTemporaryFile('w', dir=self.multiproc_dir, prefix=f"metrics_{os.getpid()}.",
+                                             suffix='.tmp', delete=False) as f:
+                json.dump(self._snapshot(), f)
+            os.replace(f.name, path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _pid_alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+            return True
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+
+    def _collect(self) -> Dict:
+        if not self.multiproc_dir:
+            return self._snapshot()
+
+        self.flush()
+        merged = {'counters': {}, 'gauges': {}, 'histograms': {}}
+
+        for path in glob.glob(os.path.join(self.multiproc_dir, 'metrics_*.json')):
+            try:
+                pid = int(os.path.basename(path)[len('metrics_'):-len('.json')])
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+
+            # Counters and histograms of exited workers still count; gauges do not
+            alive = self._pid_alive(pid)
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(map(tuple, labels)))
+                merged['counters'][key] = merged['counters'].get(key, 0) + value
+            if alive:
+                for name, labels, value in snapshot['gauges']:
+                    key = (name, tuple(map(tuple, labels)))
+                    merged['gauges'][key] = merged['gauges'].get(key, 0) + value
+            for name, labels, values in snapshot['histograms']:
+                key = (name, tuple(map(tuple, labels)))
+                current = merged['histograms'].get(key)
+                merged['histograms'][key] = values if current is None else [a + b for a, b in zip(current, values)]
+
+        return {
+            kind: [[name, labels, value] for (name, labels), value in items.items()]
+            for kind, items in merged.items()
+        }
+
+    @staticmethod
+    def _format_labels(labels, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = [tuple(pair) for pair in labels]
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+    def render(self) -> str:
+        data = self._collect()
+        series = {}
+        for kind in ('counters', 'gauges', 'histograms'):
+            for name, labels, value in data[kind]:
+                series.setdefault(name, []).append((labels, value))
+
+        lines = []
+        for name in sorted(series):
+            metric_type, help_text = METRIC_DEFINITIONS.get(name, ('untyped', name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+
+            for labels, value in sorted(series[name], key=lambda item: item[0]):
+                if metric_type != 'histogram':
+                    lines.append(f"{name}{self._format_labels(labels)} {value}")
+                    continue
+
+                cumulative = 0
+                for bound, count in zip(self.buckets, value):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{self._format_labels(labels, ('le', repr(bound)))} {cumulative}")
+                cumulative += value[len(self.buckets)]
+                lines.append(f"{name}_bucket{self._format_labels(labels, ('le', '+Inf'))} {cumulative}")
+                lines.append(f"{name}_sum{self._format_labels(labels)} {value[-1]}")
+                lines.append(f"{name}_count{self._format_labels(labels)} {cumulative}")
+
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry(multiproc_dir=os.environ.get('METRICS_MULTIPROC_DIR') or None)
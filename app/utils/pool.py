@@ -0,0 +1,82 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+from app.utils.metrics import metrics
+
+
+class PoolTimeout(RuntimeError):
+    pass
+
+
+class ResourcePool:
+    """Bounded pool of objects that must not be used by two threads at once.
+
+    Objects are created on demand by ``factory`` up to ``max_size``;
+    after that, ``acquire`` waits up to ``timeout`` seconds for one to be
+    returned. Used for gspread clients, whose requests session and token
+    refresh are not safe to share between gthread worker threads.
+    """
+
+    def __init__(self, factory: Callable, max_size: int = 4, timeout: float = 30.0, name: str = 'pool'):
+        self.factory = factory
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self.name = name
+        self._idle: List = []
+        self._created = 0
+        self._in_use = 0
+        self._condition = threading.Condition()
+
+    @property
+    def size(self) -> int:
+        return self._created
+
+    def add(self, item):
+        """Seed the pool with an object created elsewhere (e.g. during startup)."""
+        with self._condition:
+            self._idle.append(item)
+            self._created += 1
+            self._condition.notify()
+
+    def _take(self, deadline: float) -> Optional[object]:
+        with self._condition:
+            while True:
+                if self._idle:
+                    self._in_use += 1
+                    return self._idle.pop()
+                if self._created < self.max_size:
+                    # Reserve the slot; the factory runs outside the lock
+                    self._created += 1
+                    self._in_use += 1
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f"No {self.name} connection free after {self.timeout:.0f}s")
+                self._condition.wait(remaining)
+
+    def _release(self, item, broken: bool = False):
+        with self._condition:
+            self._in_use -= 1
+            if broken:
+                self._created -= 1
+            else:
+                self._idle.append(item)
+            self._condition.notify()
+        metrics.set_gauge('linebot_pool_in_use', self._in_use, pool=self.name)
+
+    @contextmanager
+    def acquire(self):
+        item = self._take(time.monotonic() + self.timeout)
+        metrics.set_gauge('linebot_pool_in_use', self._in_use, pool=self.name)
+        if item is None:
+            try:
+                item = self.factory()
+            except Exception:
+                self._release(None, broken=True)
+                raise
+        try:
+            yield item
+        finally:
+            self._release(item)
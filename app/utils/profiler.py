@@ -0,0 +1,143 @@
+import cProfile
+import glob
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilerBusyError(RuntimeError):
+    pass
+
+
+class SamplingProfiler:
+    """Wall-clock sampling profiler over every thread of the live process.
+
+    Every ``interval`` seconds the stack of each other thread is read
+    from sys._current_frames() and counted; nothing is installed in the
+    profiled threads, so request latency is unaffected apart from the
+    GIL time the sampler itself takes.
+    """
+
+    MAX_SECONDS = 60
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _frame_label(frame) -> str:
+        code = frame.f_code
+        return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+    def _stack(self, frame) -> str:
+        labels = []
+        while frame is not None:
+            labels.append(self._frame_label(frame))
+            frame = frame.f_back
+        return ';'.join(reversed(labels))
+
+    def sample(self, seconds: float) -> Counter:
+        seconds = max(0.0, min(seconds, self.MAX_SECONDS))
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusyError("A profile is already running")
+
+        own_thread = threading.get_ident()
+        stacks = Counter()
+        try:
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id != own_thread:
+                        stacks[self._stack(frame)] += 1
+                time.sleep(self.interval)
+        finally:
+            self._lock.release()
+        return stacks
+
+    @staticmethod
+    def collapse(stacks: Counter) -> str:
+        """Render in the collapsed format read by flamegraph.pl and speedscope."""
+        return ''.join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+    def profile(self, seconds: float) -> str:
+        return self.collapse(self.sample(seconds))
+
+
+class SlowRequestProfiler:
+    """cProfile selected requests and keep the ones slower than a threshold.
+
+    Disabled when ``threshold_ms`` is 0. ``sample_rate`` bounds the
+    overhead by profiling only a fraction of requests; at most
+    ``max_files`` .prof files are kept in ``output_dir``.
+    """
+
+    def __init__(self, threshold_ms: float = 0, output_dir: str = 'data/profiles',
+                 sample_rate: float = 1.0, max_files: int = 50):
+        self.threshold = threshold_ms / 1000
+        self.output_dir = output_dir
+        self.sample_rate = sample_rate
+        self.max_files = max_files
+
+    @classmethod
+    def from_env(cls) -> 'SlowRequestProfiler':
+        return cls(
+            threshold_ms=float(os.environ.get('SLOW_REQUEST_PROFILE_MS', 0) or 0),
+            output_dir=os.environ.get('PROFILE_DIR', 'data/profiles'),
+            sample_rate=float(os.environ.get('SLOW_REQUEST_PROFILE_RATE', 1.0)),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    @contextmanager
+    def profile(self, name: str):
+        if not self.enabled or random.random() >= self.sample_rate:
+            yield
+            return
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active on this thread
+            yield
+            return
+        try:
+            yield
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - started
+            if elapsed >= self.threshold:
+                self._save(profiler, name, elapsed)
+
+    def _save(self, profiler: cProfile.Profile, name: str, elapsed: float) -> Optional[str]:
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            path = os.path.join(
+                self.output_dir,
+                f"{time.strftime('%Y%m%d-%H%M%S')}-{name}-{int(elapsed * 1000)}ms-{os.getpid()}.prof"
+            )
+            profiler.dump_stats(path)
+            logger.warning(f"Slow request {name} took {elapsed * 1000:.0f} ms, profile saved to {path}")
+
+            files = sorted(glob.glob(os.path.join(self.output_dir, '*.prof')), key=os.path.getmtime)
+            for old in files[:-self.max_files]:
+                os.remove(old)
+            return path
+        except OSError as e:
+            logger.error(f"Failed to save request profile: {e}")
+            return None
+
+
+sampling_profiler = SamplingProfiler()
+slow_request_profiler = SlowRequestProfiler.from_env()
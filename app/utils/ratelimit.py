@@ -0,0 +1,164 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ALLOWED = 'allowed'
+# Over the limit: the first event after crossing it gets a reply, the rest are dropped
+THROTTLED = 'throttled'
+DROPPED = 'dropped'
+
+
+def parse_limits(spec: str) -> Dict[str, Tuple[int, int]]:
+    """Parse ``text=30/60,image=6/60`` into {kind: (events, seconds)}."""
+    limits = {}
+    for part in filter(None, (item.strip() for item in spec.split(','))):
+        kind, _, rule = part.partition('=')
+        count, _, seconds = rule.partition('/')
+        limits[kind.strip()] = (int(count), int(seconds or 60))
+    return limits
+
+
+class MemoryWindowStore:
+    """Per-key counts for the current and previous window, in one process.
+
+    Each key costs one small list; at most ``max_keys`` are kept and the
+    least recently seen user is forgotten first, so a burst of thousands
+    of distinct senders cannot grow memory without bound.
+    """
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._entries: 'OrderedDict[str, list]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def hit(self, key: str, window_start: int, window: int) -> Tuple[int, int]:
+        """Count one event; returns (previous window, current window) counts."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = [window_start, 0, 0]
+                if len(self._entries) > self.max_keys:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.move_to_end(key)
+                if entry[0] != window_start:
+                    # Only the window right before this one still counts
+                    entry[1] = entry[2] if window_start - entry[0] <= window else 0
+                    entry[0], entry[2] = window_start, 0
+            entry[2] += 1
+            return entry[1], entry[2]
+
+    def prune(self, before: float):
+        pass
+
+
+class SQLiteWindowStore:
+    """Window counts in a SQLite file, shared by every worker that opens it."""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS rate_limits (
+        key TEXT NOT NULL,
+        window_start INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (key, window_start)
+    ) WITHOUT ROWID
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(self.SCHEMA)
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            conn.execute('PRAGMA synchronous=OFF')
+            self._local.conn = conn
+        return conn
+
+    def hit(self, key: str, window_start: int, window: int) -> Tuple[int, int]:
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                'INSERT INTO rate_limits (key, window_start, count) VALUES (?, ?, 1) '
+                'ON CONFLICT (key, window_start) DO UPDATE SET count = count + 1',
+                (key, window_start)
+            )
+            rows = dict(conn.execute(
+                'SELECT window_start, count FROM rate_limits WHERE key = ? AND window_start IN (?, ?)',
+                (key, window_start - window, window_start)
+            ).fetchall())
+        return rows.get(window_start - window, 0), rows.get(window_start, 0)
+
+    def prune(self, before: float):
+        conn = self._connection()
+        with conn:
+            conn.execute('DELETE FROM rate_limits WHERE window_start < ?', (int(before),))
+
+
+class RateLimiter:
+    """Sliding-window limits per user and message kind.
+
+    Uses the sliding window counter approximation: the previous fixed
+    window's count, weighted by how much of it still overlaps the last
+    ``seconds``, plus the current window's count. Throttled events are
+    counted too, so a sender who keeps flooding stays limited until they
+    slow down. Kinds without a limit are always allowed.
+    """
+
+    def __init__(self, limits: Dict[str, Tuple[int, int]], store=None, clock=time.time,
+                 prune_every: int = 1000):
+        self.limits = limits
+        self.store = store if store is not None else MemoryWindowStore()
+        self.clock = clock
+        self.prune_every = prune_every
+        self._hits = 0
+
+    def check(self, kind: str, key: str) -> str:
+        limit = self.limits.get(kind)
+        if limit is None or key is None:
+            return ALLOWED
+        count, seconds = limit
+        now = self.clock()
+        window_start = int(now // seconds) * seconds
+        try:
+            previous, current = self.store.hit(f"{kind}:{key}", window_start, seconds)
+            self._maybe_prune(now)
+        except sqlite3.Error as e:
+            # Never turn a storage problem into dropped notes
+            logger.warning(f"Rate limit store unavailable: {e}")
+            return ALLOWED
+
+        overlap = 1 - (now - window_start) / seconds
+        estimate = previous * overlap + current
+        if estimate <= count:
+            return ALLOWED
+        return THROTTLED if estimate <= count + 1 else DROPPED
+
+    def _maybe_prune(self, now: float):
+        self._hits += 1
+        if self._hits % self.prune_every == 0:
+            longest = max(seconds for _, seconds in self.limits.values())
+            self.store.prune(now - 2 * longest)
+
+
+def create_rate_limiter(spec: str, db_path: Optional[str] = None, max_users: int = 10000) -> RateLimiter:
+    store = SQLiteWindowStore(db_path) if db_path else MemoryWindowStore(max_users)
+    return RateLimiter(parse_limits(spec), store)
@@ -0,0 +1,184 @@
+import logging
+import queue
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+READY = 'ready'
+RETRYING = 'retrying'
+DISABLED = 'disabled'
+FAILED = 'failed'
+
+
+class PermanentError(Exception):
+    """Raised by an init that retrying cannot fix, such as bad credentials or a missing spreadsheet."""
+
+
+class Dependency:
+    """One service to start; ``init`` returns False when it is not configured."""
+
+    def __init__(self, name: str, init: Callable[[], bool], inline: bool = False):
+        self.name = name
+        self.init = init
+        self.inline = inline
+        self.state = PENDING
+        self.attempts = 0
+        self.last_error: Optional[str] = None
+        self.ready_after: Optional[float] = None
+
+    @property
+    def settled(self) -> bool:
+        return self.state in (READY, DISABLED, FAILED)
+
+    def to_dict(self) -> Dict:
+        return {
+            'state': self.state,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'ready_after_seconds': self.ready_after,
+        }
+
+
+class ServiceInitializer:
+    """Initialize dependencies off the request path, retrying with backoff.
+
+    Each dependency gets its own thread so a slow Google endpoint never
+    delays LINE (or the other way round). Failures are retried with
+    exponential backoff and jitter, up to ``max_backoff`` seconds apart,
+    until they succeed; a dependency whose init returns False is not
+    configured, and one whose init raises PermanentError has failed for
+    good, and neither is retried. Both count as settled, so requests stop
+    waiting for them and are handled as if the service were missing.
+    ``inline`` dependencies (no network I/O) get their first attempt in
+    the caller's thread.
+    """
+
+    def __init__(self, backoff: float = 1.0, max_backoff: float = 60.0, sleep=time.sleep):
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.sleep = sleep
+        self.dependencies: Dict[str, Dependency] = {}
+        self._started_at = time.monotonic()
+        self._condition = threading.Condition()
+        self._threads: List[threading.Thread] = []
+
+    def add(self, name: str, init: Callable[[], bool], inline: bool = False) -> Dependency:
+        dependency = Dependency(name, init, inline)
+        self.dependencies[name] = dependency
+        return dependency
+
+    def start(self):
+        self._started_at = time.monotonic()
+        for dependency in self.dependencies.values():
+            if dependency.inline and self._attempt(dependency):
+                continue
+            thread = threading.Thread(
+                target=self._run, args=(dependency,), name=f"init-{dependency.name}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def _run(self, dependency: Dependency):
+        # Inline dependencies arrive here after a failed first attempt
+        if dependency.state == PENDING and self._attempt(dependency):
+            return
+        delay = self.backoff
+        while True:
+            wait = random.uniform(delay / 2, delay)
+            logger.warning(f"{dependency.name} not ready, retrying in {wait:.1f}s: {dependency.last_error}")
+            self.sleep(wait)
+            if self._attempt(dependency):
+                return
+            delay = min(delay * 2, self.max_backoff)
+
+    def _attempt(self, dependency: Dependency) -> bool:
+        dependency.attempts += 1
+        try:
+            configured = dependency.init()
+        except PermanentError as e:
+            self._settle(dependency, FAILED, str(e))
+            logger.error(f"{dependency.name} failed, not retrying: {e}")
+            return True
+        except Exception as e:
+            self._settle(dependency, RETRYING, f"{type(e).__name__}: {e}")
+            return False
+        self._settle(dependency, READY if configured is not False else DISABLED, None)
+        logger.info(f"{dependency.name} {dependency.state} after {dependency.ready_after:.2f}s")
+        return True
+
+    def _settle(self, dependency: Dependency, state: str, error: Optional[str]):
+        with self._condition:
+            dependency.state = state
+            dependency.last_error = error
+            if dependency.settled:
+                dependency.ready_after = round(time.monotonic() - self._started_at, 3)
+            self._condition.notify_all()
+
+    @property
+    def ready(self) -> bool:
+        return all(dependency.settled for dependency in self.dependencies.values())
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        with self._condition:
+            return self._condition.wait_for(lambda: self.ready, timeout)
+
+    def status(self) -> Dict:
+        return {
+            'ready': self.ready,
+            'dependencies': {name: dependency.to_dict() for name, dependency in self.dependencies.items()},
+        }
+
+
+class StartupQueue:
+    """Hold verified webhook work until the dependencies are ready.
+
+    One thread hands items to ``process`` in arrival order once
+    ``initializer`` is ready, or once an item has waited ``max_wait``
+    seconds; the handlers already degrade gracefully when a service is
+    still missing, and LINE reply tokens expire, so work is not held
+    forever. When full, ``submit`` returns False and the caller should
+    ask LINE to redeliver.
+    """
+
+    def __init__(self, initializer: ServiceInitializer, process: Callable, max_size: int = 1000,
+                 max_wait: float = 20.0):
+        self.initializer = initializer
+        self.process = process
+        self.max_wait = max_wait
+        self._queue = queue.Queue(maxsize=max_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, item) -> bool:
+        try:
+            self._queue.put_nowait((time.monotonic() + self.max_wait, item))
+        except queue.Full:
+            return False
+        metrics.set_gauge('linebot_queue_depth', self._queue.qsize(), queue='startup')
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='startup-queue', daemon=True)
+                self._thread.start()
+        return True
+
+    def _run(self):
+        while True:
+            deadline, item = self._queue.get()
+            metrics.set_gauge('linebot_queue_depth', self._queue.qsize(), queue='startup')
+            if not self.initializer.wait(max(0.0, deadline - time.monotonic())):
+                logger.warning("Processing queued webhook before all services are ready")
+            try:
+                self.process(item)
+            except Exception as e:
+                logger.error(f"Queued webhook failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def join(self):
+        self._queue.join()
@@ -0,0 +1,171 @@
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import random
+import socket
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, List, Optional
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+def hash_user_id(user_id: Optional[str]) -> str:
+    """Stable, non-reversible tag for a LINE user id."""
+    if not user_id:
+        return ''
+    return hashlib.sha256(user_id.encode('utf-8')).hexdigest()[:12]
+
+
+class _NoopSpan:
+    """Returned for unsampled requests so call sites never branch on sampling."""
+
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'attributes',
+                 'start', 'duration', 'error', '_spans')
+
+    def __init__(self, name: str, trace_id: str, parent: Optional['Span'], attributes: Dict):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.name = name
+        self.attributes = attributes
+        self.start = time.time()
+        self.duration = 0.0
+        self.error = None
+        # Finished spans of the whole trace, shared with every child
+        self._spans: List['Span'] = parent._spans if parent else []
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict:
+        data = {
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': round(self.start, 6),
+            'duration_ms': round(self.duration * 1000, 3),
+            'attributes': self.attributes,
+        }
+        if self.error:
+            data['error'] = self.error
+        return data
+
+
+class LogExporter:
+    """Writes each finished trace as one JSON log line."""
+
+    def __init__(self, logger_name: str = 'tracing'):
+        self.logger = logging.getLogger(logger_name)
+
+    def export(self, trace: Dict):
+        self.logger.info(json.dumps(trace, ensure_ascii=False, default=str))
+
+
+class UDPExporter:
+    """Fire-and-forget JSON datagrams to a local collector (one per trace)."""
+
+    def __init__(self, host: str, port: int):
+        self.address = (host, port)
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def export(self, trace: Dict):
+        try:
+            self.socket.sendto(json.dumps(trace, default=str).encode('utf-8'), self.address)
+        except OSError:
+            pass
+
+
+class Tracer:
+    """Request-scoped spans tracked through a context variable.
+
+    trace() opens a root span and makes the sampling decision; span()
+    attaches a child to whatever span is active and is a no-op when there
+    is none, so instrumented code outside a sampled request costs one
+    ContextVar lookup.
+    """
+
+    def __init__(self, sample_rate: float = 0.0, exporter=None):
+        self.sample_rate = sample_rate
+        self.exporter = exporter or LogExporter()
+
+    @classmethod
+    def from_env(cls) -> 'Tracer':
+        sample_rate = float(os.environ.get('TRACE_SAMPLE_RATE', 0) or 0)
+        collector = os.environ.get('TRACE_COLLECTOR')
+        exporter = None
+        if collector:
+            host, _, port = collector.rpartition(':')
+            exporter = UDPExporter(host or '127.0.0.1', int(port))
+        return cls(sample_rate=sample_rate, exporter=exporter)
+
+    @staticmethod
+    def current_span():
+        return _current_span.get() or NOOP_SPAN
+
+    @contextmanager
+    def trace(self, name: str, **attributes):
+        if _current_span.get() is not None:
+            with self.span(name, **attributes) as span:
+                yield span
+            return
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            yield NOOP_SPAN
+            return
+
+        root = Span(name, os.urandom(16).hex(), None, attributes)
+        try:
+            with self._run(root) as span:
+                yield span
+        finally:
+            self.exporter.export({
+                'trace_id': root.trace_id,
+                'spans': [span.to_dict() for span in root._spans],
+            })
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        parent = _current_span.get()
+        if parent is None:
+            yield NOOP_SPAN
+            return
+        with self._run(Span(name, parent.trace_id, parent, attributes)) as span:
+            yield span
+
+    @contextmanager
+    def _run(self, span: Span):
+        token = _current_span.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            span.error = f"{type(e).__name__}: {e}"[:200]
+            raise
+        finally:
+            span.duration = time.perf_counter() - started
+            _current_span.reset(token)
+            span._spans.append(span)
+
+    def wrap(self, name: str, func):
+        """Return func with every call recorded as a child span."""
+        @wraps(func)
+        def traced(*args, **kwargs):
+            with self.span(name):
+                return func(*args, **kwargs)
+        return traced
+
+
+tracer = Tracer.from_env()
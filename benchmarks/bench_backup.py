@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+備份效能測試 - 比較舊版 get_all_records + json.dump(indent=2) 與串流匯出
+
+用法: python benchmarks/bench_backup.py --rows 100000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.models.message_model import MessageModel
+from app.services.backup_service import StreamingExporter, read_records
+from app.services.fake_sheets import FakeSheetsClient
+
+
+def build_rows(count):
+    rows = [MessageModel.get_sheets_headers()]
+    for i in range(count):
+        rows.append([
+            f"2024-01-01 {i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}",
+            'text',
+            f"第 {i} 則靈感：今天學到了新的 Python 技巧 #python #學習",
+            f"U{i % 50:032d}",
+            'python, 學習',
+            'processed'
+        ])
+    return rows
+
+
+def measure(label, func):
+    started = time.perf_counter()
+    path = func()
+    elapsed = time.perf_counter() - started
+
+    # Separate run for memory: tracemalloc slows allocation-heavy code a lot
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    size = os.path.getsize(path)
+    print(f"{label:<28} {elapsed:8.2f}s  peak {peak / 1024 / 1024:8.1f} MB  file {size / 1024 / 1024:7.1f} MB")
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="備份效能測試")
+    parser.add_argument('--rows', type=int, default=100000, help='測試資料筆數')
+    parser.add_argument('--page-size', type=int, default=5000, help='每次讀取的列數')
+    parser.add_argument('--latency-ms', type=float, default=0, help='模擬每次 Sheets API 呼叫延遲')
+    args = parser.parse_args()
+
+    client = FakeSheetsClient(latency=args.latency_ms / 1000)
+    worksheet = client.open_by_key('bench').sheet1
+    worksheet.seed_rows(build_rows(args.rows))
+    service = SimpleNamespace(worksheet=worksheet, partitions=None)
+    output_dir = tempfile.mkdtemp(prefix='bench_backup_')
+
+    print(f"Rows: {args.rows}, page size: {args.page_size}, API latency: {args.latency_ms} ms")
+
+    def legacy():
+        path = os.path.join(output_dir, 'legacy.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(worksheet.get_all_records(), f, ensure_ascii=False, indent=2, default=str)
+        return path
+
+    def streaming(suffix):
+        def run():
+            path = os.path.join(output_dir, f'streaming.{suffix}')
+            StreamingExporter(service, page_size=args.page_size).export(path)
+            return path
+        return run
+
+    measure('legacy json indent=2', legacy)
+    measure('streaming jsonl', streaming('jsonl'))
+    measure('streaming jsonl.gz', streaming('jsonl.gz'))
+    gz_csv = measure('streaming csv.gz', streaming('csv.gz'))
+
+    started = time.perf_counter()
+    restored = sum(1 for _ in read_records(gz_csv))
+    elapsed = time.perf_counter() - started
+    print(f"{'read csv.gz':<28} {elapsed:8.2f}s  {restored / elapsed:,.0f} rows/s")
+
+
+if __name__ == '__main__':
+    main()
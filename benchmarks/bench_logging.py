@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+日誌效能測試 - 比較同步 StreamHandler 與佇列非同步輸出對呼叫端延遲的影響
+
+以寫入時會延遲的 stream 模擬 stdout 背壓（例如容器日誌收集器變慢）。
+
+用法: python benchmarks/bench_logging.py --records 2000 --write-delay-ms 1
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.utils.logger import JsonFormatter, setup_logger, shutdown_logger
+from app.utils.metrics import metrics
+
+
+class SlowStream:
+    """File-like sink whose writes block for a fixed delay."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.lines = 0
+
+    def write(self, data):
+        time.sleep(self.delay)
+        self.lines += data.count('\n')
+
+    def flush(self):
+        pass
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def measure(logger, records, interval):
+    latencies = []
+    for i in range(records):
+        started = time.perf_counter()
+        logger.info("Received text message: %d chars", i)
+        latencies.append(time.perf_counter() - started)
+        if interval:
+            time.sleep(interval)
+    return latencies
+
+
+def reset_root():
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.setLevel(logging.INFO)
+    return root
+
+
+def dropped():
+    return sum(value for name, labels, value in metrics._snapshot()['counters']
+               if name == 'linebot_log_records_dropped_total')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="日誌效能測試")
+    parser.add_argument('--records', type=int, default=2000, help='每種設定的日誌筆數')
+    parser.add_argument('--write-delay-ms', type=float, default=1.0, help='每次寫入的模擬延遲')
+    parser.add_argument('--interval-ms', type=float, default=0.0, help='兩筆日誌的間隔')
+    parser.add_argument('--queue-size', type=int, default=10000, help='佇列上限')
+    args = parser.parse_args()
+
+    delay = args.write_delay_ms / 1000
+    interval = args.interval_ms / 1000
+    logger = logging.getLogger('bench.hot_path')
+
+    # Baseline: what logging.basicConfig(stream=stdout) does today
+    stream = SlowStream(delay)
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JsonFormatter())
+    reset_root().addHandler(handler)
+    sync = measure(logger, args.records, interval)
+
+    reset_root()
+    stream = SlowStream(delay)
+    os.environ['LOG_RATE_LIMIT'] = '0'
+    setup_logger(log_format='json', queue_size=args.queue_size, stream=stream)
+    before = dropped()
+    queued = measure(logger, args.records, interval)
+    queued_dropped = dropped() - before
+    shutdown_logger()
+
+    print(f"Records: {args.records:,}  write delay: {args.write_delay_ms} ms")
+    print(f"{'pipeline':<10}{'p50 µs':>10}{'p99 µs':>10}{'max µs':>10}{'mean µs':>10}{'dropped':>9}")
+    for label, samples, lost in (('sync', sync, 0), ('queue', queued, queued_dropped)):
+        us = [s * 1e6 for s in samples]
+        print(f"{label:<10}{percentile(us, 50):>10,.1f}{percentile(us, 99):>10,.1f}"
+              f"{max(us):>10,.1f}{statistics.mean(us):>10,.1f}{lost:>9,}")
+    print(f"queue sink wrote {stream.lines:,} lines after shutdown flush")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+MessageModel 效能測試 - 建立模型並轉成試算表列
+
+用法: python benchmarks/bench_message_model.py --count 1000000
+"""
+import argparse
+import os
+import re
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.models.message_model import MessageModel
+
+
+class LegacyMessageModel:
+    """The pre-__slots__ implementation, kept here as the baseline."""
+
+    def __init__(self, user_id, message_type, content, timestamp=None, raw_data=None):
+        self.user_id = user_id
+        self.message_type = message_type
+        self.content = content
+        self.timestamp = timestamp or datetime.now()
+        self.raw_data = raw_data or {}
+        self.tags = list(set(re.findall(r'#(\w+)', self.content)))
+        content = self.content.strip()
+        content = re.sub(r'\s+', ' ', content)
+        self.processed_content = content.replace('\n', ' ').replace('\r', '')
+
+    def to_sheets_row(self):
+        return [
+            self.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+            self.message_type,
+            self.processed_content,
+            self.user_id,
+            ', '.join(self.tags) if self.tags else '',
+            'processed'
+        ]
+
+
+CONTENTS = [
+    "今天學到了新的 Python 技巧 #python #學習",
+    "會議記錄：討論專案進度\n下週再確認 #工作 #會議",
+    "  讀書心得：這本書很有趣   ",
+    "旅遊計畫：下個月要去日本 #旅遊",
+]
+
+
+def run(model_class, count):
+    timestamp = datetime(2024, 1, 1, 12, 0, 0)
+    started = time.perf_counter()
+    for i in range(count):
+        model_class('U123', 'text', CONTENTS[i & 3], timestamp).to_sheets_row()
+    return time.perf_counter() - started
+
+
+def memory_per_instance(model_class, count=100000):
+    timestamp = datetime(2024, 1, 1, 12, 0, 0)
+    tracemalloc.start()
+    models = [model_class('U123', 'text', CONTENTS[i & 3], timestamp) for i in range(count)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del models
+    return current / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MessageModel 效能測試")
+    parser.add_argument('--count', type=int, default=1000000, help='處理訊息數量')
+    args = parser.parse_args()
+
+    print(f"Messages: {args.count:,}")
+    for label, model_class in (('legacy', LegacyMessageModel), ('slots', MessageModel)):
+        elapsed = run(model_class, args.count)
+        per_instance = memory_per_instance(model_class)
+        print(f"{label:<8} {elapsed:7.2f}s  {args.count / elapsed:>12,.0f} msg/s  {per_instance:6.0f} B/instance")
+
+
+if __name__ == '__main__':
+    main()
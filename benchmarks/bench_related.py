@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+/related 效能測試 - 單一使用者 N 筆記錄的 TF-IDF 索引建立、寫入與 top-5 查詢耗時
+
+用法: python benchmarks/bench_related.py --notes 10000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.related_notes import UserNoteIndex
+
+LATIN = ('python', 'deploy', 'design', 'review', 'sprint', 'roadmap', 'coffee', 'startup')
+TAGS = ('工作', '生活', '想法', '學習', '')
+
+
+def build_records(count):
+    """Notes of 2-6 character phrases drawn Zipf-style from 2,000 common CJK characters."""
+    random.seed(42)
+    chars = [chr(code) for code in range(0x4e00, 0x4e00 + 2000)]
+    weights = [1 / rank for rank in range(1, len(chars) + 1)]
+    start = datetime(2024, 1, 1)
+    records = []
+    for i in range(count):
+        phrases = [''.join(random.choices(chars, weights, k=random.randint(2, 6)))
+                   for _ in range(random.randint(3, 10))]
+        phrases += random.choices(LATIN, k=random.randint(0, 2))
+        records.append({
+            'timestamp': (start + timedelta(minutes=30 * i)).strftime('%Y-%m-%d %H:%M:%S'),
+            'message_type': 'text',
+            'content': '，'.join(phrases),
+            'tags': random.choice(TAGS),
+        })
+    return records
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def time_queries(query, number):
+    samples = []
+    for _ in range(number):
+        start = time.perf_counter()
+        query()
+        samples.append((time.perf_counter() - start) * 1000)
+    return percentile(samples, 0.5), percentile(samples, 0.99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/related 效能測試")
+    parser.add_argument('--notes', type=int, default=10000, help='使用者的記錄筆數')
+    parser.add_argument('--number', type=int, default=200, help='查詢次數')
+    args = parser.parse_args()
+
+    records = build_records(args.notes + args.number)
+    start = time.perf_counter()
+    index = UserNoteIndex.from_records(records[:args.notes])
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"notes: {args.notes:,}  terms: {len(index.terms):,}  build: {build_ms:,.0f} ms")
+
+    p50, p99 = time_queries(lambda: index.related(limit=5), args.number)
+    print(f"{'top-5 latest note':<28}p50 {p50:6.2f} ms   p99 {p99:6.2f} ms")
+    p50, p99 = time_queries(lambda: index.related(records[0]['content'], limit=5), args.number)
+    print(f"{'top-5 free text':<28}p50 {p50:6.2f} ms   p99 {p99:6.2f} ms")
+
+    # Every lookup follows a write, so document norms are recomputed each time
+    new_records = iter(records[args.notes:])
+    p50, p99 = time_queries(lambda: (index.add(next(new_records)), index.related(limit=5)), args.number)
+    print(f"{'add + top-5 (norms stale)':<28}p50 {p50:6.2f} ms   p99 {p99:6.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+sanitize_text 效能測試 - 比較舊版逐字元迴圈與 translate / regex 版本
+
+用法: python benchmarks/bench_sanitize.py --size 10240
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.models.message_model import MessageModel
+from app.utils.helpers import sanitize_text
+
+
+def legacy_sanitize_text(text):
+    if not text:
+        return ""
+    cleaned = ''.join(char for char in text if ord(char) >= 32 or char in ['\n', '\r', '\t'])
+    max_length = 10000
+    if len(cleaned) > max_length:
+        cleaned = cleaned[:max_length] + "... (truncated)"
+    return cleaned.strip()
+
+
+def legacy_add_message_path(text):
+    message = MessageModel('U1', 'image', text)
+    message.content = legacy_sanitize_text(message.content)
+    message.processed_content = legacy_sanitize_text(message.processed_content)
+    return message.to_sheets_row()
+
+
+def fused_add_message_path(text):
+    message = MessageModel('U1', 'image', text)
+    message.content = sanitize_text(message.content)
+    return message.to_sheets_row()
+
+
+def build_inputs(size):
+    random.seed(42)
+    return {
+        'ascii': ''.join(random.choice('The quick brown fox \n') for _ in range(size)),
+        'cjk ocr': ''.join(random.choice('今天的會議記錄 重點整理\n') for _ in range(size)),
+        'with control': ''.join(random.choice('靈感筆記 ab\x00\x07\x1b') for _ in range(size)),
+        'oversized 100KB': ''.join(random.choice('掃描文件內容 text\n') for _ in range(size * 10)),
+    }
+
+
+def per_call_us(func, text, number):
+    return timeit.timeit(lambda: func(text), number=number) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="sanitize_text 效能測試")
+    parser.add_argument('--size', type=int, default=10240, help='輸入字元數')
+    parser.add_argument('--number', type=int, default=50, help='每項重複次數')
+    args = parser.parse_args()
+
+    print(f"{'input':<18}{'legacy µs':>12}{'new µs':>10}{'speedup':>9}   "
+          f"{'add_message legacy':>19}{'fused':>9}")
+    for label, text in build_inputs(args.size).items():
+        legacy = per_call_us(legacy_sanitize_text, text, args.number)
+        new = per_call_us(sanitize_text, text, args.number)
+        legacy_path = per_call_us(legacy_add_message_path, text, args.number)
+        fused_path = per_call_us(fused_add_message_path, text, args.number)
+        print(f"{label:<18}{legacy:>12,.0f}{new:>10,.0f}{legacy / new:>8.1f}x   "
+              f"{legacy_path:>19,.0f}{fused_path:>9,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+啟動效能測試 - 比較延遲載入、啟動時全部載入（舊版行為）與 gunicorn preload
+
+每次量測都在新的直譯器中進行：
+  import    匯入 server 的時間與 RSS
+  prefork   模擬 gunicorn 的 master + N 個 worker，回報每個 worker 的
+            PSS（共用頁面按比例分攤）與私有記憶體，需要 Linux /proc
+
+用法: python benchmarks/bench_startup.py --repeat 5 --workers 4
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+IMPORT_SCRIPT = """
+import json, os, sys, time
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+import server
+if {eager!r}:
+    server.preload_modules()
+elapsed = time.perf_counter() - started
+rss = 0
+with open('/proc/self/status') as f:
+    for line in f:
+        if line.startswith('VmRSS:'):
+            rss = int(line.split()[1]) * 1024
+print(json.dumps({{'seconds': elapsed, 'rss': rss}}))
+"""
+
+
+def child_env(preload=False):
+    env = dict(os.environ)
+    env['LOG_LEVEL'] = 'ERROR'
+    for name in ('LINE_CHANNEL_ACCESS_TOKEN', 'LINE_CHANNEL_SECRET', 'GOOGLE_SHEET_ID', 'GUNICORN_PRELOAD'):
+        env.pop(name, None)
+    if preload:
+        env['GUNICORN_PRELOAD'] = '1'
+    return env
+
+
+def measure_import(eager, repeat):
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, '-c', IMPORT_SCRIPT.format(root=ROOT, eager=eager)],
+            capture_output=True, text=True, check=True, env=child_env(), cwd=ROOT
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        'seconds': statistics.median(run['seconds'] for run in runs),
+        'rss': statistics.median(run['rss'] for run in runs),
+    }
+
+
+def read_smaps(pid):
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                values[parts[0].rstrip(':')] = int(parts[1]) * 1024
+    return {
+        'rss': values.get('Rss', 0),
+        'pss': values.get('Pss', 0),
+        'private': values.get('Private_Clean', 0) + values.get('Private_Dirty', 0),
+    }
+
+
+def prefork(mode, workers):
+    """Runs in its own interpreter: import per mode, fork, measure each worker."""
+    sys.path.insert(0, ROOT)
+    if mode == 'preload':
+        import server  # noqa: F401  (GUNICORN_PRELOAD=1 imports the client libraries)
+
+    children = []
+    for _ in range(workers):
+        ready_r, ready_w = os.pipe()
+        go_r, go_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            if mode != 'preload':
+                import server
+                if mode == 'eager':
+                    server.preload_modules()
+            os.write(ready_w, b'1')
+            os.read(go_r, 1)
+            os._exit(0)
+        children.append((pid, ready_r, go_w))
+
+    for _, ready_r, _ in children:
+        os.read(ready_r, 1)
+    stats = [read_smaps(pid) for pid, _, _ in children]
+    for pid, _, go_w in children:
+        os.write(go_w, b'1')
+        os.waitpid(pid, 0)
+    print(json.dumps(stats))
+
+
+def measure_prefork(mode, workers):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--prefork-child', mode, '--workers', str(workers)],
+        capture_output=True, text=True, check=True, env=child_env(preload=mode == 'preload'), cwd=ROOT
+    ).stdout
+    stats = json.loads(output.strip().splitlines()[-1])
+    return {key: statistics.mean(worker[key] for worker in stats) for key in ('rss', 'pss', 'private')}
+
+
+def mb(value):
+    return value / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="啟動效能測試")
+    parser.add_argument('--repeat', type=int, default=5, help='匯入量測次數（取中位數）')
+    parser.add_argument('--workers', type=int, default=4, help='模擬的 worker 數，0 表示略過')
+    parser.add_argument('--prefork-child', choices=['lazy', 'eager', 'preload'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.prefork_child:
+        prefork(args.prefork_child, args.workers)
+        return
+
+    print(f"{'import':<24} {'time':>10} {'RSS':>10}")
+    for label, eager in (('lazy (on first use)', False), ('eager (all at start)', True)):
+        result = measure_import(eager, args.repeat)
+        print(f"{label:<24} {result['seconds'] * 1000:8.0f}ms {mb(result['rss']):8.1f}MB")
+
+    if args.workers <= 0 or not os.path.exists('/proc/self/smaps_rollup'):
+        return
+
+    print()
+    print(f"{'per worker (x' + str(args.workers) + ')':<24} {'RSS':>10} {'PSS':>10} {'private':>10}")
+    for label, mode in (('lazy', 'lazy'), ('eager', 'eager'), ('eager + preload', 'preload')):
+        result = measure_prefork(mode, args.workers)
+        print(f"{label:<24} {mb(result['rss']):8.1f}MB {mb(result['pss']):8.1f}MB {mb(result['private']):8.1f}MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Webhook 負載測試 - 以正確簽章的合成 LINE Webhook 驅動 server.app
+
+LINE 以本機替身取代，Google Sheets 使用 app.services.fake_sheets，Speech-to-Text 與 Vision
+使用 app.services.recognition 的 stub 後端（皆可設定延遲），
+因此不需任何雲端憑證，結果可重現。每次效能相關修改都應以此工具量測前後差異。
+
+用法:
+    python benchmarks/loadtest.py --rate 50 --duration 20 --mix text=70,command=10,audio=10,image=10
+    python benchmarks/loadtest.py --url https://staging.example.com/webhook --secret $LINE_CHANNEL_SECRET
+    python benchmarks/loadtest.py --json results.json
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.fake_sheets import FakeSheetsClient
+from app.services.recognition import StubOcrBackend, StubSpeechBackend, load_fixtures
+
+DEFAULT_SECRET = 'loadtest-channel-secret'
+
+TEXTS = [
+    "今天學到了新的 Python 技巧 #python #學習",
+    "會議記錄：討論專案進度，下週再確認 #工作",
+    "讀書心得：這本書很有趣",
+    "旅遊計畫：下個月要去日本 #旅遊",
+]
+COMMANDS = ['/today', '/stats', '/tags', '/search 靈感']
+
+
+def sign(body: bytes, secret: str) -> str:
+    """X-Line-Signature: base64(HMAC-SHA256(channel secret, raw body))"""
+    digest = hmac.new(secret.encode('utf-8'), body, hashlib.sha256).digest()
+    return base64.b64encode(digest).decode('utf-8')
+
+
+class EventFactory:
+    """Builds Messaging API message events for a fixed population of users."""
+
+    def __init__(self, users: int = 200, seed: int = 42):
+        self.random = random.Random(seed)
+        self.user_ids = [f"U{uuid.UUID(int=self.random.getrandbits(128)).hex}" for _ in range(users)]
+
+    def build(self, kind: str) -> dict:
+        if kind == 'text':
+            message = {'type': 'text', 'text': self.random.choice(TEXTS)}
+        elif kind == 'command':
+            message = {'type': 'text', 'text': self.random.choice(COMMANDS)}
+        elif kind == 'audio':
+            message = {'type': 'audio', 'duration': 3000, 'contentProvider': {'type': 'line'}}
+        elif kind == 'image':
+            message = {'type': 'image', 'contentProvider': {'type': 'line'}}
+        else:
+            raise ValueError(f"Unknown event kind: {kind}")
+        message['id'] = str(self.random.getrandbits(60))
+
+        return {
+            'type': 'message',
+            'mode': 'active',
+            'timestamp': int(time.time() * 1000),
+            'source': {'type': 'user', 'userId': self.random.choice(self.user_ids)},
+            'webhookEventId': uuid.uuid4().hex.upper()[:26],
+            'deliveryContext': {'isRedelivery': False},
+            'replyToken': uuid.uuid4().hex,
+            'message': message,
+        }
+
+
+def build_body(events) -> bytes:
+    return json.dumps({'destination': 'Uloadtest', 'events': events},
+                      ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def parse_mix(spec: str) -> dict:
+    mix = {}
+    for part in spec.split(','):
+        kind, _, weight = part.partition('=')
+        mix[kind.strip()] = float(weight)
+    return mix
+
+
+# --- Local stand-ins for the external APIs -------------------------------------------
+
+class _Content:
+
+    def __init__(self, size):
+        self.size = size
+
+    def iter_content(self, chunk_size=1024 * 64):
+        remaining = self.size
+        while remaining > 0:
+            chunk = min(chunk_size, remaining)
+            remaining -= chunk
+            yield b'\0' * chunk
+
+
+class StubLineBotApi:
+
+    def __init__(self, latency: float, media_bytes: int):
+        self.latency = latency
+        self.media_bytes = media_bytes
+
+    def reply_message(self, reply_token, messages, *args, **kwargs):
+        time.sleep(self.latency)
+
+    def push_message(self, to, messages, *args, **kwargs):
+        time.sleep(self.latency)
+
+    def get_message_content(self, message_id, *args, **kwargs):
+        time.sleep(self.latency)
+        return _Content(self.media_bytes)
+
+    def get_bot_info(self, *args, **kwargs):
+        time.sleep(self.latency)
+
+
+def install_stand_ins(args):
+    """Import server with stub credentials and swap every external client."""
+    os.environ['LINE_CHANNEL_ACCESS_TOKEN'] = 'loadtest-token'
+    os.environ['LINE_CHANNEL_SECRET'] = args.secret
+    os.environ.pop('GOOGLE_SHEET_ID', None)
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ['SERVICE_POOL_SIZE'] = str(args.pool_size or args.concurrency)
+
+    import server
+    # Let background init settle so it cannot overwrite the stand-ins below
+    server.startup.wait(10)
+
+    server.line_bot_api = StubLineBotApi(args.line_latency_ms / 1000, args.media_bytes)
+    sheets = FakeSheetsClient(
+        latency=args.sheets_latency_ms / 1000,
+        insert_cost_per_row=args.sheets_insert_cost_us / 1e6,
+        write_quota=args.sheets_write_quota or None,
+        seed=args.seed,
+    )
+    server.use_sheets(lambda: sheets.open_by_key('loadtest'))
+    server.fake_sheets_client = sheets
+
+    fixtures = load_fixtures(args.fixtures)
+    server.speech_backend = StubSpeechBackend(
+        fixtures, latency=args.speech_latency_ms / 1000,
+        failure_rate=args.recognition_failure_rate, seed=args.seed,
+    )
+    server.ocr_backend = StubOcrBackend(
+        fixtures, latency=args.vision_latency_ms / 1000,
+        failure_rate=args.recognition_failure_rate, seed=args.seed,
+    )
+    return server
+
+
+# --- Targets ----------------------------------------------------------------------
+
+class InProcessTarget:
+    """Posts through Flask's test client; one client per load thread."""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def post(self, body: bytes, signature: str) -> int:
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.post('/webhook', data=body, headers={
+            'Content-Type': 'application/json',
+            'X-Line-Signature': signature,
+        })
+        return response.status_code
+
+
+class HttpTarget:
+
+    def __init__(self, url: str, timeout: float = 30):
+        self.url = url
+        self.timeout = timeout
+
+    def post(self, body: bytes, signature: str) -> int:
+        request = urllib.request.Request(self.url, data=body, method='POST', headers={
+            'Content-Type': 'application/json',
+            'X-Line-Signature': signature,
+        })
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+# --- Driver -----------------------------------------------------------------------
+
+def run_load(target, factory: EventFactory, mix: dict, rate: float, duration: float,
+             concurrency: int, events_per_request: int, secret: str):
+    """Open-loop: requests are scheduled at a fixed rate regardless of completions.
+
+    Latency is measured from the scheduled send time, so time spent waiting
+    for a free load thread counts (no coordinated omission).
+    """
+    kinds, weights = zip(*mix.items())
+    results = []
+    results_lock = threading.Lock()
+
+    def send(scheduled, kind, body, signature):
+        sent = time.perf_counter()
+        try:
+            status = target.post(body, signature)
+        except Exception:
+            status = 0
+        finished = time.perf_counter()
+        with results_lock:
+            # (kind, status, latency from schedule, service time from actual send)
+            results.append((kind, status, finished - scheduled, finished - sent))
+
+    total = int(rate * duration)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i in range(total):
+            scheduled = started + i / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            chosen = factory.random.choices(kinds, weights)[:1] * events_per_request
+            body = build_body([factory.build(kind) for kind in chosen])
+            pool.submit(send, scheduled, chosen[0], body, sign(body, secret))
+    elapsed = time.perf_counter() - started
+    return results, elapsed
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def summarize(results, elapsed):
+    def stats(rows):
+        latencies = [row[2] * 1000 for row in rows]
+        errors = sum(1 for row in rows if row[1] != 200)
+        return {
+            'requests': len(rows),
+            'errors': errors,
+            'error_rate': errors / len(rows) if rows else 0.0,
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'p99_ms': percentile(latencies, 99),
+            'mean_ms': statistics.mean(latencies),
+        }
+
+    by_kind = defaultdict(list)
+    for row in results:
+        by_kind[row[0]].append(row)
+
+    return {
+        'elapsed_s': elapsed,
+        'throughput_rps': len(results) / elapsed if elapsed else 0.0,
+        'overall': stats(results),
+        'by_kind': {kind: stats(rows) for kind, rows in sorted(by_kind.items())},
+    }
+
+
+def add_io_wait(summary, results, cpu_seconds):
+    """Estimate wait/compute per request, which sizes gthread threads (1 + W/C per core).
+
+    Uses the median service time (from the actual send, so load-generator
+    queueing is excluded). CPU time includes the load generator itself,
+    so the ratio errs low, i.e. toward fewer threads.
+    """
+    cpu_ms = cpu_seconds * 1000 / len(results)
+    service_ms = statistics.median(row[3] for row in results) * 1000
+    wait_ms = max(0.0, service_ms - cpu_ms)
+    summary['cpu_ms_per_request'] = cpu_ms
+    summary['wait_compute_ratio'] = wait_ms / cpu_ms if cpu_ms else 0.0
+
+
+def measure_ingress(server, factory: EventFactory, mix: dict, events_per_request: int, secret: str,
+                    samples: int = 2000) -> dict:
+    """CPU per delivery for signature check and parsing, against linebot's WebhookParser.
+
+    Single-threaded and outside the load run, so it is the cost of ingress
+    alone; the SDK path decodes the body to str as the old webhook did.
+    """
+    from linebot import WebhookParser as SdkWebhookParser
+
+    kinds, weights = zip(*mix.items())
+    deliveries = []
+    for _ in range(samples):
+        chosen = factory.random.choices(kinds, weights)[:1] * events_per_request
+        body = build_body([factory.build(kind) for kind in chosen])
+        deliveries.append((body, sign(body, secret)))
+
+    def cpu_us(parse):
+        started = time.process_time()
+        for body, signature in deliveries:
+            parse(body, signature)
+        return (time.process_time() - started) * 1e6 / samples
+
+    sdk = SdkWebhookParser(secret)
+    return {
+        'ingress_cpu_us': cpu_us(server.webhook_parser.parse),
+        'ingress_sdk_cpu_us': cpu_us(lambda body, signature: sdk.parse(body.decode('utf-8'), signature)),
+    }
+
+
+def print_report(summary):
+    print(f"Completed {summary['overall']['requests']:,} requests in {summary['elapsed_s']:.1f}s "
+          f"({summary['throughput_rps']:.1f} req/s)")
+    print(f"{'kind':<10}{'requests':>9}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'mean ms':>9}")
+    rows = list(summary['by_kind'].items()) + [('overall', summary['overall'])]
+    for kind, s in rows:
+        print(f"{kind:<10}{s['requests']:>9,}{s['errors']:>8,}{s['p50_ms']:>9.1f}"
+              f"{s['p95_ms']:>9.1f}{s['p99_ms']:>9.1f}{s['mean_ms']:>9.1f}")
+    if 'sheets_calls' in summary:
+        calls = ', '.join(f"{name}={count}" for name, count in sorted(summary['sheets_calls'].items()))
+        print(f"Sheets API calls: {calls}; quota errors (429): {summary['sheets_quota_errors']}")
+    if 'wait_compute_ratio' in summary:
+        print(f"CPU per request {summary['cpu_ms_per_request']:.1f} ms, wait/compute "
+              f"{summary['wait_compute_ratio']:.1f} -> about {1 + summary['wait_compute_ratio']:.0f} threads per core")
+    if 'ingress_cpu_us' in summary:
+        print(f"Ingress CPU per request {summary['ingress_cpu_us']:.0f} us "
+              f"(linebot WebhookParser {summary['ingress_sdk_cpu_us']:.0f} us)")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="LINE Webhook 負載測試")
+    parser.add_argument('--rate', type=float, default=20, help='每秒請求數')
+    parser.add_argument('--duration', type=float, default=10, help='測試秒數')
+    parser.add_argument('--concurrency', type=int, default=32, help='同時送出的請求上限')
+    parser.add_argument('--mix', default='text=70,command=10,audio=10,image=10', help='事件比例')
+    parser.add_argument('--events-per-request', type=int, default=1, help='每個 Webhook 的事件數')
+    parser.add_argument('--users', type=int, default=200, help='模擬使用者數')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--secret', default=DEFAULT_SECRET, help='Channel secret（--url 模式需與伺服器一致）')
+    parser.add_argument('--url', help='改為對實際部署的 Webhook URL 送出請求')
+    parser.add_argument('--line-latency-ms', type=float, default=50)
+    parser.add_argument('--sheets-latency-ms', type=float, default=150)
+    parser.add_argument('--sheets-insert-cost-us', type=float, default=5, help='插入時每列下移的成本')
+    parser.add_argument('--sheets-write-quota', type=int, default=0, help='每分鐘寫入上限，0 表示不限')
+    parser.add_argument('--speech-latency-ms', type=float, default=800)
+    parser.add_argument('--vision-latency-ms', type=float, default=400)
+    parser.add_argument('--media-bytes', type=int, default=200 * 1024, help='模擬下載的媒體大小')
+    parser.add_argument('--fixtures', help='語音 / 圖片辨識替身的 fixture 檔（預設為內建單一結果）')
+    parser.add_argument('--recognition-failure-rate', type=float, default=0.0, help='辨識 API 失敗比例')
+    parser.add_argument('--pool-size', type=int, help='每個共用客戶端的連線池大小（預設同 --concurrency）')
+    parser.add_argument('--json', help='將結果寫入 JSON 檔')
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+
+    sheets = None
+    if args.url:
+        target = HttpTarget(args.url)
+    else:
+        server = install_stand_ins(args)
+        sheets = server.fake_sheets_client
+        target = InProcessTarget(server.app)
+
+    factory = EventFactory(users=args.users, seed=args.seed)
+    cpu_started = time.process_time()
+    results, elapsed = run_load(target, factory, parse_mix(args.mix), args.rate, args.duration,
+                                args.concurrency, args.events_per_request, args.secret)
+    cpu = time.process_time() - cpu_started
+    summary = summarize(results, elapsed)
+    summary['config'] = vars(args)
+    if not args.url and results:
+        add_io_wait(summary, results, cpu)
+        summary.update(measure_ingress(server, factory, parse_mix(args.mix), args.events_per_request, args.secret))
+    if sheets:
+        summary['sheets_calls'] = dict(sheets.calls)
+        summary['sheets_quota_errors'] = sum(sheets.rejected.values())
+    print_report(summary)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
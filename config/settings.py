@@ -13,6 +13,34 @@ class Config:
     GOOGLE_SHEET_ID = os.getenv('GOOGLE_SHEET_ID')
     GOOGLE_CLOUD_PROJECT = os.getenv('GOOGLE_CLOUD_PROJECT')
     
+    # Sheets API backend: 'google', or 'fake' for the in-process stand-in (offline dev/benchmarks)
+    SHEETS_BACKEND = os.getenv('SHEETS_BACKEND', 'google')
+    
+    # Sheets storage layout: 'single' worksheet or one worksheet per 'monthly' partition
+    SHEETS_PARTITION_MODE = os.getenv('SHEETS_PARTITION_MODE', 'single')
+    SHEETS_WORKSHEET_PREFIX = os.getenv('SHEETS_WORKSHEET_PREFIX', 'Inspiration_Notes')
+    SHEETS_QUERY_WORKERS = int(os.getenv('SHEETS_QUERY_WORKERS', 4))
+    
+    # Storage backend: 'sheets' or 'sqlite' (local primary, Sheets as async replica)
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'sheets')
+    SQLITE_PATH = os.getenv('SQLITE_PATH', 'data/inspiration.db')
+    SQLITE_REPLICATE_TO_SHEETS = os.getenv('SQLITE_REPLICATE_TO_SHEETS', 'True').lower() == 'true'
+    SHEETS_REPLICATION_BATCH_SIZE = int(os.getenv('SHEETS_REPLICATION_BATCH_SIZE', 100))
+    SHEETS_REPLICATION_INTERVAL = float(os.getenv('SHEETS_REPLICATION_INTERVAL', 5))
+    
+    # Per-user cache of /today, /stats, /tags and /related replies, dropped when the user writes
+    COMMAND_CACHE_TTL = float(os.getenv('COMMAND_CACHE_TTL', 300))
+    COMMAND_CACHE_MAX_USERS = int(os.getenv('COMMAND_CACHE_MAX_USERS', 1000))
+    
+    # Per-user statistics maintained on write; the snapshot is caught up from storage on start
+    USER_STATS_ENABLED = os.getenv('USER_STATS_ENABLED', 'True').lower() == 'true'
+    USER_STATS_PATH = os.getenv('USER_STATS_PATH', 'data/user_stats.json')
+    USER_STATS_FLUSH_INTERVAL = float(os.getenv('USER_STATS_FLUSH_INTERVAL', 30))
+    
+    # Per-user TF-IDF index behind /related, built on first lookup and updated on write
+    RELATED_NOTES_ENABLED = os.getenv('RELATED_NOTES_ENABLED', 'True').lower() == 'true'
+    RELATED_NOTES_MAX_USERS = int(os.getenv('RELATED_NOTES_MAX_USERS', 200))
+    
     PORT = int(os.getenv('PORT', 5000))
     FLASK_ENV = os.getenv('FLASK_ENV', 'production')
     DEBUG = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
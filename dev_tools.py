@@ -237,13 +237,16 @@ class DevTools:
         
         return success
     
-    def backup_data(self):
-        """備份資料"""
+    def backup_data(self, fmt='jsonl', compression='gzip', incremental=False):
+        """備份資料（串流寫出 JSON Lines / CSV，可壓縮、可增量）"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         backup_dir = self.project_root / "backups"
         backup_dir.mkdir(exist_ok=True)
         
-        backup_file = backup_dir / f"backup_{timestamp}.json"
+        suffix = {'gzip': '.gz', 'zstd': '.zst', 'none': ''}[compression]
+        kind = "incremental" if incremental else "backup"
+        backup_file = backup_dir / f"{kind}_{timestamp}.{fmt}{suffix}"
+        checkpoint_file = backup_dir / ".backup_checkpoint.json"
         
         print(f"💾 建立資料備份: {backup_file}")
         
@@ -251,7 +254,11 @@ class DevTools:
             from app.services.sheets_service import SheetsService
             
             sheets_service = SheetsService()
-            success = sheets_service.backup_data(str(backup_file))
+            success = sheets_service.backup_data(
+                str(backup_file),
+                checkpoint_path=str(checkpoint_file),
+                incremental=incremental
+            )
             
             if success:
                 print("✅ 資料備份完成")
@@ -263,6 +270,40 @@ class DevTools:
         except Exception as e:
             print(f"❌ 備份過程發生錯誤: {e}")
             return False
+    
+    def restore_data(self, backup_file, worksheet_title):
+        """從備份檔還原資料到指定工作表"""
+        print(f"📥 還原備份 {backup_file} → 工作表 {worksheet_title}")
+        
+        try:
+            import gspread
+            from app.models.message_model import MessageModel
+            from app.services.backup_service import BulkImporter
+            from app.services.sheets_service import SheetsService
+            
+            sheets_service = SheetsService()
+            if not sheets_service.sheet:
+                print("❌ 無法開啟 Google Sheets")
+                return False
+            
+            try:
+                worksheet = sheets_service.sheet.worksheet(worksheet_title)
+            except gspread.WorksheetNotFound:
+                worksheet = sheets_service.sheet.add_worksheet(title=worksheet_title, rows=1000, cols=10)
+                worksheet.append_row(MessageModel.get_sheets_headers())
+            
+            count = BulkImporter(worksheet).import_file(str(backup_file))
+            if count:
+                # 還原的記錄可能早於統計快照，通知執行中的伺服器重建統計
+                from app.services.user_stats import bump_storage_epoch
+                from config.settings import Config
+                bump_storage_epoch(Config.USER_STATS_PATH)
+            print(f"✅ 已還原 {count} 筆資料")
+            return True
+            
+        except Exception as e:
+            print(f"❌ 還原過程發生錯誤: {e}")
+            return False
 
 def main():
     parser = argparse.ArgumentParser(description="LINE Bot 開發工具")
@@ -293,7 +334,15 @@ def main():
     subparsers.add_parser('lint', help='檢查程式碼風格')
     
     # 備份資料
-    subparsers.add_parser('backup', help='備份資料')
+    backup_parser = subparsers.add_parser('backup', help='備份資料')
+    backup_parser.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl', help='備份格式')
+    backup_parser.add_argument('--compression', choices=['gzip', 'zstd', 'none'], default='gzip', help='壓縮方式')
+    backup_parser.add_argument('--incremental', action='store_true', help='只備份上次備份後的新資料')
+    
+    # 還原資料
+    restore_parser = subparsers.add_parser('restore', help='從備份檔還原資料')
+    restore_parser.add_argument('file', help='備份檔案路徑 (.jsonl/.csv，可為 .gz/.zst)')
+    restore_parser.add_argument('--worksheet', default='Restored_Notes', help='還原目標工作表')
     
     args = parser.parse_args()
     
@@ -316,7 +365,9 @@ def main():
     elif args.command == 'lint':
         dev_tools.lint_code()
     elif args.command == 'backup':
-        dev_tools.backup_data()
+        dev_tools.backup_data(fmt=args.format, compression=args.compression, incremental=args.incremental)
+    elif args.command == 'restore':
+        dev_tools.restore_data(args.file, args.worksheet)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
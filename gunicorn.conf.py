@@ -0,0 +1,50 @@
+"""
+Gunicorn settings, read automatically from the working directory.
+
+Workers use gthread: a webhook spends most of its time waiting on LINE
+and Google, so each worker runs 1 + W/C threads, where W/C is the
+wait/compute ratio reported by benchmarks/loadtest.py. One worker per
+core (up to 4) keeps the GIL from capping CPU-bound work. gevent is not
+supported: the gRPC clients behind Speech and Vision do not cooperate
+with its monkey-patching.
+
+GUNICORN_PRELOAD=1 imports the app and its client libraries once in the
+master so forked workers share those pages; services are still
+initialized per worker in post_fork.
+"""
+import glob
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count(), 4)))
+io_wait_ratio = float(os.environ.get('GUNICORN_IO_WAIT_RATIO', 19))
+threads = int(os.environ.get('GUNICORN_THREADS', min(32, max(2, round(1 + io_wait_ratio)))))
+timeout = 120
+accesslog = '-'
+errorlog = '-'
+preload_app = os.environ.get('GUNICORN_PRELOAD') == '1'
+
+# One pooled LINE / Sheets connection per thread, so no thread waits on another's
+os.environ.setdefault('SERVICE_POOL_SIZE', str(threads))
+
+
+def on_starting(server):
+    # Snapshots left by workers of a previous run would be merged into /metrics;
+    # temp files are from writes a killed worker never renamed
+    multiproc_dir = os.environ.get('METRICS_MULTIPROC_DIR')
+    if multiproc_dir:
+        for pattern in ('metrics_*.json', 'metrics_*.tmp'):
+            for path in glob.glob(os.path.join(multiproc_dir, pattern)):
+                os.remove(path)
+
+
+def post_fork(server, worker):
+    # The log listener thread does not survive fork
+    from app.utils.logger import setup_logger
+    setup_logger()
+
+    if preload_app:
+        import server as bot_server
+        bot_server.init_services()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+批次匯入工具 - 將使用者既有的歷史筆記 (JSONL / CSV) 匯入 Google Sheets
+
+用法:
+    python import_tools.py notes.jsonl
+    python import_tools.py notes.csv.gz --chunk-size 1000 --requests-per-minute 55
+    python import_tools.py notes.jsonl --resume
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.models.message_model import MessageModel
+from app.services.backup_service import iter_worksheet_records, read_records
+from app.utils.helpers import sanitize_text
+
+TIMESTAMP_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y/%m/%d %H:%M:%S', '%Y-%m-%d')
+
+
+def content_hash(user_id, content):
+    """以使用者與處理後內容計算去重雜湊"""
+    return hashlib.sha1(f"{user_id}\x1f{content}".encode('utf-8')).hexdigest()
+
+
+def parse_timestamp(value):
+    if not value:
+        return None
+    value = str(value).strip()
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        pass
+    for fmt in TIMESTAMP_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def build_rows(records):
+    """在子行程中建立 MessageModel（含標籤擷取），回傳 (雜湊, 試算表列)"""
+    results = []
+    for record in records:
+        message = MessageModel(
+            user_id=str(record.get('user_id', '')).strip(),
+            message_type=record.get('message_type') or 'text',
+            content=str(record.get('content', '')),
+            timestamp=parse_timestamp(record.get('timestamp'))
+        )
+        if not message.is_valid():
+            continue
+        message.content = sanitize_text(message.content)
+        results.append((content_hash(message.user_id, message.processed_content), message.to_sheets_row()))
+    return results
+
+
+def iter_batches(path, batch_size, skip=0):
+    batch = []
+    for index, record in enumerate(read_records(path)):
+        if index < skip:
+            continue
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class BulkLoader:
+    def __init__(self, sheets_service, chunk_size=1000, requests_per_minute=55, workers=None, max_retries=5):
+        self.sheets_service = sheets_service
+        self.chunk_size = chunk_size
+        self.min_interval = 60.0 / requests_per_minute
+        self.workers = workers or os.cpu_count() or 1
+        self.max_retries = max_retries
+        self.seen = set()
+        self._last_write = 0.0
+
+    @staticmethod
+    def state_path(input_path):
+        return f"{input_path}.import_state.json"
+
+    def load_state(self, input_path):
+        path = self.state_path(input_path)
+        if not os.path.exists(path):
+            return {'records_done': 0, 'rows_written': 0, 'duplicates': 0}
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_state(self, input_path, state):
+        path = self.state_path(input_path)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(f"{path}.tmp", path)
+
+    def load_existing_hashes(self):
+        """讀取試算表既有資料，避免重複匯入（續傳時也包含已寫入的列）"""
+        service = self.sheets_service
+        worksheets = service.partitions.partitions_between() if service.partitions else [service.worksheet]
+
+        for worksheet in worksheets:
+            for record in iter_worksheet_records(worksheet):
+                self.seen.add(content_hash(str(record.get('user_id', '')), str(record.get('content', ''))))
+
+        print(f"🔍 已載入 {len(self.seen)} 筆既有資料雜湊")
+
+    def write_chunk(self, rows):
+        # 依配額控制寫入頻率，遇到 429 等錯誤時指數退避重試
+        for attempt in range(self.max_retries + 1):
+            wait = self.min_interval - (time.monotonic() - self._last_write)
+            if wait > 0:
+                time.sleep(wait)
+
+            try:
+                self._last_write = time.monotonic()
+                return self.sheets_service.append_rows(rows)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                backoff = min(2 ** attempt * 5, 120)
+                print(f"⚠️  寫入失敗，{backoff} 秒後重試: {e}")
+                time.sleep(backoff)
+
+    def run(self, input_path, resume=False):
+        state = self.load_state(input_path) if resume else {'records_done': 0, 'rows_written': 0, 'duplicates': 0}
+        if resume and state['records_done']:
+            print(f"⏩ 從第 {state['records_done']} 筆繼續匯入")
+
+        self.load_existing_hashes()
+        started = time.monotonic()
+        rows_at_start = state['rows_written']
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            pending = deque()
+            batches = iter_batches(input_path, self.chunk_size, skip=state['records_done'])
+
+            def submit_next():
+                batch = next(batches, None)
+                if batch is not None:
+                    pending.append((len(batch), executor.submit(build_rows, batch)))
+
+            # 保持有限數量的批次在處理中，記憶體用量不隨檔案大小成長
+            for _ in range(self.workers * 2):
+                submit_next()
+
+            while pending:
+                batch_size, future = pending.popleft()
+                submit_next()
+
+                rows = []
+                for row_hash, row in future.result():
+                    if row_hash in self.seen:
+                        state['duplicates'] += 1
+                        continue
+                    self.seen.add(row_hash)
+                    rows.append(row)
+
+                if rows:
+                    # 歷史資料較舊，依時間新到舊附加在既有資料之後
+                    rows.sort(key=lambda r: r[0], reverse=True)
+                    self.write_chunk(rows)
+
+                state['records_done'] += batch_size
+                state['rows_written'] += len(rows)
+                self.save_state(input_path, state)
+
+                elapsed = max(time.monotonic() - started, 1e-6)
+                rate = (state['rows_written'] - rows_at_start) / elapsed * 60
+                print(f"📦 已處理 {state['records_done']} 筆，寫入 {state['rows_written']} 筆，"
+                      f"重複 {state['duplicates']} 筆 ({rate:,.0f} 筆/分鐘)")
+
+        print(f"✅ 匯入完成: 寫入 {state['rows_written']} 筆，略過重複 {state['duplicates']} 筆")
+        return state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="歷史筆記批次匯入工具")
+    parser.add_argument('file', help='輸入檔案 (.jsonl / .csv，可為 .gz / .zst)')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='每次寫入的列數')
+    parser.add_argument('--requests-per-minute', type=float, default=55, help='每分鐘寫入請求上限（Sheets 配額為 60）')
+    parser.add_argument('--workers', type=int, default=None, help='建立 MessageModel 的平行行程數')
+    parser.add_argument('--resume', action='store_true', help='從上次中斷處繼續')
+    args = parser.parse_args()
+
+    from app.services.sheets_service import SheetsService
+
+    sheets_service = SheetsService()
+    if not sheets_service.worksheet:
+        print("❌ 無法開啟 Google Sheets，請檢查設定")
+        sys.exit(1)
+
+    loader = BulkLoader(
+        sheets_service,
+        chunk_size=args.chunk_size,
+        requests_per_minute=args.requests_per_minute,
+        workers=args.workers
+    )
+    state = loader.run(args.file, resume=args.resume)
+    if state['rows_written']:
+        # 匯入的歷史記錄比統計快照還舊，通知執行中的伺服器重建統計
+        from app.services.user_stats import bump_storage_epoch
+        from config.settings import Config
+        bump_storage_epoch(Config.USER_STATS_PATH)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,58 +7,137 @@ import json
 import logging
 import tempfile
 import base64
+import hmac
+import importlib
+import threading
 from datetime import datetime
-from flask import Flask, jsonify, request, abort
-from linebot import LineBotApi, WebhookHandler
+from flask import Flask, Response, jsonify, request, abort
+from linebot import LineBotApi
 from linebot.exceptions import InvalidSignatureError
-from linebot.models import MessageEvent, TextMessage, AudioMessage, ImageMessage, TextSendMessage
-import gspread
-from google.oauth2.service_account import Credentials
-from google.cloud import speech
-from google.cloud import vision
+from linebot.models import TextSendMessage
+from werkzeug.exceptions import RequestEntityTooLarge
 import urllib.request
 import io
+from contextlib import contextmanager
+from functools import partial
+from app.services.line_http import SessionHttpClient
+from app.services.line_webhook import WebhookParser
+from app.services.recognition import SPEECH_ENCODINGS, create_ocr_backend, create_speech_backend
+from app.services.sheet_partitions import SheetPartitionManager
+from app.utils.dispatcher import EventDispatcher, batch
+from app.utils.health import HealthMonitor
+from app.utils.logger import setup_logger
+from app.utils.metrics import metrics
+from app.utils.pool import ResourcePool
+from app.utils.ratelimit import ALLOWED, THROTTLED, create_rate_limiter
+from app.utils.profiler import ProfilerBusyError, sampling_profiler, slow_request_profiler
+from app.utils.readiness import FAILED, PermanentError, ServiceInitializer, StartupQueue
+from app.utils.tracing import tracer, hash_user_id
 
 # Create Flask app
 app = Flask(__name__)
 
 # Setup logging
-logging.basicConfig(level=logging.INFO)
+setup_logger()
 logger = logging.getLogger(__name__)
 
+# Client libraries imported on first use instead of at module load: the gRPC
+# and protobuf stacks behind them dominate worker start-up time and memory
+LAZY_MODULES = (
+    'gspread',
+    'google.oauth2.service_account',
+    'google.cloud.speech',
+    'google.cloud.vision',
+)
+
+# Connections per shared client; gunicorn.conf.py sets it to the thread count
+POOL_SIZE = int(os.environ.get('SERVICE_POOL_SIZE', 4))
+
 # LINE Bot configuration
 line_bot_api = None
-handler = None
+webhook_parser = None
+# message type -> dispatched handler
+event_handlers = {}
 sheets_service = None
+sheet_partitions = None
+# Callables returning the current worksheet, one gspread client each
+sheets_pool = None
+speech_backend = None
+ocr_backend = None
+_backend_lock = threading.Lock()
+
+# Events run in parallel across users and in strict order per user, with
+# separate concurrency limits so a burst of photos cannot starve text notes
+# or command replies
+EVENT_TIMEOUT = float(os.environ.get('EVENT_TIMEOUT', 10))
+dispatcher = EventDispatcher(name='events', limits={
+    'text': int(os.environ.get('EVENT_CONCURRENCY', POOL_SIZE)),
+    'command': int(os.environ.get('COMMAND_CONCURRENCY', 2)),
+    'media': int(os.environ.get('MEDIA_MAX_INFLIGHT', 2)),
+})
+# Media events waiting beyond this are acknowledged and answered by push ('ack') or refused ('reject')
+MEDIA_QUEUE_LIMIT = int(os.environ.get('MEDIA_QUEUE_LIMIT', 10))
+MEDIA_OVERFLOW = os.environ.get('MEDIA_OVERFLOW', 'ack')
+# LINE deliveries are a few KB even with many events
+MAX_WEBHOOK_BYTES = int(os.environ.get('MAX_WEBHOOK_BYTES', 256 * 1024))
+# Enforced by Werkzeug while reading, so chunked bodies without Content-Length are capped too
+app.config['MAX_CONTENT_LENGTH'] = MAX_WEBHOOK_BYTES
+
+# Per-user sliding-window limits, checked before any event is queued;
+# RATE_LIMIT_DB shares the counts between the workers on one host
+rate_limiter = create_rate_limiter(
+    os.environ.get('RATE_LIMITS', 'text=30/60,command=20/60,audio=6/60,image=6/60'),
+    os.environ.get('RATE_LIMIT_DB') or None,
+    int(os.environ.get('RATE_LIMIT_MAX_USERS', 10000)),
+)
+
+# Services start in the background; webhooks that arrive first wait in startup_queue
+startup = ServiceInitializer(max_backoff=float(os.environ.get('INIT_MAX_BACKOFF', 60)))
+
+# Dependency probes run in the background; /health/deep only reads the cache
+health_monitor = HealthMonitor(
+    interval=float(os.environ.get('HEALTH_PROBE_INTERVAL', 30)),
+    ttl=float(os.environ.get('HEALTH_PROBE_TTL', 90)),
+)
 
 def init_line_bot():
-    global line_bot_api, handler
-    try:
-        access_token = os.environ.get('LINE_CHANNEL_ACCESS_TOKEN')
-        channel_secret = os.environ.get('LINE_CHANNEL_SECRET')
-        
-        if access_token and channel_secret:
-            line_bot_api = LineBotApi(access_token)
-            handler = WebhookHandler(channel_secret)
-            # Add message handlers
-            handler.add(MessageEvent, message=TextMessage)(handle_text_message)
-            handler.add(MessageEvent, message=AudioMessage)(handle_audio_message)
-            handler.add(MessageEvent, message=ImageMessage)(handle_image_message)
-            logger.info("LINE Bot initialized successfully")
-        else:
-            logger.warning("LINE Bot credentials not found")
-    except Exception as e:
-        logger.error(f"Failed to initialize LINE Bot: {e}")
+    global line_bot_api, webhook_parser
+    access_token = os.environ.get('LINE_CHANNEL_ACCESS_TOKEN')
+    channel_secret = os.environ.get('LINE_CHANNEL_SECRET')
+    
+    if not (access_token and channel_secret):
+        logger.warning("LINE Bot credentials not found")
+        return False
+    
+    # Keep-alive connections shared by all threads (the SDK default opens one per call)
+    line_bot_api = LineBotApi(access_token, http_client=partial(SessionHttpClient, pool_size=POOL_SIZE))
+    event_handlers.update({
+        'text': dispatched(traced_event('text', handle_text_message)),
+        'audio': dispatched(traced_event('audio', handle_audio_message)),
+        'image': dispatched(traced_event('image', handle_image_message)),
+    })
+    webhook_parser = WebhookParser(channel_secret, event_handlers)
+    logger.info("LINE Bot initialized successfully")
+    return True
 
 def init_google_sheets():
-    global sheets_service
+    """Returns False when Sheets is not configured; raises so the caller retries,
+    or PermanentError when retrying cannot help"""
+    global sheets_service, sheet_partitions
     try:
         sheet_id = os.environ.get('GOOGLE_SHEET_ID')
         
         if not sheet_id:
             logger.warning("GOOGLE_SHEET_ID not set - Google Sheets disabled")
             sheets_service = None
-            return
+            return False
+        
+        if os.environ.get('SHEETS_BACKEND') == 'fake':
+            from app.services.fake_sheets import FakeSheetsClient
+            logger.info("Using in-process fake Google Sheets backend")
+            fake_client = FakeSheetsClient.from_env()
+            use_sheets(lambda: fake_client.open_by_key(sheet_id))
+            return True
         
         # Create credentials using only the essential fields
         # This bypasses many potential formatting issues
@@ -94,16 +173,8 @@ def init_google_sheets():
                 logger.warning("Private key missing proper footer, adding it")
                 private_key = private_key + '\n-----END PRIVATE KEY-----'
             
-            # Method 3: Log key structure for debugging
+            # Method 3: Try to reconstruct the key if it's mangled
             lines = private_key.split('\n')
-            logger.info(f"Private key has {len(lines)} lines")
-            if lines:
-                logger.info(f"First line: '{lines[0][:50]}...'")
-                logger.info(f"Last line: '...{lines[-1][-50:]}'")
-            else:
-                logger.info("Private key lines are empty")
-            
-            # Method 4: Try to reconstruct the key if it's mangled
             if len(lines) < 3:  # Should have header, content, footer at minimum
                 logger.warning("Private key appears to be on single line, attempting to reconstruct")
                 # This is a common issue - the key gets flattened
@@ -129,30 +200,82 @@ def init_google_sheets():
         else:
             logger.error("GOOGLE_PRIVATE_KEY environment variable not found")
             sheets_service = None
-            return
+            return False
         
-        # Create credentials
-        credentials = Credentials.from_service_account_info(
-            cred_info,
-            scopes=['https://www.googleapis.com/auth/spreadsheets']
-        )
+        import gspread
+        from google.oauth2.service_account import Credentials
         
-        # Connect to Google Sheets
-        client = gspread.authorize(credentials)
-        sheets_service = client.open_by_key(sheet_id).sheet1
-        logger.info("Google Sheets initialized successfully!")
+        # Create credentials; a key that does not parse will not parse on retry either
+        try:
+            credentials = Credentials.from_service_account_info(
+                cred_info,
+                scopes=['https://www.googleapis.com/auth/spreadsheets']
+            )
+        except ValueError as e:
+            raise PermanentError(f"Invalid GOOGLE_PRIVATE_KEY: {e}") from e
+        
+        # Connect to Google Sheets; each pooled connection gets its own HTTP session
+        use_sheets(lambda: gspread.authorize(credentials).open_by_key(sheet_id))
+        return True
         
     except Exception as e:
         logger.error(f"Failed to initialize Google Sheets: {e}")
         sheets_service = None
+        if isinstance(e, PermanentError) or not is_permanent_sheets_error(e):
+            raise
+        raise PermanentError(f"{type(e).__name__}: {e}") from e
+
+def is_permanent_sheets_error(error):
+    """Auth and configuration errors, as opposed to network trouble, quota and 5xx"""
+    if isinstance(error, ImportError):
+        return True
+    import gspread
+    from google.auth.exceptions import RefreshError
+    if isinstance(error, gspread.exceptions.SpreadsheetNotFound):
+        return True
+    if isinstance(error, RefreshError):
+        # invalid_grant and friends; google-auth marks the transient ones retryable
+        return not getattr(error, 'retryable', False)
+    if isinstance(error, gspread.exceptions.APIError):
+        return error.response.status_code in (400, 401, 403, 404)
+    return False
+
+def use_sheets(connect):
+    """Pool connections opened by connect(); the first is opened now so failures surface in init"""
+    global sheets_service, sheet_partitions, sheets_pool
+    pool = ResourcePool(
+        lambda: open_worksheet(connect())[0],
+        max_size=POOL_SIZE,
+        name='sheets'
+    )
+    current_worksheet, partitions = open_worksheet(connect())
+    pool.add(current_worksheet)
+    sheet_partitions = partitions
+    sheets_service = current_worksheet()
+    sheets_pool = pool
+    logger.info("Google Sheets initialized successfully!")
+
+def open_worksheet(spreadsheet):
+    """Returns (callable giving the worksheet to write to, partition manager or None)"""
+    if os.environ.get('SHEETS_PARTITION_MODE') == 'monthly':
+        # One worksheet per month, rolled over automatically
+        partitions = SheetPartitionManager(
+            spreadsheet,
+            prefix=os.environ.get('SHEETS_WORKSHEET_PREFIX', 'Inspiration_Notes')
+        )
+        return partitions.get_partition, partitions
+    worksheet = spreadsheet.sheet1
+    return (lambda: worksheet), None
 
 def add_message_to_sheet(user_id, message_type, content):
     try:
         if sheets_service:
             timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             row_data = [timestamp, message_type, content, user_id, '', 'processed']
-            sheets_service.insert_row(row_data, 2)  # Insert at row 2 (after header)
-            logger.info(f"Message added to sheet: {content[:50]}...")
+            with sheets_pool.acquire() as current_worksheet, \
+                    external_call('sheets', 'sheet_write', event_type=message_type):
+                current_worksheet().insert_row(row_data, 2)  # Insert at row 2 (after header)
+            logger.debug(f"Message added to sheet: {message_type}, {len(content)} chars")
             return True
     except Exception as e:
         logger.error(f"Failed to add message to sheet: {e}")
@@ -168,12 +291,124 @@ def index():
 
 @app.route('/health')
 def health_check():
+    """Liveness only: answers as soon as the worker is up, touches no dependency"""
     return jsonify({
         'status': 'healthy', 
         'service': 'linebot-inspiration',
         'port': os.environ.get('PORT', 'unknown')
     }), 200
 
+@app.route('/health/deep')
+def deep_health_check():
+    """Cached dependency probes: never calls Google or LINE on the request path"""
+    snapshot = health_monitor.snapshot()
+    return jsonify(snapshot), 200 if snapshot['status'] == 'healthy' else 503
+
+@app.route('/ready')
+def readiness_check():
+    """Readiness: 200 once every configured dependency is initialized"""
+    status = startup.status()
+    return jsonify(status), 200 if status['ready'] else 503
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+def require_admin():
+    """Admin endpoints exist only when ADMIN_TOKEN is set, and require it"""
+    admin_token = os.environ.get('ADMIN_TOKEN')
+    if not admin_token:
+        abort(404)
+    supplied = request.headers.get('X-Admin-Token', '')
+    authorization = request.headers.get('Authorization', '')
+    if authorization.startswith('Bearer '):
+        supplied = authorization[len('Bearer '):]
+    if not hmac.compare_digest(supplied.encode(), admin_token.encode()):
+        abort(401)
+
+@app.route('/admin/profile')
+def admin_profile():
+    """Sample all threads of this worker for N seconds; returns collapsed stacks"""
+    require_admin()
+    try:
+        seconds = float(request.args.get('seconds', 10))
+    except ValueError:
+        abort(400)
+    try:
+        collapsed = sampling_profiler.profile(seconds)
+    except ProfilerBusyError:
+        return jsonify({'error': 'profile already running'}), 409
+    return Response(collapsed, mimetype='text/plain', headers={'X-Worker-Pid': str(os.getpid())})
+
+@contextmanager
+def external_call(api, stage, **labels):
+    """Record a Google/LINE API call as both a metric and a trace span"""
+    with tracer.span(f"{api}.{stage}", **labels), metrics.external_call(api, stage, **labels):
+        yield
+
+def traced_event(message_type, func):
+    """Wrap an event handler in a child span of the webhook trace"""
+    def traced(event):
+        attributes = {'message_type': message_type, 'user': hash_user_id(event.source.user_id)}
+        if message_type == 'text':
+            attributes['payload_size'] = len(event.message.text)
+        with tracer.span('event', **attributes):
+            return func(event)
+    return traced
+
+def partition_key(event):
+    source = event.source
+    return (getattr(source, 'user_id', None) or getattr(source, 'group_id', None)
+            or getattr(source, 'room_id', None))
+
+def event_class(event):
+    if event.message.type == 'text':
+        return 'command' if event.message.text.startswith('/') else 'text'
+    return 'media'
+
+def rate_limit_kind(event):
+    kind = event_class(event)
+    return event.message.type if kind == 'media' else kind
+
+def dispatched(func):
+    """Admit an event to its user's queue; the webhook itself only enqueues"""
+    def submit(event):
+        limit_kind = rate_limit_kind(event)
+        limited = rate_limiter.check(limit_kind, partition_key(event))
+        if limited != ALLOWED:
+            metrics.inc('linebot_rate_limited_total', event_type=limit_kind, action=limited)
+            if limited == THROTTLED:
+                send_notice(event, "🐢 訊息太頻繁了，請稍後再傳", 'rate_limit')
+            return
+        kind = event_class(event)
+        if kind == 'media' and dispatcher.waiting_for(kind) >= MEDIA_QUEUE_LIMIT:
+            metrics.inc('linebot_admission_overflow_total', event_class=kind, action=MEDIA_OVERFLOW)
+            if MEDIA_OVERFLOW == 'reject':
+                send_notice(event, "⚠️ 目前處理的語音 / 圖片較多，請稍後再傳一次", 'overflow')
+                return
+            # The reply token is used now; the result goes out by push
+            send_notice(event, "⏳ 排隊中，處理完成後會通知你", 'overflow')
+            event.deferred_reply = True
+            dispatcher.submit(partition_key(event), func, event, wait=False, kind=kind)
+            return
+        dispatcher.submit(partition_key(event), func, event, kind=kind)
+    return submit
+
+def send_notice(event, text, event_type):
+    """Reply from the webhook thread; a LINE error must not abort the delivery's remaining events"""
+    try:
+        send_reply(event, text, event_type)
+    except Exception as e:
+        logger.error(f"Failed to send {event_type} notice: {e}")
+
+def send_reply(event, text, event_type):
+    if getattr(event, 'deferred_reply', False):
+        with external_call('line', 'push', event_type=event_type):
+            line_bot_api.push_message(event.source.user_id, TextSendMessage(text=text))
+        return
+    with external_call('line', 'reply', event_type=event_type):
+        line_bot_api.reply_message(event.reply_token, TextSendMessage(text=text))
+
 @app.route('/webhook', methods=['POST', 'GET'])
 def webhook():
     # Handle LINE webhook verification
@@ -181,31 +416,73 @@ def webhook():
         return 'Webhook endpoint is ready', 200
     
     # Handle POST requests from LINE
+    metrics.add_gauge('linebot_inflight_requests', 1)
+    status = 200
     try:
         signature = request.headers.get('X-Line-Signature', '')
-        body = request.get_data(as_text=True)
-        
-        logger.info(f"Webhook received: signature={signature[:20]}...")
-        
-        if handler:
-            handler.handle(body, signature)
-        else:
+        try:
+            body = request.get_data()
+        except RequestEntityTooLarge:
+            status = 413
+            return '', 413
+        
+        logger.debug(f"Webhook received: {len(body)} bytes")
+        
+        if not webhook_parser:
+            if not startup.ready:
+                # Cannot verify yet; LINE redelivers on 5xx
+                status = 503
+                return '', 503
             logger.warning("LINE Bot handler not initialized")
+            return '', 200
+        
+        with metrics.timer('linebot_stage_duration_seconds', stage='signature', event_type='webhook'):
+            if not webhook_parser.verify(body, signature):
+                raise InvalidSignatureError()
+        if not startup.ready:
+            # Process once Sheets is connected
+            if not startup_queue.submit(body):
+                status = 503
+                return '', 503
+        else:
+            process_webhook(body)
         
         return '', 200
     except InvalidSignatureError:
         logger.error("Invalid signature")
+        status = 400
         abort(400)
     except Exception as e:
         logger.error(f"Webhook error: {e}")
+        status = 500
         return '', 500
+    finally:
+        metrics.add_gauge('linebot_inflight_requests', -1)
+        metrics.inc('linebot_webhook_requests_total', status=status)
+
+def process_webhook(body):
+    """Dispatch the events of a delivery whose signature was already verified"""
+    with tracer.trace('webhook', payload_size=len(body)), \
+            slow_request_profiler.profile('webhook'), \
+            metrics.timer('linebot_stage_duration_seconds', stage='webhook', event_type='webhook'), \
+            batch(EVENT_TIMEOUT):
+        for event in webhook_parser.parse(body):
+            event_handlers[event.message.type](event)
+
+startup_queue = StartupQueue(
+    startup,
+    process_webhook,
+    max_size=int(os.environ.get('STARTUP_QUEUE_SIZE', 1000)),
+    max_wait=float(os.environ.get('STARTUP_QUEUE_MAX_WAIT', 20)),
+)
 
 def handle_text_message(event):
     try:
         user_id = event.source.user_id
         text_content = event.message.text
+        metrics.inc('linebot_events_total', event_type='text')
         
-        logger.info(f"Received message from {user_id}: {text_content}")
+        logger.info(f"Received text message: {len(text_content)} chars")
         
         # Try to add message to Google Sheets
         success = add_message_to_sheet(user_id, 'text', text_content)
@@ -219,11 +496,8 @@ def handle_text_message(event):
             reply_text = f"❌ 記錄失敗：{text_content}\n請稍後再試"
         
         if line_bot_api:
-            line_bot_api.reply_message(
-                event.reply_token,
-                TextSendMessage(text=reply_text)
-            )
-            logger.info("Reply sent successfully")
+            send_reply(event, reply_text, 'text')
+            logger.debug("Reply sent successfully")
         else:
             logger.error("LINE Bot API not initialized")
         
@@ -234,74 +508,90 @@ def handle_text_message(event):
         
         if line_bot_api:
             try:
-                line_bot_api.reply_message(
-                    event.reply_token,
-                    TextSendMessage(text="處理訊息時發生錯誤")
-                )
+                send_reply(event, "處理訊息時發生錯誤", 'text')
             except Exception as e2:
                 logger.error(f"Failed to send error reply: {e2}")
 
+def cloud_credentials():
+    """Service account credentials for the Speech and Vision APIs"""
+    from google.oauth2.service_account import Credentials
+    
+    cred_info = get_google_credentials()
+    if not cred_info:
+        raise Exception("Failed to get Google credentials")
+    return Credentials.from_service_account_info(
+        cred_info,
+        scopes=['https://www.googleapis.com/auth/cloud-platform']
+    )
+
+def probe_line():
+    if line_bot_api is None:
+        return False
+    line_bot_api.get_bot_info()
+
+def probe_sheets():
+    dependency = startup.dependencies.get('sheets')
+    if dependency and dependency.state == FAILED:
+        raise RuntimeError(f"failed to connect: {dependency.last_error}")
+    if dependency and not dependency.settled:
+        raise RuntimeError(f"not connected yet ({dependency.state}): {dependency.last_error}")
+    if sheets_service is None:
+        return False
+    # One-row read: the cheapest call that exercises auth and the spreadsheet
+    with sheets_pool.acquire() as current_worksheet:
+        current_worksheet().row_values(1)
+
+def probe_backend(get_backend):
+    def probe():
+        # Not probed until first use, so health checks do not defeat lazy loading
+        backend = get_backend()
+        if backend is None:
+            return False
+        backend.probe()
+    return probe
+
+def get_speech_backend():
+    global speech_backend
+    with _backend_lock:
+        if speech_backend is None:
+            speech_backend = create_speech_backend(cloud_credentials)
+    return speech_backend
+
+def get_ocr_backend():
+    global ocr_backend
+    with _backend_lock:
+        if ocr_backend is None:
+            ocr_backend = create_ocr_backend(cloud_credentials)
+    return ocr_backend
+
 def convert_audio_to_text(audio_content, content_type='audio/m4a'):
-    """Convert audio content to text using Google Speech-to-Text"""
+    """Convert audio content to text using the configured speech backend"""
     try:
-        # Initialize Speech client with credentials
-        cred_info = get_google_credentials()
-        if not cred_info:
-            raise Exception("Failed to get Google credentials")
-            
-        credentials = Credentials.from_service_account_info(
-            cred_info,
-            scopes=['https://www.googleapis.com/auth/cloud-platform']
-        )
+        backend = get_speech_backend()
         
-        speech_client = speech.SpeechClient(credentials=credentials)
+        logger.debug(f"Processing audio: {len(audio_content)} bytes")
         
-        logger.info(f"Processing audio: {len(audio_content)} bytes")
-        
-        # Try multiple encoding configurations for LINE audio
-        encoding_configs = [
-            # Configuration 1: Try MP4/M4A format
-            {
-                'encoding': speech.RecognitionConfig.AudioEncoding.MP3,
-                'description': 'MP3 encoding'
-            },
-            # Configuration 2: Try WEBM_OPUS (common for mobile)
-            {
-                'encoding': speech.RecognitionConfig.AudioEncoding.WEBM_OPUS,
-                'description': 'WEBM_OPUS encoding'
-            },
-            # Configuration 3: Let Google auto-detect
-            {
-                'encoding': speech.RecognitionConfig.AudioEncoding.ENCODING_UNSPECIFIED,
-                'description': 'Auto-detect encoding'
-            }
-        ]
-        
-        for config_attempt in encoding_configs:
+        # Try multiple encodings for LINE audio, ending with auto-detect
+        for encoding in SPEECH_ENCODINGS:
             try:
-                logger.info(f"Trying {config_attempt['description']}")
-                
-                audio = speech.RecognitionAudio(content=audio_content)
-                config = speech.RecognitionConfig(
-                    encoding=config_attempt['encoding'],
-                    language_code='zh-TW',  # Traditional Chinese
-                    alternative_language_codes=['en-US', 'ja-JP'],  # Fallback languages
-                    enable_automatic_punctuation=True,
-                )
+                logger.debug(f"Trying {encoding} encoding")
                 
-                # Perform speech recognition
-                response = speech_client.recognize(config=config, audio=audio)
+                with external_call('speech', 'recognize', event_type='audio'):
+                    result = backend.recognize(
+                        audio_content,
+                        encoding,
+                        language_code='zh-TW',  # Traditional Chinese
+                        alternative_language_codes=['en-US', 'ja-JP'],  # Fallback languages
+                    )
                 
-                if response.results:
-                    transcript = response.results[0].alternatives[0].transcript
-                    confidence = response.results[0].alternatives[0].confidence
-                    logger.info(f"SUCCESS with {config_attempt['description']}: {transcript} (confidence: {confidence:.2f})")
-                    return transcript
+                if result:
+                    logger.info(f"SUCCESS with {encoding} encoding: {len(result.transcript)} chars (confidence: {result.confidence:.2f})")
+                    return result.transcript
                 else:
-                    logger.info(f"{config_attempt['description']}: No results")
+                    logger.debug(f"{encoding} encoding: No results")
                     
             except Exception as config_error:
-                logger.warning(f"{config_attempt['description']} failed: {config_error}")
+                logger.warning(f"{encoding} encoding failed: {config_error}")
                 continue
         
         logger.warning("All encoding configurations failed")
@@ -348,17 +638,20 @@ def handle_audio_message(event):
     try:
         user_id = event.source.user_id
         message_id = event.message.id
+        metrics.inc('linebot_events_total', event_type='audio')
         
-        logger.info(f"Received audio message from {user_id}: {message_id}")
+        logger.info(f"Received audio message: {message_id}")
         
         # Download audio content from LINE
         if line_bot_api:
-            message_content = line_bot_api.get_message_content(message_id)
-            audio_data = b''
-            for chunk in message_content.iter_content():
-                audio_data += chunk
+            with external_call('line', 'download', event_type='audio'):
+                message_content = line_bot_api.get_message_content(message_id)
+                audio_data = b''
+                for chunk in message_content.iter_content():
+                    audio_data += chunk
             
-            logger.info(f"Downloaded audio file, size: {len(audio_data)} bytes")
+            logger.debug(f"Downloaded audio file, size: {len(audio_data)} bytes")
+            tracer.current_span().set_attribute('payload_size', len(audio_data))
             
             # Convert audio to text
             transcript = convert_audio_to_text(audio_data, 'audio/m4a')
@@ -377,10 +670,7 @@ def handle_audio_message(event):
                 reply_text = "🎵 收到語音訊息，但轉文字失敗，請重新錄製清楚一點的語音"
             
             # Send reply
-            line_bot_api.reply_message(
-                event.reply_token,
-                TextSendMessage(text=reply_text)
-            )
+            send_reply(event, reply_text, 'audio')
             logger.info("Audio message processed and reply sent")
         else:
             logger.error("LINE Bot API not initialized for audio processing")
@@ -392,45 +682,23 @@ def handle_audio_message(event):
         
         if line_bot_api:
             try:
-                line_bot_api.reply_message(
-                    event.reply_token,
-                    TextSendMessage(text="處理語音訊息時發生錯誤，請稍後再試")
-                )
+                send_reply(event, "處理語音訊息時發生錯誤，請稍後再試", 'audio')
             except Exception as e2:
                 logger.error(f"Failed to send audio error reply: {e2}")
 
 def extract_text_from_image(image_content):
-    """Extract text from image using Google Cloud Vision API"""
+    """Extract text from image using the configured OCR backend"""
     try:
-        # Initialize Vision client with credentials
-        cred_info = get_google_credentials()
-        if not cred_info:
-            raise Exception("Failed to get Google credentials")
-            
-        credentials = Credentials.from_service_account_info(
-            cred_info,
-            scopes=['https://www.googleapis.com/auth/cloud-platform']
-        )
-        
-        vision_client = vision.ImageAnnotatorClient(credentials=credentials)
-        
-        logger.info(f"Processing image: {len(image_content)} bytes")
+        backend = get_ocr_backend()
         
-        # Create image object
-        image = vision.Image(content=image_content)
+        logger.debug(f"Processing image: {len(image_content)} bytes")
         
         # Perform text detection
-        response = vision_client.text_detection(image=image)
-        texts = response.text_annotations
+        with external_call('vision', 'recognize', event_type='image'):
+            detected_text = backend.detect_text(image_content)
         
-        if response.error.message:
-            raise Exception(f"Vision API error: {response.error.message}")
-        
-        if texts:
-            # First annotation contains all detected text
-            detected_text = texts[0].description
+        if detected_text:
             logger.info(f"OCR result: {len(detected_text)} characters detected")
-            logger.info(f"Text preview: {detected_text[:100]}...")
             return detected_text.strip()
         else:
             logger.info("No text detected in image")
@@ -444,17 +712,20 @@ def handle_image_message(event):
     try:
         user_id = event.source.user_id
         message_id = event.message.id
+        metrics.inc('linebot_events_total', event_type='image')
         
-        logger.info(f"Received image message from {user_id}: {message_id}")
+        logger.info(f"Received image message: {message_id}")
         
         # Download image content from LINE
         if line_bot_api:
-            message_content = line_bot_api.get_message_content(message_id)
-            image_data = b''
-            for chunk in message_content.iter_content():
-                image_data += chunk
+            with external_call('line', 'download', event_type='image'):
+                message_content = line_bot_api.get_message_content(message_id)
+                image_data = b''
+                for chunk in message_content.iter_content():
+                    image_data += chunk
             
-            logger.info(f"Downloaded image file, size: {len(image_data)} bytes")
+            logger.debug(f"Downloaded image file, size: {len(image_data)} bytes")
+            tracer.current_span().set_attribute('payload_size', len(image_data))
             
             # Extract text from image
             extracted_text = extract_text_from_image(image_data)
@@ -473,10 +744,7 @@ def handle_image_message(event):
                 reply_text = "🖼️ 收到圖片，但未能辨識出文字內容"
             
             # Send reply
-            line_bot_api.reply_message(
-                event.reply_token,
-                TextSendMessage(text=reply_text)
-            )
+            send_reply(event, reply_text, 'image')
             logger.info("Image message processed and reply sent")
         else:
             logger.error("LINE Bot API not initialized for image processing")
@@ -488,16 +756,42 @@ def handle_image_message(event):
         
         if line_bot_api:
             try:
-                line_bot_api.reply_message(
-                    event.reply_token,
-                    TextSendMessage(text="處理圖片訊息時發生錯誤，請稍後再試")
-                )
+                send_reply(event, "處理圖片訊息時發生錯誤，請稍後再試", 'image')
             except Exception as e2:
                 logger.error(f"Failed to send image error reply: {e2}")
 
-# Initialize services when module is loaded
-init_line_bot()
-init_google_sheets()
+def preload_modules():
+    """Import the lazily loaded client libraries now.
+
+    Used by gunicorn's preload mode so the master pays the import cost
+    once and forked workers share those pages copy-on-write.
+    """
+    for name in LAZY_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.warning(f"Could not preload {name}: {e}")
+
+def init_services():
+    """Start services without blocking; progress is reported by /ready"""
+    # No network I/O: ready before the first request, so signatures can be checked
+    startup.add('line', init_line_bot, inline=True)
+    startup.add('sheets', init_google_sheets)
+    startup.start()
+    
+    health_monitor.register('line', probe_line)
+    health_monitor.register('sheets', probe_sheets)
+    health_monitor.register('speech', probe_backend(lambda: speech_backend))
+    health_monitor.register('vision', probe_backend(lambda: ocr_backend))
+    health_monitor.start()
+
+# Initialize services when module is loaded. Under gunicorn preload the
+# master imports this module and each worker initializes in post_fork
+# (gunicorn.conf.py), so no connection is shared across processes.
+if os.environ.get('GUNICORN_PRELOAD') == '1':
+    preload_modules()
+else:
+    init_services()
 
 if __name__ == '__main__':
     # Debug environment variables
@@ -0,0 +1,73 @@
+import pytest
+from types import SimpleNamespace
+from app.models.message_model import MessageModel
+from app.services.fake_sheets import FakeSheetsClient
+from app.services.backup_service import StreamingExporter, detect_format, read_records, write_records
+
+
+def make_worksheet(count):
+    worksheet = FakeSheetsClient().open_by_key('test-sheet').sheet1
+    worksheet.seed_rows([MessageModel.get_sheets_headers()])
+    for i in range(count):
+        add_note(worksheet, i)
+    return worksheet
+
+
+def add_note(worksheet, i):
+    worksheet.insert_row([f'2024-01-01 00:00:{i % 60:02d}', 'text', f'note {i}', 'u1', '', 'processed'], 2)
+
+
+class TestBackupService:
+
+    def test_detect_format(self):
+        assert detect_format('backup.jsonl.gz') == ('jsonl', 'gzip')
+        assert detect_format('backup.csv') == ('csv', None)
+        with pytest.raises(ValueError):
+            detect_format('backup.xml')
+
+    @pytest.mark.parametrize('name', ['out.jsonl', 'out.jsonl.gz', 'out.csv.gz'])
+    def test_round_trip(self, tmp_path, name):
+        records = [{'timestamp': '2024-01-01 00:00:00', 'message_type': 'text', 'content': '想法, "引號"\n換行',
+                    'user_id': 'u1', 'tags': '工作', 'status': 'processed'}]
+        path = str(tmp_path / name)
+
+        assert write_records(iter(records), path) == 1
+        assert list(read_records(path)) == records
+
+    def test_incremental_export_only_writes_new_rows(self, tmp_path):
+        worksheet = make_worksheet(7)
+        exporter = StreamingExporter(SimpleNamespace(worksheet=worksheet, partitions=None), page_size=3)
+        checkpoint = str(tmp_path / 'checkpoint.json')
+
+        assert exporter.export(str(tmp_path / 'full.jsonl'), checkpoint) == 7
+
+        add_note(worksheet, 7)
+        add_note(worksheet, 8)
+        assert exporter.export(str(tmp_path / 'inc.jsonl'), checkpoint, incremental=True) == 2
+        assert [r['content'] for r in read_records(str(tmp_path / 'inc.jsonl'))] == ['note 8', 'note 7']
+        assert exporter.export(str(tmp_path / 'inc2.jsonl'), checkpoint, incremental=True) == 0
+
+    def test_rows_inserted_during_export_are_neither_duplicated_nor_lost(self, tmp_path):
+        worksheet = make_worksheet(7)
+        exporter = StreamingExporter(SimpleNamespace(worksheet=worksheet, partitions=None), page_size=3, overlap=2)
+        checkpoint = str(tmp_path / 'checkpoint.json')
+        get = worksheet.get
+        pending = [7, 8]
+
+        def get_then_insert(range_name, **kwargs):
+            # Another writer adds notes at row 2 right after the first page is read
+            values = get(range_name, **kwargs)
+            while pending:
+                add_note(worksheet, pending.pop(0))
+            return values
+
+        worksheet.get = get_then_insert
+
+        assert exporter.export(str(tmp_path / 'full.jsonl'), checkpoint) == 7
+        assert [r['content'] for r in read_records(str(tmp_path / 'full.jsonl'))] == [f'note {i}' for i in range(6, -1, -1)]
+
+        pending.append(9)
+        assert exporter.export(str(tmp_path / 'inc.jsonl'), checkpoint, incremental=True) == 2
+        assert [r['content'] for r in read_records(str(tmp_path / 'inc.jsonl'))] == ['note 8', 'note 7']
+        assert exporter.export(str(tmp_path / 'inc2.jsonl'), checkpoint, incremental=True) == 1
+        assert [r['content'] for r in read_records(str(tmp_path / 'inc2.jsonl'))] == ['note 9']
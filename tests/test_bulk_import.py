@@ -0,0 +1,60 @@
+import json
+from types import SimpleNamespace
+from app.models.message_model import MessageModel
+from app.services.fake_sheets import FakeSheetsClient
+from import_tools import BulkLoader, build_rows
+
+
+def make_worksheet(rows=None):
+    worksheet = FakeSheetsClient().open_by_key('test-sheet').sheet1
+    worksheet.seed_rows([MessageModel.get_sheets_headers()] + (rows or []))
+    return worksheet
+
+
+def make_service(worksheet, calls):
+    def append_rows(rows):
+        calls.append(len(rows))
+        worksheet.append_rows(rows)
+        return len(rows)
+    return SimpleNamespace(worksheet=worksheet, partitions=None, append_rows=append_rows)
+
+
+def write_jsonl(path, records):
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+class TestBulkImport:
+
+    def test_build_rows_extracts_tags_and_skips_invalid(self):
+        rows = build_rows([
+            {'user_id': 'u1', 'content': '想法 #工作', 'timestamp': '2023-05-01 10:00:00'},
+            {'user_id': '', 'content': 'no user'},
+        ])
+
+        assert len(rows) == 1
+        assert rows[0][1] == ['2023-05-01 10:00:00', 'text', '想法 #工作', 'u1', '工作', 'processed']
+
+    def test_dedupes_against_sheet_and_input_and_resumes(self, tmp_path):
+        existing = ['2023-01-01 00:00:00', 'text', 'already there', 'u1', '', 'processed']
+        worksheet = make_worksheet([existing])
+        calls = []
+        source = str(tmp_path / 'notes.jsonl')
+        write_jsonl(source, [
+            {'user_id': 'u1', 'content': 'already there'},
+            {'user_id': 'u1', 'content': 'new note', 'timestamp': '2023-02-01 00:00:00'},
+            {'user_id': 'u1', 'content': 'new note', 'timestamp': '2023-02-02 00:00:00'},
+            {'user_id': 'u2', 'content': 'new note', 'timestamp': '2023-02-03 00:00:00'},
+        ])
+
+        loader = BulkLoader(make_service(worksheet, calls), chunk_size=2, requests_per_minute=6000, workers=1)
+        state = loader.run(source)
+
+        assert state == {'records_done': 4, 'rows_written': 2, 'duplicates': 2}
+        assert calls == [1, 1]
+        assert worksheet.col_values(4)[1:] == ['u1', 'u1', 'u2']
+
+        resumed = BulkLoader(make_service(worksheet, calls), chunk_size=2, requests_per_minute=6000, workers=1)
+        assert resumed.run(source, resume=True)['rows_written'] == 2
+        assert calls == [1, 1]
@@ -0,0 +1,117 @@
+import logging
+import threading
+
+from app.services.line_service import LineService
+from app.services.line_webhook import Message, MessageEvent, Source
+from app.utils.cache import UserResponseCache
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestUserResponseCache:
+
+    def test_serves_repeats_from_cache(self):
+        cache = UserResponseCache()
+        renders = []
+
+        for _ in range(3):
+            assert cache.get_or_render('U1', 'stats', lambda: renders.append(1) or 'reply') == 'reply'
+
+        assert len(renders) == 1
+
+    def test_write_invalidates_only_that_user(self):
+        cache = UserResponseCache()
+        cache.get_or_render('U1', 'stats', lambda: 'old')
+        cache.get_or_render('U2', 'stats', lambda: 'other')
+
+        cache.invalidate('U1')
+
+        assert cache.get_or_render('U1', 'stats', lambda: 'new') == 'new'
+        assert cache.get_or_render('U2', 'stats', lambda: 'recomputed') == 'other'
+
+    def test_entries_expire(self):
+        clock = FakeClock()
+        cache = UserResponseCache(ttl=60, clock=clock)
+        cache.get_or_render('U1', 'tags', lambda: 'old')
+
+        clock.now = 61
+
+        assert cache.get_or_render('U1', 'tags', lambda: 'new') == 'new'
+
+    def test_least_recently_used_user_is_evicted(self):
+        cache = UserResponseCache(max_users=2)
+        for user in ('U1', 'U2', 'U3'):
+            cache.get_or_render(user, 'stats', lambda: user)
+
+        assert set(cache.entries()) == {'U2', 'U3'}
+
+    def test_render_overtaken_by_a_write_is_not_stored(self):
+        cache = UserResponseCache()
+        rendering = threading.Event()
+        written = threading.Event()
+
+        def slow_render():
+            rendering.set()
+            written.wait(2)
+            return 'before the write'
+
+        thread = threading.Thread(target=cache.get_or_render, args=('U1', 'stats', slow_render))
+        thread.start()
+        rendering.wait(2)
+        cache.invalidate('U1')
+        written.set()
+        thread.join()
+
+        assert cache.get_or_render('U1', 'stats', lambda: 'after the write') == 'after the write'
+
+
+class CountingStore:
+
+    def __init__(self):
+        self.calls = 0
+        self.notes = 0
+
+    def get_user_statistics(self, user_id):
+        self.calls += 1
+        return {'total_messages': self.notes, 'tags_count': 0, 'message_types': {'text': self.notes},
+                'first_message': None}
+
+    def add_message(self, message):
+        self.notes += 1
+        return True
+
+
+class RecordingLineApi:
+
+    def __init__(self):
+        self.replies = []
+
+    def reply_message(self, token, message):
+        self.replies.append(message.text)
+
+
+def test_command_replies_are_cached_until_the_user_writes():
+    service = LineService.__new__(LineService)
+    service.logger = logging.getLogger(__name__)
+    service.sheets_service = CountingStore()
+    service.line_bot_api = RecordingLineApi()
+    service.response_cache = UserResponseCache()
+
+    def send(text):
+        service._handle_text_message(MessageEvent('token', Source('user', 'U1'), Message('text', '1', text)))
+
+    send('/stats')
+    send('/統計')
+    assert service.sheets_service.calls == 1
+
+    send('新的靈感 #想法')
+    send('/stats')
+    assert service.sheets_service.calls == 2
+    assert '總記錄數: 1' in service.line_bot_api.replies[-1]
@@ -0,0 +1,233 @@
+import threading
+import time
+
+import pytest
+
+from app.services.line_webhook import Message, MessageEvent, Source
+from app.utils.dispatcher import EventDispatcher, batch
+from app.utils.metrics import metrics
+from app.utils.tracing import Tracer
+from tests.test_tracing import ListExporter
+
+
+class TestEventDispatcher:
+
+    def test_keeps_order_within_a_user(self):
+        dispatcher = EventDispatcher(max_workers=4)
+        seen = []
+
+        def handle(event):
+            # Later events are faster, so any reordering would show
+            time.sleep(0.02 - event * 0.004)
+            seen.append(event)
+
+        with batch(10):
+            for event in range(5):
+                dispatcher.submit('U1', handle, event)
+
+        assert seen == [0, 1, 2, 3, 4]
+
+    def test_order_is_kept_across_deliveries(self):
+        dispatcher = EventDispatcher(max_workers=4)
+        seen = []
+
+        def handle(event):
+            time.sleep(0.01)
+            seen.append(event)
+
+        first = dispatcher.submit('U1', handle, 'first delivery')
+        with batch(10):
+            dispatcher.submit('U1', handle, 'second delivery')
+
+        assert first.done()
+        assert seen == ['first delivery', 'second delivery']
+
+    def test_users_run_in_parallel(self):
+        dispatcher = EventDispatcher(max_workers=10)
+        barrier = threading.Barrier(10, timeout=2)
+
+        started = time.perf_counter()
+        with batch(10) as futures:
+            for user in range(10):
+                dispatcher.submit(f"U{user}", lambda event: barrier.wait(), None)
+
+        # Ten handlers meeting at a barrier only finish if they run at once
+        assert all(future.exception() is None for future in futures)
+        assert time.perf_counter() - started < 2
+
+    def test_times_out_without_losing_the_event(self):
+        dispatcher = EventDispatcher(max_workers=2)
+        release = threading.Event()
+        finished = []
+        before = metrics._counters.get(
+            ('linebot_event_timeouts_total', (('dispatcher', 'events'),)), 0
+        )
+
+        with batch(0.05) as futures:
+            dispatcher.submit('U1', lambda event: release.wait(2) and finished.append(event), 'slow')
+
+        assert not futures[0].done()
+        assert metrics._counters[('linebot_event_timeouts_total', (('dispatcher', 'events'),))] == before + 1
+        release.set()
+        futures[0].result(timeout=2)
+        assert finished == ['slow']
+
+    def test_handler_errors_do_not_break_the_partition(self):
+        dispatcher = EventDispatcher(max_workers=1)
+        seen = []
+
+        def handle(event):
+            if event == 'bad':
+                raise ValueError(event)
+            seen.append(event)
+
+        with batch(10) as futures:
+            for event in ('bad', 'good'):
+                dispatcher.submit('U1', handle, event)
+
+        assert isinstance(futures[0].exception(), ValueError)
+        assert seen == ['good']
+
+    def test_spans_attach_to_the_submitting_trace(self):
+        exporter = ListExporter()
+        tracer = Tracer(sample_rate=1.0, exporter=exporter)
+        dispatcher = EventDispatcher(max_workers=2)
+
+        def handle(event):
+            with tracer.span('event', user=event):
+                pass
+
+        with tracer.trace('webhook'), batch(10):
+            dispatcher.submit('U1', handle, 'U1')
+            dispatcher.submit('U2', handle, 'U2')
+
+        names = sorted(span['name'] for span in exporter.traces[0]['spans'])
+        assert names == ['event', 'event', 'webhook']
+
+    def test_waiting_excludes_running_events(self):
+        dispatcher = EventDispatcher(max_workers=1)
+        release = threading.Event()
+        started = threading.Event()
+
+        def handle(event):
+            started.set()
+            release.wait(2)
+
+        with batch(10):
+            dispatcher.submit('U1', handle, 'running')
+            dispatcher.submit('U2', handle, 'queued')
+            assert started.wait(2)
+            assert dispatcher.waiting == 1
+            release.set()
+
+        assert dispatcher.waiting == 0
+
+    def test_order_is_kept_across_kinds(self):
+        dispatcher = EventDispatcher(limits={'text': 2, 'media': 1})
+        seen = []
+
+        def handle(event):
+            time.sleep(0.05 if event == 'image' else 0)
+            seen.append(event)
+
+        with batch(10):
+            dispatcher.submit('U1', handle, 'image', kind='media')
+            dispatcher.submit('U1', handle, 'text', kind='text')
+
+        assert seen == ['image', 'text']
+
+    def test_kind_at_its_limit_does_not_hold_threads(self):
+        dispatcher = EventDispatcher(limits={'text': 1, 'media': 1})
+        release = threading.Event()
+        seen = []
+
+        def slow(event):
+            release.wait(2)
+            seen.append(event)
+
+        with batch(10):
+            dispatcher.submit('U1', slow, 'U1 image', kind='media')
+            # Parked behind U1's image for the single media slot
+            dispatcher.submit('U2', slow, 'U2 image', kind='media')
+            text = dispatcher.submit('U3', seen.append, 'U3 text', kind='text')
+            text.result(timeout=1)
+            assert seen == ['U3 text']
+            assert dispatcher.waiting_for('media') == 1
+            release.set()
+
+        assert seen == ['U3 text', 'U1 image', 'U2 image']
+
+
+class RecordingLineApi:
+
+    def __init__(self):
+        self.replies = []
+        self.pushes = []
+
+    def reply_message(self, token, message):
+        self.replies.append(message.text)
+
+    def push_message(self, to, message):
+        self.pushes.append((to, message.text))
+
+
+def media_event(user_id='U1'):
+    return MessageEvent('token', Source('user', user_id), Message('image', '1'))
+
+
+class TestAdmission:
+
+    @pytest.fixture
+    def server(self, monkeypatch):
+        import server
+        monkeypatch.setattr(server, 'line_bot_api', RecordingLineApi())
+        monkeypatch.setattr(server, 'MEDIA_QUEUE_LIMIT', 0)
+        return server
+
+    def test_overflow_is_acknowledged_and_answered_by_push(self, server, monkeypatch):
+        monkeypatch.setattr(server, 'MEDIA_OVERFLOW', 'ack')
+        done = threading.Event()
+
+        def handle(event):
+            server.send_reply(event, 'result', 'image')
+            done.set()
+
+        with batch(10) as futures:
+            server.dispatched(handle)(media_event())
+
+        assert futures == []
+        assert done.wait(2)
+        assert server.line_bot_api.replies == ["⏳ 排隊中，處理完成後會通知你"]
+        assert server.line_bot_api.pushes == [('U1', 'result')]
+
+    def test_overflow_is_rejected(self, server, monkeypatch):
+        monkeypatch.setattr(server, 'MEDIA_OVERFLOW', 'reject')
+        before = metrics._counters.get(
+            ('linebot_admission_overflow_total', (('action', 'reject'), ('event_class', 'media'))), 0
+        )
+        handled = []
+
+        with batch(10):
+            server.dispatched(handled.append)(media_event())
+
+        assert handled == []
+        assert server.line_bot_api.replies == ["⚠️ 目前處理的語音 / 圖片較多，請稍後再傳一次"]
+        assert metrics._counters[
+            ('linebot_admission_overflow_total', (('action', 'reject'), ('event_class', 'media')))
+        ] == before + 1
+
+    def test_image_then_text_from_one_user_stay_in_order(self, server, monkeypatch):
+        monkeypatch.setattr(server, 'MEDIA_QUEUE_LIMIT', 10)
+        seen = []
+
+        def handle(event):
+            if event.message.type == 'image':
+                time.sleep(0.05)
+            seen.append(event.message.type)
+
+        submit = server.dispatched(handle)
+        with batch(10):
+            submit(media_event())
+            submit(MessageEvent('token', Source('user', 'U1'), Message('text', '2', 'note')))
+
+        assert seen == ['image', 'text']
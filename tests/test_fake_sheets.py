@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta
+
+import gspread
+import pytest
+
+from app.models.message_model import MessageModel
+from app.services.fake_sheets import FakeSheetsClient, FakeWorksheet
+from app.services.sheets_service import SheetsService
+from config.settings import Config
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class TestFakeSheets:
+
+    def test_insert_cost_grows_with_rows_below(self):
+        clock = FakeClock()
+        client = FakeSheetsClient(latency=0.1, insert_cost_per_row=0.01, sleep=clock.sleep, clock=clock)
+        worksheet = client.open_by_key('sheet').sheet1
+        worksheet.seed_rows([['h'], ['a'], ['b'], ['c']])
+
+        worksheet.insert_row(['new'], 2)
+        worksheet.append_row(['last'])
+
+        assert clock.slept[1:] == pytest.approx([0.1 + 3 * 0.01, 0.1 + 1 * 0.01])
+        assert worksheet.col_values(1) == ['h', 'new', 'a', 'b', 'c', 'last']
+        assert client.calls['insert_rows'] == 1
+
+    def test_write_quota_raises_429_until_window_passes(self):
+        clock = FakeClock()
+        client = FakeSheetsClient(write_quota=2, sleep=clock.sleep, clock=clock)
+        worksheet = client.open_by_key('sheet').sheet1
+
+        worksheet.append_row(['a'])
+        worksheet.append_row(['b'])
+        with pytest.raises(gspread.exceptions.APIError) as excinfo:
+            worksheet.append_row(['c'])
+        assert excinfo.value.code == 429
+        assert '429' in str(excinfo.value)
+
+        clock.now += 60
+        worksheet.append_row(['c'])
+        assert worksheet.col_values(1) == ['a', 'b', 'c']
+
+    def test_duplicate_worksheet_and_missing_worksheet_errors(self):
+        spreadsheet = FakeSheetsClient().open_by_key('sheet')
+        spreadsheet.add_worksheet('Notes', rows=10, cols=6)
+
+        with pytest.raises(gspread.exceptions.APIError):
+            spreadsheet.add_worksheet('Notes', rows=10, cols=6)
+        with pytest.raises(gspread.WorksheetNotFound):
+            spreadsheet.worksheet('Missing')
+
+    def test_range_reads_match_gspread_shape(self):
+        worksheet = FakeSheetsClient().open_by_key('sheet').sheet1
+        worksheet.seed_rows([['a', 'b', 'c'], ['1', '2', '3'], ['4', '5']])
+
+        assert worksheet.get('B2:C10') == [['2', '3'], ['5']]
+        assert worksheet.get_all_records() == [{'a': '1', 'b': '2', 'c': '3'}, {'a': '4', 'b': '5', 'c': ''}]
+
+    def test_sheets_service_runs_offline_on_fake_backend(self, monkeypatch):
+        monkeypatch.setattr(Config, 'SHEETS_BACKEND', 'fake')
+        monkeypatch.setattr(Config, 'GOOGLE_SHEET_ID', 'offline')
+        for name in ('FAKE_SHEETS_LATENCY_MS', 'FAKE_SHEETS_JITTER_MS'):
+            monkeypatch.setenv(name, '0')
+
+        service = SheetsService()
+        assert service.add_message(MessageModel('u1', 'text', '離線測試 #fake'))
+        assert service.add_message(MessageModel('u2', 'text', '別人的筆記'))
+
+        results = service.search_messages('fake', user_id='u1')
+        assert [r['content'] for r in results] == ['離線測試 #fake']
+        assert service.client.calls['insert_rows'] >= 3  # headers + two notes
+
+    def test_sheets_search_pages_newest_first(self, monkeypatch):
+        monkeypatch.setattr(Config, 'SHEETS_BACKEND', 'fake')
+        monkeypatch.setattr(Config, 'GOOGLE_SHEET_ID', 'offline')
+        for name in ('FAKE_SHEETS_LATENCY_MS', 'FAKE_SHEETS_JITTER_MS'):
+            monkeypatch.setenv(name, '0')
+        service = SheetsService()
+        now = datetime.now().replace(microsecond=0)
+        # Appended out of order, as bulk imports do
+        service.append_rows([MessageModel('u1', 'text', f"筆記 {i} #fake", now - timedelta(minutes=i)).to_sheets_row()
+                             for i in (3, 0, 4, 1, 2)])
+
+        first, more = service.search_page('fake', 'u1', page=1, page_size=2)
+        last, no_more = service.search_page('fake', 'u1', page=3, page_size=2)
+
+        assert [r['content'] for r in first] == ['筆記 0 #fake', '筆記 1 #fake'] and more
+        assert [r['content'] for r in last] == ['筆記 4 #fake'] and not no_more
+
+    def test_partitioned_search_stops_at_the_partitions_it_needs(self, monkeypatch):
+        monkeypatch.setattr(Config, 'SHEETS_BACKEND', 'fake')
+        monkeypatch.setattr(Config, 'GOOGLE_SHEET_ID', 'offline')
+        monkeypatch.setattr(Config, 'SHEETS_PARTITION_MODE', 'monthly')
+        monkeypatch.setattr(Config, 'SHEETS_QUERY_WORKERS', 2)
+        for name in ('FAKE_SHEETS_LATENCY_MS', 'FAKE_SHEETS_JITTER_MS'):
+            monkeypatch.setenv(name, '0')
+        service = SheetsService()
+        for month in (1, 2, 3, 4, 5):
+            for day in (1, 2):
+                assert service.add_message(MessageModel('u1', 'text', f"筆記 {month}/{day} #fake", datetime(2024, month, day)))
+
+        read = []
+        get_all_records = FakeWorksheet.get_all_records
+        monkeypatch.setattr(FakeWorksheet, 'get_all_records',
+                            lambda worksheet, **kwargs: read.append(worksheet.title) or get_all_records(worksheet, **kwargs))
+
+        first, more = service.search_page('fake', 'u1', page=1, page_size=1)
+        assert [r['content'] for r in first] == ['筆記 5/2 #fake'] and more
+        # One parallel batch of the two newest partitions (the current month's is empty) fills the page
+        newest = [worksheet.title for worksheet in service.partitions.partitions_between()[:2]]
+        assert 'Inspiration_Notes_2024_05' in newest
+        assert sorted(title for title in read if title.startswith('Inspiration_Notes_')) == sorted(newest)
+
+        last, no_more = service.search_page('fake', 'u1', page=10, page_size=1)
+        assert [r['content'] for r in last] == ['筆記 1/1 #fake'] and not no_more
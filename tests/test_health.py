@@ -0,0 +1,119 @@
+import threading
+
+import pytest
+
+from app.utils.health import ERROR, OK, SKIPPED, STALE, HealthMonitor
+
+
+def raising(error):
+    def check():
+        raise error
+    return check
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestHealthMonitor:
+
+    def test_snapshot_reports_latency_and_last_error(self):
+        clock = FakeClock()
+        monitor = HealthMonitor(clock=clock)
+        failing = monitor.register('sheets', raising(ConnectionError("quota")))
+        working = monitor.register('line', lambda: None)
+
+        monitor.run_probe(failing)
+        monitor.run_probe(working)
+        snapshot = monitor.snapshot()
+
+        assert snapshot['status'] == 'degraded'
+        assert snapshot['dependencies']['sheets']['status'] == ERROR
+        assert snapshot['dependencies']['sheets']['last_error'] == 'ConnectionError: quota'
+        assert snapshot['dependencies']['line']['status'] == OK
+        assert snapshot['dependencies']['line']['latency_ms'] is not None
+
+    def test_last_error_is_kept_after_recovery(self):
+        clock = FakeClock()
+        monitor = HealthMonitor(clock=clock)
+        outcomes = [ConnectionError("down"), None]
+
+        def check():
+            outcome = outcomes.pop(0)
+            if outcome:
+                raise outcome
+        probe = monitor.register('line', check)
+
+        monitor.run_probe(probe)
+        clock.now += 5
+        monitor.run_probe(probe)
+
+        line = monitor.snapshot()['dependencies']['line']
+        assert line['status'] == OK
+        assert line['last_error'] == 'ConnectionError: down'
+        assert line['last_success_seconds_ago'] == 0
+
+    def test_skipped_dependencies_do_not_degrade(self):
+        monitor = HealthMonitor()
+        monitor.run_probe(monitor.register('speech', lambda: False))
+
+        snapshot = monitor.snapshot()
+        assert snapshot['status'] == 'healthy'
+        assert snapshot['dependencies']['speech']['status'] == SKIPPED
+
+    def test_results_older_than_ttl_are_stale(self):
+        clock = FakeClock()
+        monitor = HealthMonitor(ttl=60, clock=clock)
+        monitor.run_probe(monitor.register('line', lambda: None))
+
+        clock.now += 61
+        snapshot = monitor.snapshot()
+        assert snapshot['dependencies']['line']['status'] == STALE
+        assert snapshot['status'] == 'degraded'
+
+    def test_probe_rate_is_independent_of_snapshot_rate(self):
+        calls = []
+        probed = threading.Event()
+
+        def check():
+            calls.append(1)
+            probed.set()
+        monitor = HealthMonitor(interval=60)
+        monitor.register('line', check)
+        monitor.start()
+        try:
+            assert probed.wait(5)
+            for _ in range(100):
+                monitor.snapshot()
+        finally:
+            monitor.stop()
+
+        assert len(calls) == 1
+
+
+@pytest.fixture
+def client():
+    import server
+    return server.app.test_client()
+
+
+class TestHealthEndpoints:
+
+    def test_deep_health_serves_cached_snapshot(self, client, monkeypatch):
+        import server
+        monitor = HealthMonitor()
+        monitor.run_probe(monitor.register('sheets', raising(RuntimeError("boom"))))
+        monkeypatch.setattr(server, 'health_monitor', monitor)
+
+        response = client.get('/health/deep')
+
+        assert response.status_code == 503
+        assert response.get_json()['dependencies']['sheets']['last_error'] == 'RuntimeError: boom'
+
+    def test_liveness_stays_cheap(self, client):
+        assert client.get('/health').status_code == 200
@@ -0,0 +1,46 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.services.line_http import SessionHttpClient
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    connections = set()
+
+    def do_POST(self):
+        Handler.connections.add(self.client_address)
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+        body = b'{}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    Handler.connections = set()
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+def test_reuses_connections_across_calls(server):
+    client = SessionHttpClient(timeout=5)
+
+    for _ in range(5):
+        response = client.post(f"{server}/v2/bot/message/reply", data='{}')
+        assert response.status_code == 200
+
+    # Keep-alive: all five requests came over one TCP connection
+    assert len(Handler.connections) == 1
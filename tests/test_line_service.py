@@ -0,0 +1,82 @@
+import logging
+from datetime import datetime
+
+from app.services.line_service import LineService
+from app.services.line_webhook import Message, MessageEvent, Source
+
+
+class PagedStore:
+
+    def __init__(self, matches):
+        self.matches = matches
+        self.requests = []
+
+    def search_page(self, query, user_id=None, page=1, page_size=5):
+        self.requests.append((query, page))
+        start = (page - 1) * page_size
+        return self.matches[start:start + page_size], len(self.matches) > start + page_size
+
+
+class RecordingLineApi:
+
+    def __init__(self):
+        self.replies = []
+
+    def reply_message(self, token, message):
+        self.replies.append(message)
+
+
+def make_service(matches):
+    service = LineService.__new__(LineService)
+    service.logger = logging.getLogger(__name__)
+    service.sheets_service = PagedStore(matches)
+    service.line_bot_api = RecordingLineApi()
+    return service
+
+
+def search(service, text):
+    service._handle_text_message(MessageEvent('token', Source('user', 'U1'), Message('text', '1', text)))
+    return service.line_bot_api.replies[-1]
+
+
+def test_search_args():
+    assert LineService._parse_search_args('靈感 2') == ('靈感', 2)
+    assert LineService._parse_search_args('python 技巧') == ('python 技巧', 1)
+    assert LineService._parse_search_args('2024') == ('2024', 1)
+
+
+def test_search_renders_a_carousel_page_with_more_button():
+    timestamp = datetime(2024, 5, 1, 9, 30).strftime('%Y-%m-%d %H:%M:%S')
+    matches = [{'timestamp': timestamp, 'content': f"靈感 {i}", 'tags': '工作, 想法'} for i in range(7)]
+    service = make_service(matches)
+
+    first = search(service, '/search 靈感')
+    second = search(service, '/搜尋 靈感 2')
+
+    assert service.sheets_service.requests == [('靈感', 1), ('靈感', 2)]
+    bubbles = first.contents.contents
+    assert len(bubbles) == 5
+    assert [c.text for c in bubbles[0].body.contents] == ['#1 · 05/01 09:30', '靈感 0', '#工作 #想法']
+    assert first.quick_reply.items[0].action.text == '/search 靈感 2'
+    assert [b.body.contents[0].text[:2] for b in second.contents.contents] == ['#6', '#7']
+    assert second.quick_reply is None
+
+
+def test_search_past_the_last_page():
+    service = make_service([])
+
+    assert search(service, '/search 靈感 3').text == "🔍 '靈感' 沒有更多結果了"
+
+
+def test_long_query_stays_within_line_limits():
+    query = '靈' * 450
+    service = make_service([{'timestamp': '2024-05-01 09:30:00', 'content': query, 'tags': ''}] * 6)
+
+    reply = search(service, f'/search {query}')
+
+    assert len(reply.alt_text) <= 400
+    button = reply.quick_reply.items[0].action.text
+    assert len(button) <= 300
+    # The next page searches the same (shortened) text
+    search(service, button)
+    assert service.sheets_service.requests == [('靈' * 100, 1), ('靈' * 100, 2)]
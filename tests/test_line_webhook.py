@@ -0,0 +1,108 @@
+import base64
+import hashlib
+import hmac
+import io
+import json
+
+import pytest
+from linebot.exceptions import InvalidSignatureError
+from werkzeug.test import EnvironBuilder
+
+from app.services.line_webhook import WebhookParser
+
+SECRET = 'channel-secret'
+
+
+def sign(body: bytes) -> str:
+    return base64.b64encode(hmac.new(SECRET.encode(), body, hashlib.sha256).digest()).decode()
+
+
+def delivery(*events) -> bytes:
+    return json.dumps({'destination': 'Ubot', 'events': list(events)}, ensure_ascii=False).encode('utf-8')
+
+
+def message_event(message, user_id='U1'):
+    return {'type': 'message', 'replyToken': 'token', 'source': {'type': 'user', 'userId': user_id},
+            'message': message}
+
+
+class TestWebhookParser:
+
+    def test_verifies_raw_bytes(self):
+        parser = WebhookParser(SECRET)
+        body = delivery(message_event({'type': 'text', 'id': '1', 'text': '靈感 #想法'}))
+
+        assert parser.verify(body, sign(body))
+        assert not parser.verify(body + b' ', sign(body))
+        assert not parser.verify(body, '')
+
+    def test_parses_only_dispatched_message_events(self):
+        parser = WebhookParser(SECRET, ('text', 'image'))
+        body = delivery(
+            message_event({'type': 'text', 'id': '1', 'text': '筆記'}),
+            message_event({'type': 'sticker', 'id': '2', 'packageId': '1', 'stickerId': '1'}),
+            {'type': 'follow', 'replyToken': 'token', 'source': {'type': 'user', 'userId': 'U2'}},
+            message_event({'type': 'image', 'id': '3'}, user_id='U3'),
+        )
+
+        events = parser.parse(body)
+
+        assert [(e.message.type, e.message.id, e.source.user_id) for e in events] == [
+            ('text', '1', 'U1'), ('image', '3', 'U3')
+        ]
+        assert events[0].message.text == '筆記'
+        assert events[0].reply_token == 'token'
+        assert events[0].deferred_reply is False
+
+    def test_skips_message_events_without_a_message(self):
+        parser = WebhookParser(SECRET)
+        body = delivery({'type': 'message', 'replyToken': 'token', 'source': {'type': 'user', 'userId': 'U1'}},
+                        message_event({'type': 'text', 'id': '1', 'text': '筆記'}))
+
+        assert [e.message.id for e in parser.parse(body)] == ['1']
+
+    def test_rejects_bad_signature(self):
+        parser = WebhookParser(SECRET)
+        body = delivery()
+
+        assert parser.parse(body, sign(body)) == []
+        with pytest.raises(InvalidSignatureError):
+            parser.parse(body, 'forged')
+
+
+class TestWebhookEndpoint:
+
+    @pytest.fixture
+    def client(self, monkeypatch):
+        import server
+        monkeypatch.setattr(server, 'webhook_parser', WebhookParser(SECRET))
+        return server.app.test_client()
+
+    def test_rejects_oversized_body_before_reading(self, client, monkeypatch):
+        import server
+        monkeypatch.setitem(server.app.config, 'MAX_CONTENT_LENGTH', 16)
+        body = delivery()
+
+        response = client.post('/webhook', data=body, headers={'X-Line-Signature': sign(body)})
+
+        assert response.status_code == 413
+
+    def test_caps_chunked_body_without_content_length(self, client, monkeypatch):
+        import server
+        monkeypatch.setitem(server.app.config, 'MAX_CONTENT_LENGTH', 16)
+        body = delivery()
+
+        environ = EnvironBuilder('/webhook', method='POST', input_stream=io.BytesIO(body),
+                                 headers={'X-Line-Signature': sign(body)}).get_environ()
+        # A server that dechunks the body itself passes no length and marks the stream terminated
+        del environ['CONTENT_LENGTH']
+        environ['wsgi.input_terminated'] = True
+
+        response = client.open(environ)
+
+        assert response.status_code == 413
+
+    def test_rejects_bad_signature(self, client):
+        response = client.post('/webhook', data=delivery(), headers={'X-Line-Signature': 'forged'})
+
+        assert response.status_code == 400
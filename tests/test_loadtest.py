@@ -0,0 +1,34 @@
+import os
+import sys
+
+from linebot import WebhookParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from loadtest import EventFactory, build_body, parse_mix, sign, summarize
+
+
+class TestLoadTestHarness:
+
+    def test_synthetic_webhooks_pass_sdk_signature_and_parsing(self):
+        factory = EventFactory(users=3, seed=1)
+        body = build_body([factory.build(kind) for kind in ('text', 'command', 'audio', 'image')])
+
+        events = WebhookParser('secret').parse(body.decode('utf-8'), sign(body, 'secret'))
+
+        assert [event.message.type for event in events] == ['text', 'text', 'audio', 'image']
+        assert events[1].message.text.startswith('/')
+        assert all(event.source.user_id in factory.user_ids for event in events)
+
+    def test_summary_percentiles_and_errors(self):
+        results = [('text', 200, i / 1000) for i in range(1, 101)] + [('image', 500, 0.5)]
+
+        summary = summarize(results, elapsed=2.0)
+
+        assert summary['throughput_rps'] == 50.5
+        assert summary['by_kind']['text']['p50_ms'] == 51.0
+        assert summary['by_kind']['image']['error_rate'] == 1.0
+        assert summary['overall']['errors'] == 1
+
+    def test_parse_mix(self):
+        assert parse_mix('text=70, audio=30') == {'text': 70.0, 'audio': 30.0}
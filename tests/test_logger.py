@@ -0,0 +1,65 @@
+import io
+import json
+import logging
+import queue
+
+from app.utils.logger import BoundedQueueHandler, RateLimitFilter, setup_logger, shutdown_logger
+from app.utils.tracing import Tracer
+
+
+class NullExporter:
+
+    def export(self, trace):
+        pass
+
+
+class TestLoggingPipeline:
+
+    def test_json_output_through_queue(self):
+        stream = io.StringIO()
+        setup_logger(log_format='json', stream=stream)
+        logging.getLogger('tests.logger').warning("Sheets write failed: %s", 'quota')
+        shutdown_logger()
+
+        record = json.loads(stream.getvalue().strip().splitlines()[-1])
+        assert record['level'] == 'WARNING'
+        assert record['logger'] == 'tests.logger'
+        assert record['msg'] == 'Sheets write failed: quota'
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = BoundedQueueHandler(queue.Queue(maxsize=1))
+        logger = logging.getLogger('tests.logger.bounded')
+        logger.propagate = False
+        logger.addHandler(handler)
+        try:
+            logger.warning("first")
+            logger.warning("second")
+        finally:
+            logger.removeHandler(handler)
+            logger.propagate = True
+
+        assert handler.queue.qsize() == 1
+
+    def test_rate_limit_applies_per_call_site_below_warning(self):
+        limiter = RateLimitFilter(per_second=0.001, burst=2)
+
+        def record(level):
+            return logging.LogRecord('tests', level, __file__, 10, 'msg', None, None)
+
+        assert [limiter.filter(record(logging.INFO)) for _ in range(3)] == [True, True, False]
+        assert limiter.filter(record(logging.ERROR))
+
+    def test_trace_exporter_is_not_rate_limited(self):
+        limiter = RateLimitFilter(per_second=0.001, burst=2)
+        trace = logging.LogRecord('tracing', logging.INFO, __file__, 75, '{}', None, None)
+
+        assert all(limiter.filter(trace) for _ in range(100))
+
+    def test_records_carry_trace_id(self):
+        tracer = Tracer(sample_rate=1.0, exporter=NullExporter())
+        handler = BoundedQueueHandler(queue.Queue())
+
+        with tracer.trace('webhook') as span:
+            record = handler.prepare(logging.LogRecord('tests', logging.INFO, __file__, 1, 'msg', None, None))
+
+        assert record.trace_id == span.trace_id
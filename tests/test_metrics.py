@@ -0,0 +1,72 @@
+import json
+import os
+import threading
+
+from app.utils.metrics import MetricsRegistry
+
+
+class TestMetricsRegistry:
+
+    def test_render_counters_and_histograms(self):
+        registry = MetricsRegistry(buckets=(0.1, 1.0))
+        registry.inc('linebot_events_total', event_type='text')
+        registry.inc('linebot_events_total', event_type='text')
+        registry.observe('linebot_stage_duration_seconds', 0.05, stage='reply')
+        registry.observe('linebot_stage_duration_seconds', 5.0, stage='reply')
+
+        output = registry.render()
+
+        assert '# TYPE linebot_events_total counter' in output
+        assert 'linebot_events_total{event_type="text"} 2' in output
+        assert 'linebot_stage_duration_seconds_bucket{stage="reply",le="0.1"} 1' in output
+        assert 'linebot_stage_duration_seconds_bucket{stage="reply",le="+Inf"} 2' in output
+        assert 'linebot_stage_duration_seconds_count{stage="reply"} 2' in output
+
+    def test_external_call_counts_quota_errors(self):
+        registry = MetricsRegistry()
+        try:
+            with registry.external_call('sheets', 'sheet_write'):
+                raise RuntimeError('APIError: [429]: Quota exceeded')
+        except RuntimeError:
+            pass
+
+        assert 'linebot_external_calls_total{api="sheets",outcome="quota"} 1' in registry.render()
+
+    def test_multiprocess_snapshots_are_summed(self, tmp_path):
+        worker = MetricsRegistry(multiproc_dir=str(tmp_path))
+        worker.inc('linebot_webhook_requests_total', status=200)
+        worker.flush()
+
+        # A second registry in the same directory stands in for another worker
+        other = (tmp_path / 'metrics_1.json')
+        other.write_text('{"counters": [["linebot_webhook_requests_total", [["status", "200"]], 3]],'
+                         ' "gauges": [["linebot_queue_depth", [["queue", "media"]], 7]], "histograms": []}')
+
+        output = worker.render()
+        assert 'linebot_webhook_requests_total{status="200"} 4' in output
+
+    def test_concurrent_flushes_leave_a_readable_snapshot(self, tmp_path):
+        worker = MetricsRegistry(multiproc_dir=str(tmp_path), flush_interval=0)
+        done = threading.Event()
+
+        def flush_repeatedly():
+            while not done.is_set():
+                worker.inc('linebot_webhook_requests_total', status=200)
+
+        threads = [threading.Thread(target=flush_repeatedly) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        snapshots = []
+        try:
+            for _ in range(200):
+                try:
+                    snapshots.append(json.loads((tmp_path / f'metrics_{os.getpid()}.json').read_text()))
+                except FileNotFoundError:
+                    pass
+        finally:
+            done.set()
+            for thread in threads:
+                thread.join()
+
+        assert snapshots and all('counters' in snapshot for snapshot in snapshots)
+        assert sorted(path.name for path in tmp_path.iterdir()) == [f'metrics_{os.getpid()}.json']
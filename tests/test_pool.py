@@ -0,0 +1,77 @@
+import threading
+import time
+
+import pytest
+
+from app.utils.pool import PoolTimeout, ResourcePool
+
+
+class TestResourcePool:
+
+    def test_creates_on_demand_up_to_max_size(self):
+        created = []
+        pool = ResourcePool(lambda: created.append(1) or len(created), max_size=2)
+
+        with pool.acquire() as first, pool.acquire() as second:
+            assert {first, second} == {1, 2}
+        with pool.acquire() as reused:
+            assert reused in (1, 2)
+
+        assert pool.size == 2
+
+    def test_objects_are_never_shared_between_threads(self):
+        pool = ResourcePool(object, max_size=3)
+        in_use = set()
+        clashes = []
+        lock = threading.Lock()
+
+        def work():
+            for _ in range(50):
+                with pool.acquire() as item:
+                    with lock:
+                        if id(item) in in_use:
+                            clashes.append(item)
+                        in_use.add(id(item))
+                    time.sleep(0.0005)
+                    with lock:
+                        in_use.discard(id(item))
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert clashes == []
+        assert pool.size <= 3
+
+    def test_waits_then_times_out_when_exhausted(self):
+        pool = ResourcePool(object, max_size=1, timeout=0.05)
+
+        with pool.acquire():
+            with pytest.raises(PoolTimeout):
+                with pool.acquire():
+                    pass
+
+    def test_failed_factory_frees_the_slot(self):
+        attempts = []
+
+        def factory():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise ConnectionError("Google unreachable")
+            return 'client'
+
+        pool = ResourcePool(factory, max_size=1)
+        with pytest.raises(ConnectionError):
+            with pool.acquire():
+                pass
+        with pool.acquire() as item:
+            assert item == 'client'
+
+    def test_seeded_object_is_used_first(self):
+        pool = ResourcePool(lambda: 'new', max_size=2)
+        pool.add('seeded')
+
+        with pool.acquire() as item:
+            assert item == 'seeded'
@@ -0,0 +1,59 @@
+import threading
+import time
+
+import pytest
+
+from app.utils.profiler import ProfilerBusyError, SamplingProfiler, SlowRequestProfiler
+
+
+def busy_worker(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+class TestSamplingProfiler:
+
+    def test_collapsed_stacks_include_other_threads(self):
+        stop = threading.Event()
+        worker = threading.Thread(target=busy_worker, args=(stop,))
+        worker.start()
+        try:
+            collapsed = SamplingProfiler(interval=0.001).profile(0.1)
+        finally:
+            stop.set()
+            worker.join()
+
+        lines = collapsed.strip().splitlines()
+        assert any('test_profiler.py:busy_worker' in line for line in lines)
+        stack, count = lines[0].rsplit(' ', 1)
+        assert int(count) > 0 and ';' in stack
+
+    def test_concurrent_profiles_are_rejected(self):
+        profiler = SamplingProfiler()
+        profiler._lock.acquire()
+        try:
+            with pytest.raises(ProfilerBusyError):
+                profiler.profile(0.01)
+        finally:
+            profiler._lock.release()
+
+
+class TestSlowRequestProfiler:
+
+    def test_only_slow_requests_are_saved(self, tmp_path):
+        profiler = SlowRequestProfiler(threshold_ms=20, output_dir=str(tmp_path))
+
+        with profiler.profile('fast'):
+            pass
+        with profiler.profile('slow'):
+            time.sleep(0.03)
+
+        saved = [path.name for path in tmp_path.iterdir()]
+        assert len(saved) == 1 and '-slow-' in saved[0]
+
+    def test_disabled_by_default(self, tmp_path):
+        profiler = SlowRequestProfiler(output_dir=str(tmp_path))
+        with profiler.profile('webhook'):
+            time.sleep(0.01)
+        assert not profiler.enabled
+        assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,120 @@
+import pytest
+
+from app.services.line_webhook import Message, MessageEvent, Source
+from app.utils.ratelimit import (ALLOWED, DROPPED, THROTTLED, MemoryWindowStore, RateLimiter,
+                                 SQLiteWindowStore, parse_limits)
+
+
+class FakeClock:
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_parse_limits():
+    assert parse_limits('text=30/60, image=6/10,audio=5') == {
+        'text': (30, 60), 'image': (6, 10), 'audio': (5, 60)
+    }
+    assert parse_limits('') == {}
+
+
+class TestRateLimiter:
+
+    def test_throttles_once_then_drops(self):
+        limiter = RateLimiter({'image': (3, 60)}, clock=FakeClock())
+
+        results = [limiter.check('image', 'U1') for _ in range(5)]
+
+        assert results == [ALLOWED, ALLOWED, ALLOWED, THROTTLED, DROPPED]
+        assert limiter.check('image', 'U2') == ALLOWED
+        assert limiter.check('text', 'U1') == ALLOWED
+
+    def test_window_slides(self):
+        clock = FakeClock(960.0)
+        limiter = RateLimiter({'image': (4, 60)}, clock=clock)
+        for _ in range(4):
+            limiter.check('image', 'U1')
+
+        # Half of the previous window still counts: 4 * 0.5 + 1
+        clock.now = 1050.0
+        assert limiter.check('image', 'U1') == ALLOWED
+        assert limiter.check('image', 'U1') == ALLOWED
+        assert limiter.check('image', 'U1') == THROTTLED
+
+        clock.now = 1200.0
+        assert limiter.check('image', 'U1') == ALLOWED
+
+    def test_memory_is_bounded(self):
+        store = MemoryWindowStore(max_keys=100)
+        limiter = RateLimiter({'text': (1, 60)}, store=store, clock=FakeClock())
+
+        for user in range(5000):
+            limiter.check('text', f"U{user}")
+
+        assert len(store) == 100
+        assert limiter.check('text', 'U4999') == THROTTLED
+
+    def test_sqlite_store_is_shared(self, tmp_path):
+        path = str(tmp_path / 'limits.db')
+        clock = FakeClock()
+        first = RateLimiter({'audio': (2, 60)}, store=SQLiteWindowStore(path), clock=clock)
+        second = RateLimiter({'audio': (2, 60)}, store=SQLiteWindowStore(path), clock=clock,
+                             prune_every=1)
+
+        assert first.check('audio', 'U1') == ALLOWED
+        assert second.check('audio', 'U1') == ALLOWED
+        assert first.check('audio', 'U1') == THROTTLED
+
+        clock.now = 2000.0
+        assert second.check('audio', 'U1') == ALLOWED
+
+
+class RecordingLineApi:
+
+    def __init__(self):
+        self.replies = []
+
+    def reply_message(self, token, message):
+        self.replies.append(message.text)
+
+
+def test_throttled_user_gets_canned_reply(monkeypatch):
+    import server
+    monkeypatch.setattr(server, 'line_bot_api', RecordingLineApi())
+    monkeypatch.setattr(server, 'rate_limiter', RateLimiter({'image': (1, 60)}))
+    handled = []
+    event = MessageEvent('token', Source('user', 'U1'), Message('image', '1'))
+
+    submit = server.dispatched(handled.append)
+    for _ in range(3):
+        submit(event)
+    server.dispatcher.submit('U1', lambda event: None, None, kind='media').result(timeout=2)
+
+    assert handled == [event]
+    assert server.line_bot_api.replies == ["🐢 訊息太頻繁了，請稍後再傳"]
+
+
+class FailingLineApi:
+
+    def reply_message(self, token, message):
+        raise ConnectionError("LINE API unavailable")
+
+
+def test_failed_notice_does_not_abort_later_events(monkeypatch):
+    import server
+    monkeypatch.setattr(server, 'line_bot_api', FailingLineApi())
+    monkeypatch.setattr(server, 'rate_limiter', RateLimiter({'image': (1, 60)}))
+    handled = []
+    first = MessageEvent('token', Source('user', 'U1'), Message('image', '1'))
+    other = MessageEvent('token', Source('user', 'U2'), Message('image', '2'))
+
+    submit = server.dispatched(handled.append)
+    for event in (first, first, other):
+        submit(event)
+    for user in ('U1', 'U2'):
+        server.dispatcher.submit(user, lambda event: None, None, kind='media').result(timeout=2)
+
+    assert len(handled) == 2 and first in handled and other in handled
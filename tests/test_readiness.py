@@ -0,0 +1,138 @@
+import threading
+
+import pytest
+
+from app.utils.readiness import DISABLED, FAILED, READY, RETRYING, PermanentError, ServiceInitializer, StartupQueue
+
+
+def flaky(failures):
+    calls = []
+
+    def init():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise ConnectionError("Google unreachable")
+        return True
+    return init, calls
+
+
+class TestServiceInitializer:
+
+    def test_retries_with_capped_exponential_backoff(self):
+        sleeps = []
+        initializer = ServiceInitializer(backoff=1.0, max_backoff=4.0, sleep=sleeps.append)
+        init, calls = flaky(failures=4)
+        initializer.add('sheets', init)
+
+        initializer.start()
+
+        assert initializer.wait(5)
+        assert len(calls) == 5
+        assert len(sleeps) == 4
+        # Jitter picks between half and the full delay: 1, 2, 4, 4
+        for wait, ceiling in zip(sleeps, [1, 2, 4, 4]):
+            assert ceiling / 2 <= wait <= ceiling
+        status = initializer.status()['dependencies']['sheets']
+        assert status['state'] == READY and status['attempts'] == 5 and status['last_error'] is None
+
+    def test_unconfigured_dependency_is_disabled_and_counts_as_ready(self):
+        initializer = ServiceInitializer()
+        initializer.add('line', lambda: False, inline=True)
+        initializer.start()
+
+        assert initializer.ready
+        assert initializer.dependencies['line'].state == DISABLED
+
+    def test_permanent_error_is_not_retried(self):
+        sleeps, calls = [], []
+
+        def init():
+            calls.append(1)
+            raise PermanentError("invalid_grant: Invalid JWT Signature")
+
+        initializer = ServiceInitializer(sleep=sleeps.append)
+        initializer.add('sheets', init)
+        initializer.start()
+
+        assert initializer.wait(5)
+        assert calls == [1] and sleeps == []
+        sheets = initializer.status()['dependencies']['sheets']
+        assert sheets['state'] == FAILED and 'invalid_grant' in sheets['last_error']
+
+    def test_not_ready_while_a_dependency_is_retrying(self):
+        release = threading.Event()
+        initializer = ServiceInitializer(backoff=0.01, sleep=lambda _: release.wait())
+        initializer.add('line', lambda: True, inline=True)
+        init, _ = flaky(failures=1)
+        initializer.add('sheets', init)
+
+        initializer.start()
+        assert not initializer.wait(0.1)
+        sheets = initializer.status()['dependencies']['sheets']
+        assert sheets['state'] == RETRYING
+        assert 'Google unreachable' in sheets['last_error']
+
+        release.set()
+        assert initializer.wait(5)
+
+
+class TestStartupQueue:
+
+    def test_holds_work_until_ready_and_keeps_order(self):
+        gate = threading.Event()
+        initializer = ServiceInitializer()
+        initializer.add('sheets', lambda: gate.wait(5))
+        processed = []
+        startup_queue = StartupQueue(initializer, processed.append, max_wait=5)
+
+        initializer.start()
+        for item in range(3):
+            assert startup_queue.submit(item)
+        assert processed == []
+
+        gate.set()
+        startup_queue.join()
+        assert processed == [0, 1, 2]
+
+    def test_processes_anyway_after_max_wait(self):
+        initializer = ServiceInitializer()
+        initializer.add('sheets', lambda: threading.Event().wait(5))
+        processed = []
+        startup_queue = StartupQueue(initializer, processed.append, max_wait=0.05)
+
+        initializer.start()
+        startup_queue.submit('event')
+        startup_queue.join()
+
+        assert processed == ['event']
+        assert not initializer.ready
+
+    def test_submit_fails_when_full(self):
+        initializer = ServiceInitializer()
+        initializer.add('sheets', lambda: threading.Event().wait(5))
+        initializer.start()
+        startup_queue = StartupQueue(initializer, lambda item: None, max_size=1, max_wait=5)
+
+        results = [startup_queue.submit(item) for item in range(3)]
+
+        # The worker takes the first item off the queue while it waits
+        assert results[-1] is False
+
+
+class TestSheetsInit:
+
+    @pytest.mark.parametrize('code, permanent', [(403, True), (404, True), (429, False), (503, False)])
+    def test_auth_and_config_errors_are_permanent(self, monkeypatch, code, permanent):
+        import server
+        from gspread.exceptions import APIError
+        from app.services.fake_sheets import FakeSheetsClient, api_error
+        monkeypatch.setattr(server, 'sheets_service', None)
+        monkeypatch.setenv('GOOGLE_SHEET_ID', 'test-sheet')
+        monkeypatch.setenv('SHEETS_BACKEND', 'fake')
+
+        def refuse(self, key):
+            raise api_error(code, 'refused', 'ERROR')
+        monkeypatch.setattr(FakeSheetsClient, 'open_by_key', refuse)
+
+        with pytest.raises(PermanentError if permanent else APIError):
+            server.init_google_sheets()
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from app.services.recognition import RecognitionError, StubOcrBackend, StubSpeechBackend, load_fixtures
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'recognition.json')
+
+
+@pytest.fixture
+def fixtures():
+    return load_fixtures(FIXTURES)
+
+
+class TestStubBackends:
+
+    def test_speech_is_deterministic_per_audio(self, fixtures):
+        backend = StubSpeechBackend(fixtures)
+
+        first = backend.recognize(b'audio-1', 'ENCODING_UNSPECIFIED')
+        assert first == backend.recognize(b'audio-1', 'ENCODING_UNSPECIFIED')
+        assert first.transcript in fixtures['speech']['transcripts']
+        assert first.confidence == 0.87
+
+    def test_per_encoding_outcomes(self, fixtures):
+        backend = StubSpeechBackend(fixtures)
+
+        assert backend.recognize(b'audio', 'MP3') is None
+        with pytest.raises(RecognitionError):
+            backend.recognize(b'audio', 'WEBM_OPUS')
+
+    def test_sha1_override_and_failure_rate(self):
+        # sha1(b'hello')
+        fixtures = {'vision': {'texts': [], 'by_sha1': {'aaf4c61ddcc5e8a2dabede0f3b482cd9aea9434d': 'hello OCR'}}}
+        assert StubOcrBackend(fixtures).detect_text(b'hello') == 'hello OCR'
+        assert StubOcrBackend(fixtures).detect_text(b'other') is None
+
+        with pytest.raises(RecognitionError):
+            StubOcrBackend(fixtures, failure_rate=1.0).detect_text(b'hello')
+
+
+class TestServerMediaPipeline:
+
+    def test_audio_falls_back_through_encodings(self, fixtures):
+        import server
+
+        backend = StubSpeechBackend(fixtures)
+        server.speech_backend = backend
+        try:
+            transcript = server.convert_audio_to_text(b'voice note')
+        finally:
+            server.speech_backend = None
+
+        assert transcript == backend.recognize(b'voice note', 'ENCODING_UNSPECIFIED').transcript
+        assert backend.behaviour.calls == 4  # MP3 empty, WEBM_OPUS error, auto-detect ok, plus the check
+
+    def test_image_without_text_returns_none(self):
+        import server
+
+        server.ocr_backend = StubOcrBackend({'vision': {'texts': ['']}})
+        try:
+            assert server.extract_text_from_image(b'photo') is None
+        finally:
+            server.ocr_backend = None
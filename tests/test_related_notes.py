@@ -0,0 +1,161 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.message_model import MessageModel
+from app.services.line_service import LineService
+from app.services.line_webhook import Message, MessageEvent, Source
+from app.services.related_notes import RelatedNotesIndex, UserNoteIndex, tokenize
+from app.services.sqlite_service import SQLiteService
+
+NOTES = [
+    ('咖啡店的新菜單想法', '餐飲'),
+    ('週末去爬山看日出', '生活'),
+    ('咖啡豆烘焙的溫度筆記', '餐飲'),
+    ('python asyncio event loop tips', '程式'),
+    ('手沖咖啡的溫度與研磨', ''),
+]
+
+
+def make_records(notes=NOTES):
+    start = datetime(2024, 5, 1, 9)
+    return [{'timestamp': (start + timedelta(hours=i)).strftime('%Y-%m-%d %H:%M:%S'), 'message_type': 'text',
+             'content': content, 'tags': tags} for i, (content, tags) in enumerate(notes)]
+
+
+def test_tokenize_uses_cjk_bigrams_keywords_and_tags():
+    assert tokenize('今天學到 Python 技巧', ['學習']) == ['今天', '天學', '學到', '技巧', 'python', '#學習']
+
+
+class TestUserNoteIndex:
+
+    def test_latest_note_is_the_default_query_and_not_its_own_match(self):
+        index = UserNoteIndex.from_records(make_records())
+
+        related = index.related(limit=5)
+
+        assert [note['content'] for note in related] == ['咖啡豆烘焙的溫度筆記', '咖啡店的新菜單想法']
+        assert all(0 < note['score'] <= 1 for note in related)
+
+    def test_text_query_ranks_by_cosine_similarity(self):
+        index = UserNoteIndex.from_records(make_records())
+
+        related = index.related('asyncio 的 event loop', limit=3)
+
+        assert related[0]['content'] == 'python asyncio event loop tips'
+        assert index.related('完全無關') == []
+
+    def test_incremental_adds_match_a_full_rebuild(self):
+        records = make_records()
+        index = UserNoteIndex.from_records(records[:2])
+        index.related('咖啡')
+        for record in records[2:]:
+            index.add(record)
+
+        rebuilt = UserNoteIndex.from_records(records)
+
+        assert index.related('咖啡 溫度') == rebuilt.related('咖啡 溫度')
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteService(str(tmp_path / 'notes.db'))
+    store.related_notes = RelatedNotesIndex(store.user_records, max_users=2)
+    return store
+
+
+def add(store, user_id, content, hours):
+    store.add_message(MessageModel(user_id=user_id, message_type='text', content=content,
+                                   timestamp=datetime(2024, 5, 1, 9) + timedelta(hours=hours)))
+
+
+class TestRelatedNotesIndex:
+
+    def test_built_from_storage_then_updated_on_write(self, store):
+        add(store, 'u1', '咖啡豆烘焙筆記 #餐飲', 0)
+        add(store, 'u2', '咖啡廳的開店計畫', 1)
+        assert store.find_related('u1', '咖啡') != []
+
+        add(store, 'u1', '手沖咖啡的水溫', 2)
+        related = store.find_related('u1')
+
+        assert [note['content'] for note in related] == ['咖啡豆烘焙筆記 #餐飲']
+
+    def test_matches_the_unindexed_fallback(self, store):
+        for i, (content, _) in enumerate(NOTES):
+            add(store, 'u1', content, i)
+
+        indexed = store.find_related('u1', '咖啡 溫度')
+        store.related_notes = None
+
+        assert store.find_related('u1', '咖啡 溫度') == indexed
+
+    def test_cold_build_does_not_block_writes_or_other_users(self):
+        records = {'u1': make_records(), 'u2': make_records()[:1]}
+        reading, release = threading.Event(), threading.Event()
+
+        def source(user_id):
+            if user_id == 'u1':
+                stored = list(records['u1'])
+                reading.set()
+                release.wait(5)
+                return stored
+            return records['u2']
+
+        index = RelatedNotesIndex(source)
+        builder = threading.Thread(target=lambda: index.related('u1'))
+        builder.start()
+        reading.wait(5)
+
+        # While u1's build is stuck on storage, other users and writes go through
+        done = threading.Event()
+
+        def other_user():
+            index.related('u2', '咖啡')
+            index.record_rows([['2024-05-02 09:00:00', 'text', '咖啡廳選址', 'u2', '', 'processed'],
+                               ['2024-05-02 10:00:00', 'text', '研磨咖啡的溫度', 'u1', '', 'processed']])
+            done.set()
+
+        threading.Thread(target=other_user).start()
+        assert done.wait(2)
+        release.set()
+        builder.join(5)
+
+        # The note written during the build was missed by its storage read and is added once
+        assert [note['content'] for note in index.related('u1', '研磨 溫度', limit=10)].count('研磨咖啡的溫度') == 1
+
+
+class RelatedStore:
+
+    def __init__(self, notes):
+        self.notes = notes
+        self.queries = []
+
+    def find_related(self, user_id, text=None, limit=5):
+        self.queries.append(text)
+        return self.notes
+
+
+class RecordingLineApi:
+
+    def __init__(self):
+        self.replies = []
+
+    def reply_message(self, token, message):
+        self.replies.append(message.text)
+
+
+def test_related_command_renders_scored_notes():
+    service = LineService.__new__(LineService)
+    service.logger = logging.getLogger(__name__)
+    service.sheets_service = RelatedStore([dict(record, score=0.42) for record in make_records()[:2]])
+    service.line_bot_api = RecordingLineApi()
+
+    service._handle_text_message(MessageEvent('token', Source('user', 'U1'), Message('text', '1', '/related 咖啡 菜單')))
+
+    assert service.sheets_service.queries == ['咖啡 菜單']
+    assert service.line_bot_api.replies[-1].splitlines() == [
+        '🔗 與「咖啡 菜單」相關的靈感', '', '1. [05/01] 咖啡店的新菜單想法 (42%)', '2. [05/01] 週末去爬山看日出 (42%)'
+    ]
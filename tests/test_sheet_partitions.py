@@ -0,0 +1,40 @@
+import pytest
+from datetime import datetime
+from app.services.fake_sheets import FakeSheetsClient
+from app.services.sheet_partitions import SheetPartitionManager
+
+
+@pytest.fixture
+def manager():
+    return SheetPartitionManager(FakeSheetsClient().open_by_key('test-sheet'))
+
+
+class TestSheetPartitionManager:
+
+    def test_rollover_creates_partition_and_catalog_entry(self, manager):
+        may = manager.get_partition(datetime(2024, 5, 31, 23, 59))
+        june = manager.get_partition(datetime(2024, 6, 1, 0, 0))
+
+        assert may.title == 'Inspiration_Notes_2024_05'
+        assert june.title == 'Inspiration_Notes_2024_06'
+        assert manager.get_partition(datetime(2024, 6, 15)) is june
+        assert manager.list_months() == ['2024-06', '2024-05']
+        assert len(manager.catalog.get_all_records()) == 2
+
+    def test_range_query_reads_only_partitions_in_range(self, manager):
+        for month in (3, 4, 5):
+            worksheet = manager.get_partition(datetime(2024, month, 1))
+            worksheet.insert_row(['2024-%02d-01 10:00:00' % month, 'text', f'note {month}', 'u1', '', 'processed'], 2)
+
+        worksheets = manager.partitions_between(datetime(2024, 4, 20), datetime(2024, 5, 2))
+        assert [ws.title for ws in worksheets] == ['Inspiration_Notes_2024_05', 'Inspiration_Notes_2024_04']
+
+        records = manager.fetch_records(worksheets)
+        assert [r['content'] for r in records] == ['note 5', 'note 4']
+
+    def test_catalog_is_reused_by_new_manager(self, manager):
+        manager.get_partition(datetime(2024, 1, 10))
+
+        reopened = SheetPartitionManager(manager.spreadsheet)
+        assert reopened.list_months() == ['2024-01']
+        assert reopened.get_partition(datetime(2024, 1, 20), create=False).title == 'Inspiration_Notes_2024_01'
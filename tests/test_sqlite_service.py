@@ -0,0 +1,112 @@
+import pytest
+from datetime import datetime, timedelta
+from app.models.message_model import MessageModel
+from app.services.fake_sheets import FakeWorksheet, api_error
+from app.services.sheets_service import SheetsService
+from app.services.sqlite_service import SQLiteService, SheetsReplicator
+from config.settings import Config
+
+
+class RecordingSheets:
+    def __init__(self):
+        self.batches = []
+
+    def write_messages(self, messages):
+        self.batches.append([m.content for m in messages])
+        return messages
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteService(str(tmp_path / 'notes.db'))
+
+
+def make_message(user_id, content, days_ago=0, message_type='text'):
+    return MessageModel(
+        user_id=user_id,
+        message_type=message_type,
+        content=content,
+        timestamp=datetime.now() - timedelta(days=days_ago)
+    )
+
+
+class TestSQLiteService:
+
+    def test_queries_match_sheets_record_shape(self, store):
+        assert store.add_message(make_message('u1', '舊的想法 #工作', days_ago=3))
+        assert store.add_message(make_message('u1', '今天的想法 #工作 #生活'))
+        assert store.add_message(make_message('u2', '別人的 #工作'))
+
+        recent = store.get_recent_messages('u1', days=1)
+        assert [r['content'] for r in recent] == ['今天的想法 #工作 #生活']
+        assert set(recent[0]) == set(MessageModel.get_sheets_headers())
+
+        results = store.search_messages('想法', 'u1')
+        assert [r['content'] for r in results] == ['今天的想法 #工作 #生活', '舊的想法 #工作']
+
+        assert store.get_tags_statistics('u1') == {'工作': 2, '生活': 1}
+
+        stats = store.get_user_statistics('u1')
+        assert stats['total_messages'] == 2
+        assert stats['message_types'] == {'text': 2}
+        assert stats['tags_count'] == 2
+
+    def test_search_pages_newest_first(self, store):
+        store.add_messages_batch([make_message('u1', f"想法 {i}", days_ago=i) for i in range(7)])
+        store.add_message(make_message('u2', '別人的想法'))
+
+        first, more = store.search_page('想法', 'u1', page=1, page_size=3)
+        last, no_more = store.search_page('想法', 'u1', page=3, page_size=3)
+
+        assert [r['content'] for r in first] == ['想法 0', '想法 1', '想法 2'] and more
+        assert [r['content'] for r in last] == ['想法 6'] and not no_more
+
+    def test_empty_user_statistics(self, store):
+        assert store.get_user_statistics('nobody')['total_messages'] == 0
+
+    def test_replicator_mirrors_newest_first_once(self, store):
+        sheets = RecordingSheets()
+        replicator = SheetsReplicator(store, sheets, batch_size=10)
+
+        store.add_messages_batch([
+            make_message('u1', 'first', days_ago=2),
+            make_message('u1', 'second', days_ago=1),
+        ])
+
+        assert replicator.replicate_once() == 2
+        assert replicator.replicate_once() == 0
+        assert sheets.batches == [['second', 'first']]
+
+    def test_replicator_keeps_progress_when_a_later_partition_fails(self, store, monkeypatch):
+        monkeypatch.setattr(Config, 'SHEETS_BACKEND', 'fake')
+        monkeypatch.setattr(Config, 'GOOGLE_SHEET_ID', 'offline')
+        monkeypatch.setattr(Config, 'SHEETS_PARTITION_MODE', 'monthly')
+        for name in ('FAKE_SHEETS_LATENCY_MS', 'FAKE_SHEETS_JITTER_MS'):
+            monkeypatch.setenv(name, '0')
+        sheets = SheetsService()
+        may = sheets.partitions.get_partition(datetime(2024, 5, 1))
+        april = sheets.partitions.get_partition(datetime(2024, 4, 1))
+        replicator = SheetsReplicator(store, sheets, batch_size=10)
+        store.add_messages_batch([
+            MessageModel('u1', 'text', 'april', timestamp=datetime(2024, 4, 30)),
+            MessageModel('u1', 'text', 'may', timestamp=datetime(2024, 5, 1)),
+        ])
+
+        # May is written first (newest-first), then April's write fails once
+        insert_rows = FakeWorksheet.insert_rows
+        failures = [april.title]
+
+        def flaky_insert(worksheet, values, row=1, **kwargs):
+            if worksheet.title in failures:
+                failures.remove(worksheet.title)
+                raise api_error(503, 'backend error', 'UNAVAILABLE')
+            return insert_rows(worksheet, values, row, **kwargs)
+        monkeypatch.setattr(FakeWorksheet, 'insert_rows', flaky_insert)
+
+        with pytest.raises(RuntimeError):
+            replicator.replicate_once()
+        assert replicator.replicate_once() == 1
+        assert replicator.replicate_once() == 0
+
+        assert [r['content'] for r in may.get_all_records()] == ['may']
+        assert [r['content'] for r in april.get_all_records()] == ['april']
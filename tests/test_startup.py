@@ -0,0 +1,53 @@
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+CHECK_SCRIPT = """
+import json, sys
+import server
+print(json.dumps([name for name in server.LAZY_MODULES if name in sys.modules]))
+"""
+
+
+def loaded_after_import(**env):
+    environment = dict(os.environ, LOG_LEVEL='ERROR', **env)
+    for name in ('LINE_CHANNEL_ACCESS_TOKEN', 'LINE_CHANNEL_SECRET', 'GOOGLE_SHEET_ID'):
+        environment.pop(name, None)
+    output = subprocess.run(
+        [sys.executable, '-c', CHECK_SCRIPT], capture_output=True, text=True,
+        check=True, cwd=ROOT, env=environment
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+class TestLazyImports:
+
+    def test_importing_server_does_not_load_google_clients(self):
+        assert loaded_after_import() == []
+
+    def test_preload_mode_loads_them_in_the_master(self):
+        loaded = loaded_after_import(GUNICORN_PRELOAD='1')
+        assert 'gspread' in loaded and 'google.oauth2.service_account' in loaded
+
+
+class TestGunicornConfig:
+
+    def load_config(self):
+        spec = importlib.util.spec_from_file_location('gunicorn_conf', os.path.join(ROOT, 'gunicorn.conf.py'))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+    def test_on_starting_removes_stale_metric_snapshots(self, tmp_path, monkeypatch):
+        (tmp_path / 'metrics_123.json').write_text('{}')
+        (tmp_path / 'metrics_123.abc.tmp').write_text('{')
+        (tmp_path / 'other.txt').write_text('keep')
+        monkeypatch.setenv('METRICS_MULTIPROC_DIR', str(tmp_path))
+
+        self.load_config().on_starting(None)
+
+        assert sorted(os.listdir(tmp_path)) == ['other.txt']
@@ -0,0 +1,59 @@
+import pytest
+
+from app.utils.tracing import NOOP_SPAN, Tracer, hash_user_id
+
+
+class ListExporter:
+
+    def __init__(self):
+        self.traces = []
+
+    def export(self, trace):
+        self.traces.append(trace)
+
+
+class TestTracer:
+
+    def test_child_spans_share_trace_and_parent(self):
+        exporter = ListExporter()
+        tracer = Tracer(sample_rate=1.0, exporter=exporter)
+
+        with tracer.trace('webhook', payload_size=42):
+            with tracer.span('event', message_type='text'):
+                with tracer.span('sheets.sheet_write'):
+                    pass
+
+        assert len(exporter.traces) == 1
+        spans = {span['name']: span for span in exporter.traces[0]['spans']}
+        assert spans['webhook']['parent_id'] is None
+        assert spans['webhook']['attributes'] == {'payload_size': 42}
+        assert spans['event']['parent_id'] == spans['webhook']['span_id']
+        assert spans['sheets.sheet_write']['parent_id'] == spans['event']['span_id']
+
+    def test_unsampled_trace_records_nothing(self):
+        exporter = ListExporter()
+        tracer = Tracer(sample_rate=0.0, exporter=exporter)
+
+        with tracer.trace('webhook') as root:
+            with tracer.span('event') as child:
+                pass
+
+        assert root is NOOP_SPAN and child is NOOP_SPAN
+        assert exporter.traces == []
+
+    def test_errors_are_recorded_and_trace_still_exported(self):
+        exporter = ListExporter()
+        tracer = Tracer(sample_rate=1.0, exporter=exporter)
+
+        with pytest.raises(RuntimeError):
+            with tracer.trace('webhook'):
+                with tracer.span('line.reply'):
+                    raise RuntimeError('429 quota')
+
+        spans = {span['name']: span for span in exporter.traces[0]['spans']}
+        assert spans['line.reply']['error'] == 'RuntimeError: 429 quota'
+
+    def test_hash_user_id_is_stable_and_opaque(self):
+        assert hash_user_id('U123') == hash_user_id('U123')
+        assert 'U123' not in hash_user_id('U123')
+        assert hash_user_id(None) == ''
@@ -0,0 +1,170 @@
+import threading
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app.models.message_model import MessageModel
+from app.services.sqlite_service import SQLiteService
+from app.services.user_stats import UserAggregate, UserStatsIndex, bump_storage_epoch
+
+
+def make_message(user_id, content, day, message_type='text'):
+    return MessageModel(user_id=user_id, message_type=message_type, content=content,
+                        timestamp=datetime.combine(day, datetime.min.time()) + timedelta(hours=9))
+
+
+class TestUserAggregate:
+
+    def test_counts_types_tags_and_range(self):
+        aggregate = UserAggregate()
+        aggregate.add('2024-05-01 09:00:00', 'text', ['工作'])
+        aggregate.add('2024-05-01 10:00:00', 'audio', ['工作', '想法'])
+        aggregate.add('2024-04-30 08:00:00', 'text', [])
+
+        stats = aggregate.to_stats(today=date(2024, 5, 1))
+
+        assert stats['total_messages'] == 3
+        assert stats['message_types'] == {'text': 2, 'audio': 1}
+        assert stats['tags_count'] == 2
+        assert stats['first_message'] == '2024-04-30 08:00:00'
+        assert stats['last_message'] == '2024-05-01 10:00:00'
+        assert aggregate.daily == {'2024-05-01': 2, '2024-04-30': 1}
+        # 2024-05-01 is a Wednesday, 2024-04-30 a Tuesday
+        assert stats['weekday_counts'] == [0, 1, 2, 0, 0, 0, 0]
+
+    def test_streaks(self):
+        aggregate = UserAggregate()
+        for day in ('2024-05-01', '2024-05-02', '2024-05-03', '2024-05-06', '2024-05-07'):
+            aggregate.add(f"{day} 09:00:00", 'text', [])
+
+        assert aggregate.longest_streak == 3
+        assert aggregate.current_streak(date(2024, 5, 8)) == 2
+        assert aggregate.current_streak(date(2024, 5, 9)) == 0
+
+        # Backfilling the gap joins the two runs
+        aggregate.add('2024-05-04 09:00:00', 'text', [])
+        aggregate.add('2024-05-05 09:00:00', 'text', [])
+        assert aggregate.longest_streak == 7
+        assert aggregate.current_streak(date(2024, 5, 7)) == 7
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteService(str(tmp_path / 'notes.db'))
+
+
+def attach(store, path):
+    store.user_stats = UserStatsIndex(str(path), store.records_since, flush_interval=3600)
+    return store.user_stats
+
+
+class TestUserStatsIndex:
+
+    def test_matches_a_full_recount(self, store, tmp_path):
+        today = date.today()
+        notes = [('u1', '想法 #工作', 2, 'text'), ('u1', '語音 #工作 #生活', 1, 'audio'),
+                 ('u1', '今天', 0, 'text'), ('u2', '別人的 #工作', 0, 'image')]
+        store.add_message(make_message('u1', '開始前就有的 #舊', today - timedelta(days=5)))
+        index = attach(store, tmp_path / 'stats.json')
+        for user_id, content, days_ago, message_type in notes:
+            store.add_message(make_message(user_id, content, today - timedelta(days=days_ago), message_type))
+
+        stats = store.get_user_statistics('u1')
+        assert stats['total_messages'] == 4
+        assert stats['message_types'] == {'text': 3, 'audio': 1}
+        assert stats['tags_count'] == 3
+        assert stats['current_streak'] == 3
+        assert store.get_tags_statistics('u1') == {'工作': 2, '舊': 1, '生活': 1}
+
+        rebuilt = UserStatsIndex(None, store.records_since)
+        for user_id in ('u1', 'u2'):
+            assert rebuilt.get(user_id) == index.get(user_id)
+
+    def test_catches_up_on_notes_written_after_the_snapshot(self, store, tmp_path):
+        path = tmp_path / 'stats.json'
+        index = attach(store, path)
+        store.add_message(make_message('u1', '第一筆', date(2024, 5, 1)))
+        index.get('u1')
+        store.add_message(make_message('u1', '第二筆', date(2024, 5, 2)))
+        index.flush()
+        # Written after the last save, e.g. just before a crash
+        store.add_message(make_message('u1', '第三筆', date(2024, 5, 3)))
+
+        restarted = UserStatsIndex(str(path), store.records_since)
+
+        assert restarted.get('u1')['total_messages'] == 3
+        assert restarted.get('u1')['longest_streak'] == 3
+
+    def test_counts_a_note_from_the_snapshot_second_written_after_the_flush(self, store, tmp_path):
+        path = tmp_path / 'stats.json'
+        index = attach(store, path)
+        store.add_message(make_message('u1', '第一筆', date(2024, 5, 1)))
+        index.get('u1')
+        index.flush()
+        # Same timestamp as the snapshot watermark, never flushed
+        store.add_message(make_message('u1', '同一秒的第二筆', date(2024, 5, 1)))
+
+        restarted = UserStatsIndex(str(path), store.records_since)
+
+        assert restarted.get('u1')['total_messages'] == 2
+
+    def test_workers_sharing_a_snapshot_do_not_lose_each_others_notes(self, store, tmp_path):
+        path = tmp_path / 'stats.json'
+        other = SQLiteService(store.db_path)
+        first, second = attach(store, path), attach(other, path)
+        first.get('u1')
+        second.get('u1')
+
+        other.add_message(make_message('u1', '第二個 worker 寫的', date(2024, 5, 1)))
+        store.add_message(make_message('u1', '第一個 worker 寫的', date(2024, 5, 2)))
+        # Only the first worker saves; its watermark is past the second worker's note
+        first.flush()
+
+        restarted = UserStatsIndex(str(path), store.records_since)
+
+        assert restarted.get('u1')['total_messages'] == 2
+
+    def test_backfilled_rows_are_counted_after_the_epoch_is_bumped(self, store, tmp_path):
+        path = tmp_path / 'stats.json'
+        index = attach(store, path)
+        store.add_message(make_message('u1', '現在的記錄', date(2024, 5, 2)))
+        assert index.get('u1')['total_messages'] == 1
+
+        # A bulk import writes older rows without going through this index
+        SQLiteService(store.db_path).add_message(make_message('u1', '匯入的舊記錄', date(2023, 1, 1)))
+        bump_storage_epoch(str(path))
+
+        assert index.get('u1')['total_messages'] == 2
+        assert UserStatsIndex(str(path), store.records_since).get('u1')['total_messages'] == 2
+
+    def test_note_recorded_during_the_first_load_is_counted_once(self):
+        stored = []
+        reading, release = threading.Event(), threading.Event()
+
+        def source(since):
+            records = [message.to_sheets_row() for message in stored]
+            reading.set()
+            release.wait(5)
+            return [{'timestamp': row[0], 'message_type': row[1], 'user_id': row[3], 'tags': row[4]}
+                    for row in records]
+
+        index = UserStatsIndex(None, source)
+        read_by_load = make_message('u1', '載入前就存好的', date(2024, 5, 1))
+        stored.append(read_by_load)
+        reader = threading.Thread(target=lambda: index.get('u1'))
+        reader.start()
+        assert reading.wait(5)
+
+        # Both writers finish while the load is stuck on storage
+        missed_by_load = make_message('u1', '載入時才存的', date(2024, 5, 2))
+        stored.append(missed_by_load)
+        writers = [threading.Thread(target=index.record, args=(message,)) for message in (read_by_load, missed_by_load)]
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join(2)
+        assert not any(writer.is_alive() for writer in writers)
+
+        release.set()
+        reader.join(5)
+        assert index.get('u1')['total_messages'] == 2
@@ -4,6 +4,7 @@ import os
 from unittest.mock import Mock, patch
 from app import create_app
 from app.models.message_model import MessageModel
+from app.utils.helpers import sanitize_text
 
 # 設定測試環境變數
 os.environ['LINE_CHANNEL_ACCESS_TOKEN'] = 'test_token'
@@ -142,5 +143,30 @@ class TestMessageModel:
         assert 'tag1, tag2' in row[4] or 'tag2, tag1' in row[4]  # tags
         assert row[5] == 'processed'  # status
 
+    def test_content_update_recomputes_derived_fields(self):
+        message = MessageModel(
+            user_id='test_user',
+            message_type='text',
+            content='first #old'
+        )
+        assert message.tags == ['old']
+
+        message.content = 'second\n\tline #new #new'
+
+        assert message.tags == ['new']
+        assert message.processed_content == 'second line #new #new'
+        assert not hasattr(message, '__dict__')
+
+class TestSanitizeText:
+    
+    def test_removes_control_characters_only(self):
+        assert sanitize_text('a\x00b\x1fc\td\ne') == 'abc\td\ne'
+        assert sanitize_text('靈感\x07筆記\r\n') == '靈感筆記'
+        assert sanitize_text('') == ''
+    
+    def test_truncates_long_text(self):
+        result = sanitize_text('字' * 10005)
+        assert result == '字' * 10000 + '... (truncated)'
+
 if __name__ == '__main__':
     pytest.main([__file__])
\ No newline at end of file